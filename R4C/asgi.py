@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'R4C.settings')
 
 application = get_asgi_application()
+
+# Статистика производства пишется в базу фоновым потоком процесса
+from robots.stats import production_stats
+
+production_stats.start_checkpoints()
@@ -0,0 +1,94 @@
+"""
+Кодеки JSON для горячих путей API.
+
+Разбор тел запросов и сборка ответов на эндпоинтах загрузки занимают
+заметную долю процессорного времени на каждого робота. Если установлен
+orjson, используется он, иначе - стандартный json. Кодек выбирается
+настройкой JSON_CODEC ('auto', 'orjson' или 'json').
+"""
+
+import json
+
+from django.conf import settings
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # без orjson работает стандартный json
+    orjson = None
+
+
+# orjson.JSONDecodeError - подкласс json.JSONDecodeError, поэтому
+# обработчики ошибок разбора одинаковы для всех кодеков
+DecodeError = json.JSONDecodeError
+
+
+class StdlibCodec:
+    name = 'json'
+
+    def loads(self, data):
+        return json.loads(data)
+
+    def dumps(self, value):
+        return json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+
+class OrjsonCodec:
+    name = 'orjson'
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+    def dumps(self, value):
+        return orjson.dumps(value)
+
+
+CODECS = {
+    'orjson': OrjsonCodec,
+    'json': StdlibCodec,
+}
+
+_codecs = {}
+
+
+def get_available_codecs():
+    """Кодеки, доступные в текущем окружении"""
+    return [name for name in CODECS if name != 'orjson' or orjson is not None]
+
+
+def get_codec(name=None):
+    """Кодек по имени или из настройки JSON_CODEC; 'auto' - самый быстрый доступный"""
+    if name is None:
+        name = getattr(settings, 'JSON_CODEC', 'auto')
+    if name == 'auto':
+        name = get_available_codecs()[0]
+    if name not in get_available_codecs():
+        raise ValueError(
+            f"JSON codec must be one of: auto, {', '.join(get_available_codecs())}"
+        )
+
+    codec = _codecs.get(name)
+    if codec is None:
+        codec = _codecs[name] = CODECS[name]()
+    return codec
+
+
+def loads(data):
+    return get_codec().loads(data)
+
+
+def dumps(value):
+    """Сериализуем значение в байты UTF-8"""
+    return get_codec().dumps(value)
+
+
+class JSONResponse(HttpResponse):
+    """Аналог JsonResponse, сериализующий данные текущим кодеком.
+
+    Ответы API содержат только словари, списки, строки и числа, поэтому
+    кодировщик Django для дат и Decimal не нужен.
+    """
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
@@ -0,0 +1,237 @@
+"""
+Метрики горячего пути: время запросов по фазам, SQL-запросы и отправка писем.
+
+Значения накапливаются в памяти процесса и отдаются в текстовом формате
+Prometheus по адресу /metrics/. При METRICS_ENABLED = False middleware
+отключается при загрузке, а phase() и observe() сводятся к проверке флага.
+"""
+
+import threading
+import time
+from asyncio import iscoroutinefunction
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+from django.utils.decorators import sync_and_async_middleware
+
+
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+HELP = {
+    'r4c_request_seconds': 'Время обработки запроса',
+    'r4c_phase_seconds': 'Время фаз обработки запроса',
+    'r4c_request_queries': 'Количество SQL-запросов на запрос',
+    'r4c_request_query_seconds': 'Суммарное время SQL-запросов на запрос',
+    'r4c_email_send_seconds': 'Время отправки одного письма',
+}
+
+_current = ContextVar('r4c_metrics_request', default=None)
+
+
+def is_enabled():
+    return getattr(settings, 'METRICS_ENABLED', True)
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+
+class Registry:
+    """Хранилище гистограмм по имени метрики и набору меток"""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, buckets=TIME_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self):
+        """Текстовый формат экспозиции Prometheus"""
+        with self._lock:
+            items = sorted(
+                (key, (h.buckets, list(h.counts), h.total, h.sum))
+                for key, h in self._histograms.items()
+            )
+
+        lines = []
+        current_name = None
+        for (name, labels), (buckets, counts, total, total_sum) in items:
+            if name != current_name:
+                current_name = name
+                lines.append(f'# HELP {name} {HELP.get(name, name)}')
+                lines.append(f'# TYPE {name} histogram')
+
+            base = ','.join(f'{key}="{value}"' for key, value in labels)
+            prefix = base + ',' if base else ''
+            for bound, count in zip(buckets, counts):
+                lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {total}')
+            lines.append(f'{name}_sum{{{base}}} {total_sum}')
+            lines.append(f'{name}_count{{{base}}} {total}')
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class RequestMetrics:
+    """Метрики одного запроса, доступные через контекстную переменную"""
+
+    def __init__(self, request):
+        self.request = request
+        self.queries = 0
+        self.query_seconds = 0.0
+
+    @property
+    def endpoint(self):
+        """Шаблон маршрута, чтобы не плодить метки по идентификаторам в URL"""
+        match = getattr(self.request, 'resolver_match', None)
+        return match.route if match is not None else 'unresolved'
+
+
+def observe(name, value, buckets=TIME_BUCKETS, **labels):
+    """Записываем значение в гистограмму, если метрики включены"""
+    if is_enabled():
+        registry.observe(name, value, buckets, **labels)
+
+
+def phase(name):
+    """Контекстный менеджер для замера фазы обработки.
+
+    Фаза относится к текущему endpoint-у, вне запроса - к 'background'.
+    Фазы могут быть вложенными: время вставки включает обработчики сигналов.
+    """
+    if not is_enabled():
+        return nullcontext()
+    return _timed_phase(name)
+
+
+@contextmanager
+def _timed_phase(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        state = _current.get()
+        endpoint = state.endpoint if state is not None else 'background'
+        registry.observe(
+            'r4c_phase_seconds',
+            time.perf_counter() - started,
+            endpoint=endpoint,
+            phase=name,
+        )
+
+
+def query_wrapper(execute, sql, params, many, context):
+    """Обертка выполнения SQL: считает запросы и их время внутри запроса"""
+    state = _current.get()
+    if state is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        state.queries += 1
+        state.query_seconds += time.perf_counter() - started
+
+
+def install_query_wrapper(db_connection):
+    if query_wrapper not in db_connection.execute_wrappers:
+        db_connection.execute_wrappers.append(query_wrapper)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """Подключаем обертку SQL к новым соединениям, в том числе в потоках sync_to_async"""
+    if is_enabled():
+        install_query_wrapper(connection)
+
+
+@sync_and_async_middleware
+def MetricsMiddleware(get_response):
+    """Замер времени, SQL-запросов и фаз обработки для каждого запроса"""
+    if not is_enabled():
+        raise MiddlewareNotUsed
+
+    def start(request):
+        install_query_wrapper(connection)
+        state = RequestMetrics(request)
+        return state, _current.set(state), time.perf_counter()
+
+    def finish(request, response, state, token, started):
+        _current.reset(token)
+        endpoint = state.endpoint
+        status = str(getattr(response, 'status_code', 500))
+
+        registry.observe(
+            'r4c_request_seconds',
+            time.perf_counter() - started,
+            endpoint=endpoint,
+            method=request.method,
+            status=status,
+        )
+        registry.observe('r4c_request_queries', state.queries, COUNT_BUCKETS, endpoint=endpoint)
+        registry.observe('r4c_request_query_seconds', state.query_seconds, endpoint=endpoint)
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            state, token, started = start(request)
+            response = None
+            try:
+                response = await get_response(request)
+                return response
+            finally:
+                finish(request, response, state, token, started)
+    else:
+        def middleware(request):
+            state, token, started = start(request)
+            response = None
+            try:
+                response = get_response(request)
+                return response
+            finally:
+                finish(request, response, state, token, started)
+
+    return middleware
+
+
+def metrics_view(request):
+    """Экспозиция метрик в текстовом формате Prometheus"""
+    if not is_enabled():
+        raise Http404('Metrics are disabled')
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/3.0/ref/settings/
 
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -43,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'R4C.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,11 +79,95 @@ WSGI_APPLICATION = 'R4C.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+# Профиль базы выбирается переменной DATABASE_ENGINE: 'sqlite' (по умолчанию)
+# или 'postgresql' для нескольких конкурентных процессов записи
+
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'sqlite')
+
+if DATABASE_ENGINE == 'postgresql':
+    DATABASE_POOL_MAX_SIZE = int(os.environ.get('DATABASE_POOL_MAX_SIZE', 10))
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DATABASE_NAME', 'r4c'),
+            'USER': os.environ.get('DATABASE_USER', 'r4c'),
+            'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+            'HOST': os.environ.get('DATABASE_HOST', 'localhost'),
+            'PORT': os.environ.get('DATABASE_PORT', '5432'),
+            # Пул соединений psycopg несовместим с CONN_MAX_AGE,
+            # без пула (0 - например, за PgBouncer) держим постоянные соединения
+            'CONN_MAX_AGE': 0 if DATABASE_POOL_MAX_SIZE else 600,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DATABASE_POOL_MIN_SIZE', 2)),
+                    'max_size': DATABASE_POOL_MAX_SIZE,
+                    'timeout': 10,
+                },
+            } if DATABASE_POOL_MAX_SIZE else {},
+        }
+    }
+elif DATABASE_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DATABASE_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Секунды ожидания блокировки записи вместо "database is locked"
+                'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)),
+                # Блокировка записи берется в начале транзакции, а не при первой
+                # записи: иначе читавшая транзакция не может получить блокировку
+                # и падает без ожидания
+                'transaction_mode': 'IMMEDIATE',
+                # WAL: читатели не блокируют писателя и наоборот
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA cache_size=-20000;'
+                    'PRAGMA temp_store=MEMORY;'
+                    'PRAGMA mmap_size=134217728;'
+                ),
+            },
+            # Тестовая база в файле, чтобы тесты конкурентной записи
+            # работали с WAL и блокировками так же, как рабочая
+            'TEST': {
+                'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+            },
+        }
     }
+else:
+    raise ImproperlyConfigured(
+        f"DATABASE_ENGINE must be 'sqlite' or 'postgresql', got {DATABASE_ENGINE!r}"
+    )
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# Версия данных для отчетов хранится в базе (robots.DataVersion), в кэше -
+# только готовые отчеты по версии, поэтому локальный кэш процесса допустим.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Индекс листа ожидания должен быть общим для всех процессов: его
+    # отрицательным записям верят без запроса к базе. По умолчанию -
+    # файловый кэш, общий для процессов одного хоста; при нескольких
+    # хостах задайте WAITLIST_REDIS_URL (нужен пакет redis).
+    'waitlist': (
+        {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['WAITLIST_REDIS_URL'],
+        }
+        if os.environ.get('WAITLIST_REDIS_URL') else
+        {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(BASE_DIR, 'data', 'waitlist_cache'),
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    ),
 }
 
 
@@ -125,4 +212,53 @@ STATIC_URL = '/static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # Для разработки
-DEFAULT_FROM_EMAIL = 'robots@example.com'
\ No newline at end of file
+DEFAULT_FROM_EMAIL = 'robots@example.com'
+
+# Очередь уведомлений листа ожидания
+NOTIFICATION_MAX_ATTEMPTS = 5
+NOTIFICATION_RETRY_BACKOFF = 60  # секунд, удваивается с каждой попыткой
+NOTIFICATION_RETRY_BACKOFF_MAX = 3600
+# Окно накопления уведомлений клиента в одно письмо, секунд (0 - без задержки)
+NOTIFICATION_DIGEST_WINDOW = int(os.environ.get('NOTIFICATION_DIGEST_WINDOW', 0))
+
+# Кэш готовых отчетов
+REPORT_CACHE_TIMEOUT = 3600
+REPORT_CACHE_MAX_SIZE = 5 * 1024 * 1024  # большие отчеты не кэшируются
+REPORT_SPOOL_MAX_MEMORY = 1024 * 1024  # больше - во временный файл на диске
+
+# Фоновая генерация отчетов за произвольный период
+REPORT_JOB_WORKERS = int(os.environ.get('REPORT_JOB_WORKERS', 2))  # 0 - в процессе запроса
+REPORT_JOBS_DIR = os.path.join(BASE_DIR, 'data', 'reports')
+REPORT_JOB_TIMEOUT = 600  # секунд; дольше задача считается потерянной и не переиспользуется
+
+# Индекс листа ожидания: 'cache' - общий кэш WAITLIST_CACHE, 'local' - LRU в процессе
+WAITLIST_INDEX_BACKEND = 'cache'  # 'local' не видит заказы других процессов и перепроверяет отрицательные ответы в базе
+WAITLIST_CACHE = 'waitlist'
+WAITLIST_INDEX_MAX_SIZE = 10000
+WAITLIST_INDEX_TTL = 30  # секунд, граница устаревания при изменениях в других процессах
+
+# Свободные остатки: время жизни значений в кэше - граница их устаревания
+STOCK_CACHE_TTL = 5  # секунд
+
+# Проверка входящих роботов по каталогу моделей и версий
+ROBOT_CATALOG_VALIDATION = True
+ROBOT_CATALOG_RECHECK = 5  # секунд между проверками версии каталога в базе
+
+# Метрики горячего пути на /metrics/; False - middleware не подключается
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+
+# Архив роботов старше горизонта: сжатые CSV по месяцам
+ROBOT_ARCHIVE_DIR = os.path.join(BASE_DIR, 'data', 'archive')
+ROBOT_ARCHIVE_HORIZON_DAYS = 365
+
+# Окно дедупликации повторных отправок роботов по event_id / Idempotency-Key
+ROBOT_EVENT_DEDUP_TTL = 3600  # секунд; дальше повтор распознается по базе
+
+# Локальная очередь загрузки (robots/api/queue/), разбирается drain_ingest_spool
+INGEST_SPOOL_PATH = os.path.join(BASE_DIR, 'data', 'ingest_spool.sqlite3')
+
+# Кодек JSON эндпоинтов загрузки: 'auto' - orjson, если установлен, иначе json
+JSON_CODEC = os.environ.get('JSON_CODEC', 'auto')
+
+# Статистика /robots/stats/: счетчики в памяти пишутся в базу не реже интервала
+PRODUCTION_STATS_CHECKPOINT_INTERVAL = 10  # секунд
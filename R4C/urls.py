@@ -17,10 +17,13 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from robots.views import RobotCreateView
+from .metrics import metrics_view
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics/', metrics_view, name='metrics'),
     path('', include('robots.urls')),
+    path('', include('orders.urls')),
     path('robots/api/', RobotCreateView.as_view(), name='robot-create'),
 ]
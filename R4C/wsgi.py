@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'R4C.settings')
 
 application = get_wsgi_application()
+
+# Статистика производства пишется в базу фоновым потоком процесса
+from robots.stats import production_stats
+
+production_stats.start_checkpoints()
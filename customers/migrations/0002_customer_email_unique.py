@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:21
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_customers(apps, schema_editor):
+    """Объединяем клиентов с одинаковым email в самого раннего"""
+    Customer = apps.get_model('customers', 'Customer')
+    Order = apps.get_model('orders', 'Order')
+
+    duplicates = Customer.objects.values('email').annotate(
+        keep=Min('id'), total=Count('id')
+    ).filter(total__gt=1)
+    for row in duplicates:
+        others = Customer.objects.filter(email=row['email']).exclude(pk=row['keep'])
+        Order.objects.filter(customer__in=others).update(customer_id=row['keep'])
+        others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0001_initial'),
+        ('orders', '0006_order_robot_reserved'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_customers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customer',
+            constraint=models.UniqueConstraint(fields=('email',), name='customer_email_unique'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations, models
+from django.db.models import Count, Min
+from django.db.models.functions import Lower, Trim
+
+
+def merge_case_duplicates(apps, schema_editor):
+    """Приводим email к нижнему регистру, объединяя клиентов, различавшихся регистром"""
+    Customer = apps.get_model('customers', 'Customer')
+    Order = apps.get_model('orders', 'Order')
+
+    normalized = Lower(Trim('email'))
+    duplicates = Customer.objects.annotate(normalized=normalized).values(
+        'normalized'
+    ).annotate(
+        keep=Min('id'), total=Count('id')
+    ).filter(total__gt=1)
+    for row in duplicates:
+        others = Customer.objects.annotate(normalized=normalized).filter(
+            normalized=row['normalized']
+        ).exclude(pk=row['keep'])
+        Order.objects.filter(customer__in=others).update(customer_id=row['keep'])
+        others.delete()
+
+    Customer.objects.exclude(email=normalized).update(email=normalized)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0002_customer_email_unique'),
+        ('orders', '0007_notification_pending_email_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_case_duplicates, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='customer',
+            name='customer_email_unique',
+        ),
+        migrations.AddConstraint(
+            model_name='customer',
+            constraint=models.UniqueConstraint(Lower('email'), name='customer_email_lower_unique'),
+        ),
+    ]
@@ -1,5 +1,12 @@
 from django.db import models
+from django.db.models.functions import Lower
 
 
 class Customer(models.Model):
     email = models.CharField(max_length=255,blank=False, null=False)
+
+    class Meta:
+        constraints = [
+            # Клиенты создаются пакетно по email, без дубликатов с учетом регистра
+            models.UniqueConstraint(Lower('email'), name='customer_email_lower_unique'),
+        ]
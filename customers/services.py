@@ -0,0 +1,35 @@
+from django.db.models.functions import Lower
+
+from .models import Customer
+
+
+def normalize_email(email):
+    """Email без пробелов по краям и в нижнем регистре"""
+    return email.strip().lower()
+
+
+def upsert_customers(emails):
+    """Находим или создаем клиентов по email двумя-тремя запросами на всю пачку.
+
+    Email сравниваются без учета регистра (по индексу уникальности
+    Lower(email)), поэтому находятся и клиенты, сохраненные до
+    нормализации. Возвращает словарь {email: id клиента}.
+    """
+    emails = {normalize_email(email) for email in emails}
+    by_email = Customer.objects.annotate(email_lower=Lower('email'))
+    ids = dict(
+        by_email.filter(email_lower__in=emails).values_list('email_lower', 'pk')
+    )
+
+    missing = emails - ids.keys()
+    if missing:
+        # Клиента мог одновременно создать параллельный запрос
+        Customer.objects.bulk_create(
+            [Customer(email=email) for email in sorted(missing)],
+            ignore_conflicts=True,
+        )
+        ids.update(
+            by_email.filter(email_lower__in=missing).values_list('email_lower', 'pk')
+        )
+
+    return ids
@@ -1,3 +1,22 @@
+from django.db import IntegrityError
 from django.test import TestCase
 
-# Create your tests here.
+from .models import Customer
+from .services import upsert_customers
+
+
+class CustomerEmailTests(TestCase):
+    def test_upsert_matches_existing_mixed_case(self):
+        """Тест поиска клиента, сохраненного до нормализации email"""
+        existing = Customer.objects.create(email='Known@Example.com')
+
+        ids = upsert_customers(['known@example.com', ' KNOWN@example.COM ', 'new@example.com'])
+
+        self.assertEqual(ids['known@example.com'], existing.pk)
+        self.assertEqual(Customer.objects.count(), 2)
+
+    def test_email_unique_ignoring_case(self):
+        """Тест уникальности email без учета регистра"""
+        Customer.objects.create(email='a@example.com')
+        with self.assertRaises(IntegrityError):
+            Customer.objects.create(email='A@example.com')
@@ -0,0 +1,80 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from robots.models import Robot
+
+from .models import Order
+from .waitlist import find_pending_serials, orders_removed
+
+
+def get_pending_orders(serial):
+    """Ожидающие заказы на серийный номер в порядке очереди"""
+    return Order.objects.filter(
+        robot_serial=serial,
+        status=Order.PENDING
+    ).order_by('created_at', 'id')
+
+
+def allocate_robots(robots):
+    """Резервируем новых роботов за ожидающими заказами по FIFO.
+
+    Заказы блокируются через select_for_update(skip_locked=True), поэтому
+    параллельные обработчики не ждут друг друга, а берут следующие
+    заказы в очереди. Резервирование выполняется условным UPDATE по
+    статусу, так что один заказ не получит двух роботов даже на базах
+    без блокировки строк. Роботы сопоставляются с заказами равенством
+    Robot.serial = Order.robot_serial по индексированным полям.
+
+    Робот уже закоммичен свободным, поэтому до резервирования его может
+    забрать заказ со склада (take_free_robots). Роботы блокируются и
+    перепроверяются внутри транзакции; забранные или заблокированные
+    параллельным заказом пропускаются.
+    Возвращает список зарезервированных заказов.
+    """
+    by_serial = defaultdict(list)
+    for robot in robots:
+        by_serial[robot.serial].append(robot)
+
+    pending = find_pending_serials(by_serial)
+
+    allocated = []
+    for serial, serial_robots in by_serial.items():
+        if serial not in pending:
+            continue
+
+        serial_robots.sort(key=lambda robot: (robot.created, robot.pk))
+        with transaction.atomic():
+            free_ids = set(
+                Robot.objects.filter(
+                    pk__in=[robot.pk for robot in serial_robots],
+                    order__isnull=True
+                ).select_for_update(
+                    skip_locked=True,
+                    of=('self',)
+                ).values_list('pk', flat=True)
+            )
+            serial_robots = [robot for robot in serial_robots if robot.pk in free_ids]
+            if not serial_robots:
+                continue
+
+            orders = list(
+                get_pending_orders(serial).select_for_update(
+                    skip_locked=True
+                )[:len(serial_robots)]
+            )
+            for order, robot in zip(orders, serial_robots):
+                reserved = Order.objects.filter(
+                    pk=order.pk,
+                    status=Order.PENDING
+                ).update(robot=robot, status=Order.RESERVED)
+                if reserved:
+                    order.robot = robot
+                    order.status = Order.RESERVED
+                    allocated.append(order)
+
+        if orders:
+            # Статус менялся через update(), сигналы заказа не отправлялись
+            orders_removed([serial])
+
+    return allocated
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class OrdersConfig(AppConfig):
     name = 'orders'
+
+    def ready(self):
+        '''Импортируем сигналы при загрузке приложения'''
+        import orders.signals
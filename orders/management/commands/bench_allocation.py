@@ -0,0 +1,126 @@
+import json
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.utils import timezone
+
+from customers.models import Customer
+from orders.allocation import allocate_robots
+from orders.models import Order
+from orders.waitlist import reset_waitlist_index
+from robots.benchmarks import Timer, benchmark_database
+from robots.models import Robot, make_serial
+
+
+class Command(BaseCommand):
+    help = (
+        'Многопоточный бенчмарк резервирования роботов под конкуренцией. '
+        'Работает во временной базе и проверяет отсутствие двойных резервов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            default='1,2,4,8',
+            help='Список количеств потоков через запятую'
+        )
+        parser.add_argument('--orders', type=int, default=2000)
+        parser.add_argument(
+            '--serials',
+            type=int,
+            default=4,
+            help='Количество разных серийных номеров (меньше - выше конкуренция)'
+        )
+        parser.add_argument(
+            '--chunk',
+            type=int,
+            default=1,
+            help='Количество роботов в одном вызове allocate_robots'
+        )
+        parser.add_argument('--output', default=None)
+
+    def handle(self, *args, **options):
+        try:
+            thread_counts = [int(n) for n in options['threads'].split(',')]
+        except ValueError:
+            raise CommandError('--threads must be a comma-separated list of integers')
+        if min(thread_counts) < 1 or options['orders'] < 1 or options['serials'] < 1:
+            raise CommandError('--threads, --orders and --serials must be positive')
+
+        results = []
+        with benchmark_database():
+            for threads in thread_counts:
+                results.append(self.run(threads, options))
+                self.stdout.write(json.dumps(results[-1]))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+    def seed(self, options):
+        """Заказы и еще не распределенные роботы для одного прогона"""
+        Order.objects.all().delete()
+        Robot.objects.all().delete()
+        Customer.objects.all().delete()
+        reset_waitlist_index()
+
+        customer = Customer.objects.create(email='bench@example.com')
+        serials = [(f'B{i % 10}', f'V{i // 10 % 10}') for i in range(options['serials'])]
+        pairs = [serials[i % len(serials)] for i in range(options['orders'])]
+        now = timezone.now()
+
+        Order.objects.bulk_create(
+            [
+                Order(customer=customer, robot_serial=make_serial(model, version), created_at=now)
+                for model, version in pairs
+            ],
+            batch_size=1000,
+        )
+        # bulk_create не отправляет сигналы, поэтому роботы пока свободны
+        return Robot.objects.bulk_create(
+            [
+                Robot(serial=make_serial(model, version), model=model, version=version, created=now)
+                for model, version in pairs
+            ],
+            batch_size=1000,
+        )
+
+    def run(self, threads, options):
+        robots = self.seed(options)
+        chunk = options['chunk']
+        allocated = [0] * threads
+        errors = [0] * threads
+
+        def worker(index):
+            own = robots[index::threads]
+            try:
+                for start in range(0, len(own), chunk):
+                    try:
+                        allocated[index] += len(allocate_robots(own[start:start + chunk]))
+                    except OperationalError:
+                        # Например, "database is locked" на SQLite
+                        errors[index] += 1
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        with Timer() as timer:
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+
+        reserved = Order.objects.filter(status=Order.RESERVED)
+        distinct_robots = reserved.values('robot').distinct().count()
+        return {
+            'threads': threads,
+            'orders': options['orders'],
+            'serials': options['serials'],
+            'allocated': sum(allocated),
+            'errors': sum(errors),
+            'seconds': round(timer.elapsed, 3),
+            'allocations_per_second': round(sum(allocated) / timer.elapsed, 1),
+            'double_booked': reserved.count() - distinct_robots,
+            'consistent': reserved.count() == sum(allocated),
+        }
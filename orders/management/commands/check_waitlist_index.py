@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+
+from orders.models import Order
+from orders.waitlist import check_consistency
+from robots.models import ProductionDaily
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверка индекса листа ожидания против базы. Имеет смысл для '
+        "WAITLIST_INDEX_BACKEND = 'cache': локальный индекс у каждого процесса свой."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Удалить из индекса расходящиеся записи'
+        )
+
+    def handle(self, *args, **options):
+        serials = set(
+            Order.objects.values_list('robot_serial', flat=True).distinct()
+        )
+        serials.update(
+            ProductionDaily.objects.annotate(
+                serial=Concat(F('model'), Value('-'), F('version'))
+            ).values_list('serial', flat=True).distinct()
+        )
+
+        mismatches = check_consistency(sorted(serials), fix=options['fix'])
+        for serial, cached, actual in mismatches:
+            self.stdout.write(f'{serial}: в индексе {cached}, в базе {actual}')
+
+        if mismatches:
+            action = 'исправлено' if options['fix'] else 'найдено'
+            self.stdout.write(self.style.WARNING(f'Расхождений {action}: {len(mismatches)}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Индекс согласован, проверено номеров: {len(serials)}'
+            ))
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0001_initial'),
+        ('orders', '0004_notification'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['robot_serial', 'status', 'created_at'], name='order_serial_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['robot_serial', 'created_at'], name='order_pending_serial_idx'),
+        ),
+    ]
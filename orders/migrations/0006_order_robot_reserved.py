@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_order_indexes'),
+        ('robots', '0004_reportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='robot',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order', to='robots.robot'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('pending', 'В ожидании'), ('reserved', 'Зарезервирован'), ('completed', 'Завершен'), ('cancelled', 'Отменен')], default='pending', max_length=20),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_robot_reserved'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['email'], name='notification_pending_email_idx'),
+        ),
+    ]
@@ -10,11 +10,13 @@ from customers.models import Customer
 class Order(models.Model):
     """Модель заказа с добавлением статуса"""
     PENDING = 'pending'
+    RESERVED = 'reserved'
     COMPLETED = 'completed'
     CANCELLED = 'cancelled'
     
     STATUS_CHOICES = [
         (PENDING, 'В ожидании'),
+        (RESERVED, 'Зарезервирован'),
         (COMPLETED, 'Завершен'),
         (CANCELLED, 'Отменен'),
     ]
@@ -27,6 +29,27 @@ class Order(models.Model):
         default=PENDING,
     )
     created_at = models.DateTimeField(default=timezone.now)
+    robot = models.OneToOneField(
+        'robots.Robot',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='order',
+    )
+
+    class Meta:
+        indexes = [
+            # Поиск ожидающих заказов по серийному номеру в порядке очереди
+            models.Index(
+                fields=['robot_serial', 'status', 'created_at'],
+                name='order_serial_status_idx',
+            ),
+            models.Index(
+                fields=['robot_serial', 'created_at'],
+                condition=models.Q(status='pending'),
+                name='order_pending_serial_idx',
+            ),
+        ]
     
     @property
     def robot_model(self):
@@ -37,3 +60,58 @@ class Order(models.Model):
     def robot_version(self):
         """Получаем версию робота из серийного номера"""
         return self.robot_serial[3:]
+
+
+class Notification(models.Model):
+    """Исходящее уведомление листа ожидания (outbox).
+
+    Сигнал только ставит запись в очередь, а отправкой занимается
+    команда send_notifications. Уникальность по заказу гарантирует,
+    что клиент не получит два письма об одном заказе.
+    """
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (PENDING, 'В очереди'),
+        (SENDING, 'Отправляется'),
+        (SENT, 'Отправлено'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    order = models.OneToOneField(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='notification',
+    )
+    email = models.CharField(max_length=255)
+    robot_model = models.CharField(max_length=2)
+    robot_version = models.CharField(max_length=2)
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.CharField(max_length=32, blank=True, default='')
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['status', 'next_attempt_at'],
+                name='notification_due_idx',
+            ),
+            # Сбор уведомлений клиента в одно письмо-дайджест
+            models.Index(
+                fields=['email'],
+                condition=models.Q(status='pending'),
+                name='notification_pending_email_idx',
+            ),
+        ]
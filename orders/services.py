@@ -0,0 +1,116 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from customers.services import normalize_email, upsert_customers
+from robots.catalog import is_known_robot
+from robots.models import Robot
+from robots.stock import adjust_stock
+from .models import Order
+from .waitlist import order_changed
+
+
+class OrderValidationError(ValueError):
+    """Ошибка валидации входных данных о заказе"""
+
+
+def validate_order_data(data):
+    """Проверяем данные о заказе и возвращаем очищенные значения"""
+    if not isinstance(data, dict):
+        raise OrderValidationError('Order data must be a JSON object')
+
+    email = data.get('email', '')
+    if not isinstance(email, str):
+        raise OrderValidationError('Invalid email')
+    email = normalize_email(email)
+    try:
+        validate_email(email)
+    except ValidationError:
+        raise OrderValidationError('Invalid email')
+
+    serial = data.get('robot_serial', '')
+    if not isinstance(serial, str) or len(serial) != 5 or serial[2] != '-':
+        raise OrderValidationError('Robot serial must look like R2-D2')
+
+    model, version = serial[:2], serial[3:]
+    if getattr(settings, 'ROBOT_CATALOG_VALIDATION', True) and not is_known_robot(model, version):
+        raise OrderValidationError(f'Unknown robot model/version: {serial}')
+
+    return {'email': email, 'robot_serial': serial}
+
+
+def validate_order_batch(records):
+    """Валидируем пачку заказов, собирая ошибки по каждой позиции"""
+    valid, errors = [], []
+    for index, data in enumerate(records):
+        try:
+            valid.append(validate_order_data(data))
+        except OrderValidationError as e:
+            errors.append({'index': index, 'error': str(e)})
+    return valid, errors
+
+
+def take_free_robots(serial, count):
+    """Блокируем до count свободных роботов серийного номера, старые первыми.
+
+    Заблокированные другим запросом роботы пропускаются (skip_locked),
+    а блокировка ставится только на строки Robot (of=('self',)): свободный
+    робот определяется внешним соединением с заказами.
+    """
+    return list(
+        Robot.objects.filter(
+            serial=serial,
+            order__isnull=True
+        ).select_for_update(
+            skip_locked=True,
+            of=('self',)
+        ).order_by('created', 'id')[:count]
+    )
+
+
+def create_orders(cleaned_records):
+    """Создаем пачку заказов, сразу резервируя роботов со склада.
+
+    Клиенты находятся или создаются одной пачкой по email, заказы
+    вставляются одним bulk_create. Заказ, для которого нашелся свободный
+    робот, сразу получает статус "Зарезервирован", остальные встают в
+    лист ожидания и получат робота при поступлении.
+    """
+    if not cleaned_records:
+        return []
+
+    with transaction.atomic():
+        customer_ids = upsert_customers(data['email'] for data in cleaned_records)
+
+        wanted = Counter(data['robot_serial'] for data in cleaned_records)
+        free = {
+            serial: take_free_robots(serial, count)
+            for serial, count in sorted(wanted.items())
+        }
+
+        orders = []
+        for data in cleaned_records:
+            serial = data['robot_serial']
+            robot = free[serial].pop(0) if free[serial] else None
+            orders.append(Order(
+                customer_id=customer_ids[data['email']],
+                robot_serial=serial,
+                robot=robot,
+                status=Order.RESERVED if robot else Order.PENDING,
+            ))
+        orders = Order.objects.bulk_create(orders)
+
+        reserved = Counter(
+            (order.robot.model, order.robot.version)
+            for order in orders if order.robot
+        )
+        adjust_stock({pair: -count for pair, count in reserved.items()})
+
+    # bulk_create не отправляет сигналы заказа
+    for serial in {order.robot_serial for order in orders if order.status == Order.PENDING}:
+        order_changed(serial, Order.PENDING)
+
+    return orders
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Order
+from .waitlist import order_changed, orders_removed
+
+
+@receiver(post_save, sender=Order)
+def update_waitlist_on_save(sender, instance, **kwargs):
+    """Поддерживаем индекс листа ожидания при создании и смене статуса заказа"""
+    order_changed(instance.robot_serial, instance.status)
+
+
+@receiver(post_delete, sender=Order)
+def update_waitlist_on_delete(sender, instance, **kwargs):
+    """Поддерживаем индекс листа ожидания при удалении заказа"""
+    orders_removed([instance.robot_serial])
@@ -1,3 +1,251 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from datetime import timedelta
+from io import StringIO
+import json
+from customers.models import Customer
+from robots.models import Robot
+from robots.stock import get_available
+from .allocation import allocate_robots
+from .services import create_orders
+from .models import Notification, Order
+from .waitlist import (
+    CacheWaitlistIndex,
+    LocalWaitlistIndex,
+    check_consistency,
+    get_waitlist_index,
+    has_pending_orders,
+    reset_waitlist_index,
+)
 
-# Create your tests here.
+
+class LocalWaitlistIndexTests(TestCase):
+    def test_lru_eviction(self):
+        """Тест вытеснения давно не использованных записей"""
+        index = LocalWaitlistIndex(max_size=2, ttl=60)
+        index.set('R2-D2', True)
+        index.set('X5-LT', False)
+        index.get('R2-D2')
+        index.set('13-XS', False)
+
+        self.assertEqual(len(index), 2)
+        self.assertIsNone(index.get('X5-LT'))
+        self.assertTrue(index.get('R2-D2'))
+
+    def test_ttl_expiry(self):
+        """Тест устаревания записей"""
+        index = LocalWaitlistIndex(max_size=10, ttl=-1)
+        index.set('R2-D2', False)
+        self.assertIsNone(index.get('R2-D2'))
+
+
+class WaitlistIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_waitlist_index()
+        self.addCleanup(reset_waitlist_index)
+        self.customer = Customer.objects.create(email='customer@example.com')
+
+    def test_negative_lookup_skips_database(self):
+        """Тест повторной проверки номера без ожидающих заказов без запросов"""
+        self.assertFalse(has_pending_orders('R2-D2'))
+        with self.assertNumQueries(0):
+            self.assertFalse(has_pending_orders('R2-D2'))
+
+    def test_order_signals_update_index(self):
+        """Тест обновления индекса сигналами заказа"""
+        self.assertFalse(has_pending_orders('R2-D2'))
+
+        order = Order.objects.create(customer=self.customer, robot_serial='R2-D2')
+        with self.assertNumQueries(0):
+            self.assertTrue(has_pending_orders('R2-D2'))
+
+        order.status = Order.COMPLETED
+        order.save()
+        self.assertFalse(has_pending_orders('R2-D2'))
+
+        Order.objects.create(customer=self.customer, robot_serial='R2-D2').delete()
+        self.assertFalse(has_pending_orders('R2-D2'))
+
+    @override_settings(WAITLIST_INDEX_BACKEND='cache')
+    def test_consistency_check(self):
+        """Тест поиска и исправления расхождений индекса с базой"""
+        cache.clear()
+        reset_waitlist_index()
+        self.assertFalse(has_pending_orders('R2-D2'))
+
+        # Изменение в обход сигналов делает индекс несогласованным
+        Order.objects.bulk_create([
+            Order(customer=self.customer, robot_serial='R2-D2')
+        ])
+        self.assertEqual(check_consistency(['R2-D2']), [('R2-D2', False, True)])
+
+        out = StringIO()
+        call_command('check_waitlist_index', fix=True, stdout=out)
+        self.assertIn('R2-D2', out.getvalue())
+        self.assertIsNone(get_waitlist_index().get('R2-D2'))
+        self.assertTrue(has_pending_orders('R2-D2'))
+
+
+class AllocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_waitlist_index()
+        self.addCleanup(reset_waitlist_index)
+        self.first = Customer.objects.create(email='first@example.com')
+        self.second = Customer.objects.create(email='second@example.com')
+        self.late_order = Order.objects.create(
+            customer=self.second,
+            robot_serial='R2-D2',
+            created_at=timezone.now()
+        )
+        self.early_order = Order.objects.create(
+            customer=self.first,
+            robot_serial='R2-D2',
+            created_at=timezone.now() - timedelta(days=1)
+        )
+
+    def create_robots(self, count):
+        return Robot.objects.bulk_create([
+            Robot(serial='R2-D2', model='R2', version='D2', created=timezone.now())
+            for _ in range(count)
+        ])
+
+    def test_fifo_allocation(self):
+        """Тест резервирования робота за самым ранним заказом"""
+        robot, = self.create_robots(1)
+        allocated = allocate_robots([robot])
+
+        self.assertEqual(allocated, [self.early_order])
+        self.early_order.refresh_from_db()
+        self.late_order.refresh_from_db()
+        self.assertEqual(self.early_order.status, Order.RESERVED)
+        self.assertEqual(self.early_order.robot, robot)
+        self.assertEqual(self.late_order.status, Order.PENDING)
+
+    @override_settings(WAITLIST_INDEX_BACKEND='local')
+    def test_stale_negative_index_entry(self):
+        """Тест: устаревшая отрицательная запись индекса не отправляет робота мимо заказа"""
+        reset_waitlist_index()
+        # Этот процесс запомнил отсутствие заказов, а заказ создан в другом процессе
+        get_waitlist_index().set('X5-LT', False)
+        order, = Order.objects.bulk_create([
+            Order(customer=self.first, robot_serial='X5-LT')
+        ])
+
+        robot, = Robot.objects.bulk_create([
+            Robot(serial='X5-LT', model='X5', version='LT', created=timezone.now())
+        ])
+        self.assertEqual(allocate_robots([robot]), [order])
+
+    def create_free_robot(self, serial='X5-LT'):
+        model, version = serial.split('-')
+        robot, = Robot.objects.bulk_create([
+            Robot(serial=serial, model=model, version=version, created=timezone.now())
+        ])
+        return robot
+
+    def test_negative_entry_skips_database(self):
+        """Тест: для номера без заказов повторное резервирование не обращается к базе"""
+        self.assertTrue(get_waitlist_index().shared)
+        self.assertEqual(allocate_robots([self.create_free_robot()]), [])
+
+        robot = self.create_free_robot()
+        with self.assertNumQueries(0):
+            self.assertEqual(allocate_robots([robot]), [])
+
+    def test_order_after_negative_entry(self):
+        """Тест: новый заказ переписывает отрицательную запись общего индекса"""
+        self.assertEqual(allocate_robots([self.create_free_robot()]), [])
+        self.assertIs(get_waitlist_index().get('X5-LT'), False)
+
+        order = Order.objects.create(customer=self.first, robot_serial='X5-LT')
+        self.assertEqual(allocate_robots([self.create_free_robot()]), [order])
+
+    def test_process_local_cache_not_shared(self):
+        """Тест: индексу в локальном кэше процесса отрицательные ответы не доверяются"""
+        self.assertFalse(CacheWaitlistIndex(alias='default').shared)
+
+    def test_robot_taken_by_concurrent_order(self):
+        """Тест гонки: свободного робота забрал заказ со склада до резервирования"""
+        robot, = self.create_robots(1)
+        # Между коммитом робота и резервированием пришел заказ и забрал его
+        order, = create_orders([{'email': 'fast@example.com', 'robot_serial': 'R2-D2'}])
+        self.assertEqual(order.robot, robot)
+
+        self.assertEqual(allocate_robots([robot]), [])
+        self.early_order.refresh_from_db()
+        self.assertEqual(self.early_order.status, Order.PENDING)
+
+    def test_no_double_booking(self):
+        """Тест: лишние роботы остаются свободными, заказ не бронируется дважды"""
+        robots = self.create_robots(3)
+        self.assertEqual(len(allocate_robots(robots[:2])), 2)
+        self.assertEqual(allocate_robots(robots[2:]), [])
+
+        self.assertEqual(Order.objects.filter(status=Order.RESERVED).count(), 2)
+        self.assertEqual(
+            Robot.objects.filter(order__isnull=True).count(), 1
+        )
+
+    def test_only_reserved_customer_is_notified(self):
+        """Тест уведомления только клиента, за которым зарезервирован робот"""
+        Robot.objects.create(model='R2', version='D2', created=timezone.now())
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.order, self.early_order)
+        self.assertEqual(notification.email, 'first@example.com')
+
+
+class OrderBatchAPITests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_waitlist_index()
+        self.addCleanup(reset_waitlist_index)
+        self.url = '/orders/api/batch/'
+        self.existing = Customer.objects.create(email='known@example.com')
+
+    def post_orders(self, records):
+        return self.client.post(self.url, json.dumps(records), content_type='application/json')
+
+    def test_batch_upserts_customers(self):
+        """Тест: клиенты находятся или создаются по email без дубликатов"""
+        response = self.post_orders([
+            {'email': 'Known@example.com', 'robot_serial': 'R2-D2'},
+            {'email': 'new@example.com', 'robot_serial': 'R2-D2'},
+            {'email': 'new@example.com', 'robot_serial': '13-XS'},
+            {'email': 'bad', 'robot_serial': 'R2-D2'},
+        ])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 3)
+        self.assertEqual(response.json()['errors'][0]['index'], 3)
+        self.assertEqual(Customer.objects.count(), 2)
+        self.assertEqual(Order.objects.filter(customer=self.existing).count(), 1)
+        self.assertTrue(has_pending_orders('R2-D2'))
+
+    def test_reserve_from_stock(self):
+        """Тест: свободный робот резервируется сразу, остальные ждут"""
+        with self.captureOnCommitCallbacks(execute=True):
+            robot = Robot.objects.create(model='R2', version='D2', created=timezone.now())
+        self.assertEqual(get_available('R2', 'D2'), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post_orders([
+                {'email': 'a@example.com', 'robot_serial': 'R2-D2'},
+                {'email': 'b@example.com', 'robot_serial': 'R2-D2'},
+            ])
+
+        self.assertEqual(response.json()['reserved'], 1)
+        statuses = [order['status'] for order in response.json()['orders']]
+        self.assertEqual(statuses, [Order.RESERVED, Order.PENDING])
+        self.assertEqual(Order.objects.get(status=Order.RESERVED).robot, robot)
+        self.assertEqual(get_available('R2', 'D2'), 0)
+
+    def test_invalid_batch(self):
+        """Тест отклонения пачки без корректных заказов"""
+        response = self.post_orders([{'email': 'a@example.com', 'robot_serial': 'Z9-Q1'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Order.objects.count(), 0)
@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import OrderBatchCreateView
+
+
+urlpatterns = [
+    path('orders/api/batch/', OrderBatchCreateView.as_view(), name='order-batch-create'),
+]
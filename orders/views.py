@@ -1,3 +1,61 @@
-from django.shortcuts import render
+from django.http import JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from django.utils.decorators import method_decorator
+import json
+from R4C.metrics import phase
+from .services import create_orders, validate_order_batch
 
-# Create your views here.
+
+def serialize_order(order, email):
+    """Представление заказа в ответе API"""
+    return {
+        'id': order.pk,
+        'email': email,
+        'robot_serial': order.robot_serial,
+        'status': order.status,
+    }
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class OrderBatchCreateView(View):
+    """Пакетное создание заказов с резервированием роботов со склада"""
+
+    MAX_BATCH_SIZE = 1000
+
+    def post(self, request, *args, **kwargs):
+        """Валидируем все заказы и сохраняем корректные одной транзакцией"""
+        try:
+            with phase('parse'):
+                records = json.loads(request.body)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return JsonResponse({'error': 'Invalid JSON format'}, status=400)
+
+        if not isinstance(records, list):
+            return JsonResponse({'error': 'Batch must be a JSON array'}, status=400)
+        if len(records) > self.MAX_BATCH_SIZE:
+            return JsonResponse(
+                {'error': f'Batch is limited to {self.MAX_BATCH_SIZE} orders'},
+                status=400
+            )
+
+        with phase('validate'):
+            valid, errors = validate_order_batch(records)
+        if not valid:
+            return JsonResponse(
+                {'created': 0, 'errors': errors},
+                status=400
+            )
+
+        with phase('insert'):
+            orders = create_orders(valid)
+
+        return JsonResponse({
+            'created': len(orders),
+            'reserved': sum(order.status == order.RESERVED for order in orders),
+            'orders': [
+                serialize_order(order, data['email'])
+                for order, data in zip(orders, valid)
+            ],
+            'errors': errors,
+        }, status=201)
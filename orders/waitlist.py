@@ -0,0 +1,223 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from .models import Order
+
+
+class LocalWaitlistIndex:
+    """Индекс серийных номеров с ожидающими заказами внутри процесса.
+
+    Хранит результаты проверок "есть ли ожидающие заказы" в LRU
+    ограниченного размера. Записи живут не дольше ttl секунд, что
+    ограничивает устаревание при изменении заказов в других процессах.
+    Заказы других процессов индекс не видит, поэтому его отрицательные
+    ответы перепроверяются в базе.
+    """
+
+    shared = False
+
+    def __init__(self, max_size=10000, ttl=30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, serial):
+        """Значение из индекса или None, если записи нет или она устарела"""
+        with self._lock:
+            entry = self._entries.get(serial)
+            if entry is None:
+                return None
+            has_pending, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[serial]
+                return None
+            self._entries.move_to_end(serial)
+            return has_pending
+
+    def set(self, serial, has_pending):
+        with self._lock:
+            self._entries[serial] = (has_pending, time.monotonic() + self.ttl)
+            self._entries.move_to_end(serial)
+            # Вытесняем давно не использованные записи
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def add(self, serial, has_pending):
+        """Записываем значение, только если действующей записи нет"""
+        with self._lock:
+            entry = self._entries.get(serial)
+            if entry is not None and entry[1] >= time.monotonic():
+                return False
+        self.set(serial, has_pending)
+        return True
+
+    def invalidate(self, serial):
+        with self._lock:
+            self._entries.pop(serial, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CacheWaitlistIndex:
+    """Индекс в кэше Django WAITLIST_CACHE, разделяемый всеми процессами.
+
+    Заказы всех процессов пишут в него положительные записи и сбрасывают
+    их при смене статуса, поэтому отрицательной записи можно верить.
+    Отрицательные записи добавляются через add и не затирают
+    положительную, записанную заказом между запросом к базе и записью.
+    Размер и вытеснение определяются настройками бэкенда кэша.
+    """
+
+    KEY_PREFIX = 'waitlist:'
+
+    def __init__(self, alias='waitlist', ttl=30):
+        self.cache = caches[alias]
+        self.ttl = ttl
+        # Локальный кэш процесса не видит заказы других процессов
+        self.shared = not isinstance(self.cache, LocMemCache)
+
+    def get(self, serial):
+        return self.cache.get(self.KEY_PREFIX + serial)
+
+    def set(self, serial, has_pending):
+        self.cache.set(self.KEY_PREFIX + serial, has_pending, self.ttl)
+
+    def add(self, serial, has_pending):
+        return self.cache.add(self.KEY_PREFIX + serial, has_pending, self.ttl)
+
+    def invalidate(self, serial):
+        self.cache.delete(self.KEY_PREFIX + serial)
+
+    def clear(self):
+        # Кэш индекса выделенный, поэтому очищается целиком
+        self.cache.clear()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_waitlist_index():
+    """Индекс листа ожидания согласно настройке WAITLIST_INDEX_BACKEND"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            ttl = getattr(settings, 'WAITLIST_INDEX_TTL', 30)
+            if getattr(settings, 'WAITLIST_INDEX_BACKEND', 'cache') == 'cache':
+                _index = CacheWaitlistIndex(
+                    alias=getattr(settings, 'WAITLIST_CACHE', 'waitlist'),
+                    ttl=ttl,
+                )
+            else:
+                _index = LocalWaitlistIndex(
+                    max_size=getattr(settings, 'WAITLIST_INDEX_MAX_SIZE', 10000),
+                    ttl=ttl,
+                )
+        return _index
+
+
+def reset_waitlist_index():
+    """Сбрасываем индекс, чтобы он был создан заново по текущим настройкам"""
+    global _index
+    with _index_lock:
+        if _index is not None:
+            _index.clear()
+        _index = None
+
+
+def query_has_pending(serial):
+    """Проверка наличия ожидающих заказов напрямую в базе"""
+    return Order.objects.filter(robot_serial=serial, status=Order.PENDING).exists()
+
+
+def has_pending_orders(serial):
+    """Есть ли ожидающие заказы на серийный номер"""
+    return serial in find_pending_serials([serial])
+
+
+def find_pending_serials(serials):
+    """Серийные номера, на которые есть ожидающие заказы.
+
+    Отрицательный ответ общего индекса позволяет вообще не обращаться
+    к базе. Номера без записи проверяются в базе одним запросом, как и
+    отрицательные ответы индекса процесса: заказ из другого процесса
+    он не видит, а пропуск такого номера отправил бы робота в свободный
+    остаток мимо заказа.
+    """
+    index = get_waitlist_index()
+    pending = set()
+    unchecked = set()
+    for serial in set(serials):
+        has_pending = index.get(serial)
+        if has_pending:
+            pending.add(serial)
+        elif has_pending is None or not index.shared:
+            unchecked.add(serial)
+
+    if unchecked:
+        found = set(
+            Order.objects.filter(
+                robot_serial__in=unchecked,
+                status=Order.PENDING
+            ).values_list('robot_serial', flat=True).distinct()
+        )
+        for serial in unchecked:
+            if serial in found:
+                index.set(serial, True)
+            else:
+                index.add(serial, False)
+        pending |= found
+
+    return pending
+
+
+def order_changed(serial, status):
+    """Обновляем индекс после сохранения заказа"""
+    index = get_waitlist_index()
+    if status == Order.PENDING:
+        index.set(serial, True)
+    else:
+        # Могли остаться другие ожидающие заказы, поэтому перепроверим в базе
+        index.invalidate(serial)
+
+
+def orders_removed(serials):
+    """Обновляем индекс после удаления или массового изменения заказов.
+
+    queryset.update() и bulk_create не отправляют сигналы, поэтому код,
+    меняющий заказы в обход save(), должен вызывать эту функцию сам.
+    """
+    index = get_waitlist_index()
+    for serial in set(serials):
+        index.invalidate(serial)
+
+
+def check_consistency(serials, fix=False):
+    """Сравниваем записи индекса с базой для указанных серийных номеров.
+
+    Возвращает список расхождений (serial, значение в индексе, в базе).
+    При fix=True расходящиеся записи удаляются из индекса.
+    """
+    index = get_waitlist_index()
+    mismatches = []
+    for serial in serials:
+        cached = index.get(serial)
+        if cached is None:
+            continue
+        actual = query_has_pending(serial)
+        if cached != actual:
+            mismatches.append((serial, cached, actual))
+            if fix:
+                index.invalidate(serial)
+    return mismatches
@@ -1,3 +1,13 @@
 from django.contrib import admin
+from .models import RobotModel, RobotVersion
 
-# Register your models here.
+
+class RobotVersionInline(admin.TabularInline):
+    model = RobotVersion
+    extra = 1
+
+
+@admin.register(RobotModel)
+class RobotModelAdmin(admin.ModelAdmin):
+    list_display = ('code', 'name')
+    inlines = [RobotVersionInline]
@@ -0,0 +1,162 @@
+import csv
+import gzip
+import os
+import uuid
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from orders.models import Order
+from .models import Robot, RobotArchive
+
+
+ARCHIVE_FIELDS = ['id', 'serial', 'model', 'version', 'created', 'order_id']
+
+
+class ArchiveError(Exception):
+    """Архивирование месяца не согласуется с таблицей Robot"""
+
+
+def get_archive_dir():
+    return getattr(
+        settings,
+        'ROBOT_ARCHIVE_DIR',
+        os.path.join(settings.BASE_DIR, 'data', 'archive')
+    )
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def get_archive_cutoff(horizon_days=None):
+    """Первый день месяца, с которого роботы остаются в рабочей таблице.
+
+    Архивируются только целые месяцы, чтобы часть архива не пересекалась
+    с рабочими данными за тот же месяц.
+    """
+    if horizon_days is None:
+        horizon_days = getattr(settings, 'ROBOT_ARCHIVE_HORIZON_DAYS', 365)
+    return month_start(timezone.localdate() - timedelta(days=horizon_days))
+
+
+def get_archivable_robots(end, start=None):
+    """Роботы, произведенные до end (и не раньше start), проданные по завершенным заказам.
+
+    Свободные роботы входят в остатки, а зарезервированные еще ждут
+    выдачи, поэтому они остаются в рабочей таблице независимо от возраста.
+    """
+    robots = Robot.objects.filter(
+        created__lt=local_midnight(end),
+        order__status=Order.COMPLETED,
+    )
+    if start is not None:
+        robots = robots.filter(created__gte=local_midnight(start))
+    return robots
+
+
+def archive_robots(horizon_days=None, batch_size=1000):
+    """Переносим роботов старше горизонта в архив по месяцам.
+
+    Для каждого месяца сначала пишется файл, затем одной транзакцией
+    удаляются строки и регистрируется часть архива. Файл без записи
+    RobotArchive (сбой до коммита) не читается и удаляется.
+    Сводки производства не меняются. Возвращает {месяц: количество}.
+    """
+    cutoff = get_archive_cutoff(horizon_days)
+    first = get_archivable_robots(cutoff).aggregate(first=Min('created'))['first']
+    if first is None:
+        return {}
+
+    archived = {}
+    month = month_start(timezone.localtime(first).date())
+    while month < cutoff:
+        count = archive_month(month, batch_size)
+        if count:
+            archived[month] = count
+        month = next_month(month)
+    return archived
+
+
+def archive_month(month, batch_size=1000):
+    """Архивируем один месяц в новую часть архива"""
+    robots = get_archivable_robots(next_month(month), start=month).values_list(
+        'id', 'serial', 'model', 'version', 'created', 'order__id'
+    ).order_by('id')
+
+    archive_dir = get_archive_dir()
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(
+        archive_dir,
+        f'robots-{month:%Y-%m}-{uuid.uuid4().hex[:8]}.csv.gz'
+    )
+
+    ids = []
+    with gzip.open(path, 'wt', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(ARCHIVE_FIELDS)
+        for pk, serial, model, version, created, order_id in robots.iterator(
+            chunk_size=batch_size
+        ):
+            writer.writerow([pk, serial, model, version, created.isoformat(), order_id])
+            ids.append(pk)
+
+    if not ids:
+        os.remove(path)
+        return 0
+
+    try:
+        with transaction.atomic():
+            deleted = 0
+            for start in range(0, len(ids), batch_size):
+                # Связь заказа с роботом обнуляется (SET_NULL): заказ
+                # сохраняет robot_serial, а номер заказа остается в архиве
+                _, per_model = Robot.objects.filter(
+                    pk__in=ids[start:start + batch_size]
+                ).delete()
+                deleted += per_model.get(Robot._meta.label, 0)
+            if deleted != len(ids):
+                raise ArchiveError(
+                    f'{month:%Y-%m}: archived {len(ids)} robots, deleted {deleted}'
+                )
+            RobotArchive.objects.create(month=month, file_path=path, count=len(ids))
+    except Exception:
+        os.remove(path)
+        raise
+
+    return len(ids)
+
+
+def iter_archived_robots(since=None):
+    """Строки архива (словари с полями ARCHIVE_FIELDS), начиная с даты since"""
+    parts = RobotArchive.objects.order_by('month', 'id')
+    if since is not None:
+        parts = parts.filter(month__gte=month_start(since))
+
+    for part in parts.iterator():
+        with gzip.open(part.file_path, 'rt', newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                row['created'] = datetime.fromisoformat(row['created'])
+                yield row
+
+
+def aggregate_archived_by_day(since=None):
+    """Агрегация архивных роботов по модели, версии и дню производства"""
+    counts = Counter()
+    for row in iter_archived_robots(since):
+        day = timezone.localtime(row['created']).date()
+        if since is None or day >= since:
+            counts[row['model'], row['version'], day] += 1
+    return counts
@@ -0,0 +1,415 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.db import OperationalError, connections
+from django.http import JsonResponse
+from django.test import Client
+from django.utils import timezone
+
+from R4C.json_codec import JSONResponse, StdlibCodec, get_codec
+
+from customers.models import Customer
+from orders.models import Order
+from orders.waitlist import orders_removed
+from .catalog import catalog_cache
+from .models import Robot, RobotModel, RobotVersion, make_serial
+from .notifications import dispatch_pending_notifications
+from .reports import (
+    PERIOD_HEADERS,
+    get_period_data,
+    get_report_window,
+    render_report,
+    write_workbook,
+)
+from .rollups import rebuild_daily
+from .services import (
+    DATETIME_FORMAT,
+    bulk_create_robots,
+    compile_robot_validator,
+    parse_datetime,
+    serialize_robot,
+    validate_robot_batch,
+)
+from .signals import allocate_and_notify
+from .stock import rebuild_stock
+
+
+@contextmanager
+def benchmark_database(alias='default'):
+    """Временная база для бенчмарков, удаляемая после завершения.
+
+    Для SQLite база создается в файле, а не в памяти, чтобы ее видели
+    все потоки и процессы бенчмарка.
+    """
+    connection = connections[alias]
+    if connection.vendor == 'sqlite':
+        fd, path = tempfile.mkstemp(suffix='.sqlite3', prefix='bench_')
+        os.close(fd)
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = path
+
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    try:
+        yield connection
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+class Timer:
+    """Секундомер для измерения участков бенчмарка"""
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.elapsed = None
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.started
+
+
+# Масштабы синтетических данных: количество роботов в базе
+SCALES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+
+# Отслеживаемые метрики: True - чем больше, тем лучше
+METRICS = {
+    'single_create_p50_ms': False,
+    'single_create_p99_ms': False,
+    'batch_ingest_records_per_second': True,
+    'report_seconds': False,
+    'report_peak_memory_mb': False,
+    'period_report_seconds': False,
+    'period_report_peak_memory_mb': False,
+    'fanout_allocate_seconds': False,
+    'fanout_dispatch_seconds': False,
+}
+
+BENCH_PAIRS = [(f'B{i}', f'V{j}') for i in range(10) for j in range(10)]
+
+
+def percentile(values, p):
+    """Перцентиль p (0..1) по отсортированному списку"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def seed_catalog():
+    """Синтетические модели и версии в каталоге продукции"""
+
+    for model_code in sorted({model for model, _ in BENCH_PAIRS}):
+        model, _ = RobotModel.objects.get_or_create(code=model_code)
+        RobotVersion.objects.bulk_create(
+            [
+                RobotVersion(model=model, code=version)
+                for code, version in BENCH_PAIRS if code == model_code
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def seed_robots(count, days=365, batch_size=10000):
+    """Синтетическая история производства за days дней.
+
+    Роботы пишутся bulk_create без сигналов, сводки пересчитываются после.
+    """
+
+    now = timezone.now()
+    step = timedelta(days=days) / max(count, 1)
+    for start in range(0, count, batch_size):
+        robots = []
+        for i in range(start, min(start + batch_size, count)):
+            model, version = BENCH_PAIRS[i % len(BENCH_PAIRS)]
+            robots.append(Robot(
+                serial=make_serial(model, version),
+                model=model,
+                version=version,
+                created=now - step * i,
+            ))
+        Robot.objects.bulk_create(robots)
+
+    rebuild_daily(batch_size=batch_size)
+    rebuild_stock()
+
+
+def seed_orders(count, batch_size=10000):
+    """Синтетические клиенты и завершенные заказы"""
+
+    customers = Customer.objects.bulk_create(
+        [Customer(email=f'bench{i}@example.com') for i in range(max(count // 10, 1))],
+        batch_size=batch_size,
+    )
+    Order.objects.bulk_create(
+        [
+            Order(
+                customer=customers[i % len(customers)],
+                robot_serial='-'.join(BENCH_PAIRS[i % len(BENCH_PAIRS)]),
+                status=Order.COMPLETED,
+            )
+            for i in range(count)
+        ],
+        batch_size=batch_size,
+    )
+
+
+def measure_single_create(requests=200):
+    """Задержка создания одного робота через API"""
+
+    client = Client()
+    latencies = []
+    for i in range(requests):
+        model, version = BENCH_PAIRS[i % len(BENCH_PAIRS)]
+        body = json.dumps({'model': model, 'version': version, 'created': '2023-01-01 00:00:00'})
+        with Timer() as timer:
+            client.post('/robots/api/', body, content_type='application/json')
+        latencies.append(timer.elapsed * 1000)
+
+    latencies.sort()
+    return {
+        'single_create_p50_ms': round(percentile(latencies, 0.50), 3),
+        'single_create_p99_ms': round(percentile(latencies, 0.99), 3),
+    }
+
+
+def measure_batch_ingest(batches=20, batch_size=1000):
+    """Пропускная способность пакетной загрузки"""
+
+    records = [
+        {'model': model, 'version': version, 'created': '2023-01-01 00:00:00'}
+        for model, version in (
+            BENCH_PAIRS[i % len(BENCH_PAIRS)] for i in range(batch_size)
+        )
+    ]
+    with Timer() as timer:
+        for _ in range(batches):
+            valid, _ = validate_robot_batch(records)
+            bulk_create_robots(valid)
+
+    return {
+        'batch_ingest_records_per_second': round(batches * batch_size / timer.elapsed, 1),
+    }
+
+
+def _measure(func):
+    """Время выполнения и пиковый объем выделенной памяти"""
+    with Timer() as timer:
+        func()
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return round(timer.elapsed, 4), round(peak / 1024 / 1024, 3)
+
+
+def measure_reports():
+    """Генерация недельного отчета и отчета за год по месяцам"""
+
+    def weekly():
+        render_report(*get_report_window()).close()
+
+    today = timezone.localdate()
+    params = {
+        'start': (today - timedelta(days=365)).isoformat(),
+        'end': today.isoformat(),
+        'models': [],
+        'granularity': 'month',
+    }
+
+    def period():
+        with tempfile.TemporaryFile() as output:
+            write_workbook(get_period_data(params).iterator(), output, headers=PERIOD_HEADERS)
+
+    report_seconds, report_memory = _measure(weekly)
+    period_seconds, period_memory = _measure(period)
+    return {
+        'report_seconds': report_seconds,
+        'report_peak_memory_mb': report_memory,
+        'period_report_seconds': period_seconds,
+        'period_report_peak_memory_mb': period_memory,
+    }
+
+
+def measure_fanout(orders=500):
+    """Стоимость рассылки: резервирование под ожидающие заказы и отправка писем"""
+
+    model, version = BENCH_PAIRS[0]
+    customer = Customer.objects.create(email='fanout@example.com')
+    Order.objects.bulk_create([
+        Order(customer=customer, robot_serial=make_serial(model, version))
+        for _ in range(orders)
+    ])
+    # bulk_create не отправляет сигналы заказа
+    orders_removed([make_serial(model, version)])
+    robots = Robot.objects.bulk_create([
+        Robot(serial=make_serial(model, version), model=model, version=version, created=timezone.now())
+        for _ in range(orders)
+    ])
+
+    with Timer() as allocate_timer:
+        allocate_and_notify(robots)
+    with Timer() as dispatch_timer:
+        dispatch_pending_notifications()
+
+    return {
+        'fanout_allocate_seconds': round(allocate_timer.elapsed, 4),
+        'fanout_dispatch_seconds': round(dispatch_timer.elapsed, 4),
+    }
+
+
+def measure_concurrent_writes(workers, records=500, batch_size=1):
+    """Пропускная способность записи роботов несколькими потоками.
+
+    Каждый поток пишет records роботов через свое соединение: по одному
+    через ORM с сигналами (batch_size=1) или пакетами bulk_create_robots.
+    Ошибки блокировки считаются, а не прерывают прогон.
+    """
+    created = [0] * workers
+    errors = [0] * workers
+
+    def writer(index):
+        try:
+            for start in range(0, records, batch_size):
+                model, version = BENCH_PAIRS[(index + start) % len(BENCH_PAIRS)]
+                size = min(batch_size, records - start)
+                try:
+                    if size == 1:
+                        Robot.objects.create(model=model, version=version, created=timezone.now())
+                    else:
+                        bulk_create_robots([
+                            {
+                                'serial': make_serial(model, version),
+                                'model': model,
+                                'version': version,
+                                'created': timezone.now(),
+                            }
+                            for _ in range(size)
+                        ])
+                    created[index] += size
+                except OperationalError:
+                    # Например, "database is locked" на SQLite
+                    errors[index] += 1
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(workers)]
+    with Timer() as timer:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    return {
+        'workers': workers,
+        'created': sum(created),
+        'errors': sum(errors),
+        'seconds': round(timer.elapsed, 3),
+        'records_per_second': round(sum(created) / timer.elapsed, 1),
+    }
+
+
+def _cpu_time(func, repeat):
+    """Минимальное процессорное время func за repeat запусков"""
+    best = None
+    for _ in range(repeat):
+        started = time.process_time()
+        func()
+        elapsed = time.process_time() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure_codec_cpu(records=10000, repeat=5):
+    """Процессорное время на запись на этапах разбора, проверки и ответа.
+
+    Для каждого этапа сравнивается стандартный путь (json, проверка
+    записи с чтением настроек и каталога, strptime, JsonResponse со
+    strftime) с текущим (кодек JSON_CODEC, собранный один раз валидатор,
+    fromisoformat, JSONResponse). Значения - микросекунды на запись.
+    """
+    stdlib, codec = StdlibCodec(), get_codec()
+    pairs = [BENCH_PAIRS[i % len(BENCH_PAIRS)] for i in range(records)]
+    data = [
+        {'model': model, 'version': version, 'created': f'2023-01-01 00:00:{i % 60:02d}'}
+        for i, (model, version) in enumerate(pairs)
+    ]
+    body = json.dumps(data).encode()
+    dates = [record['created'] for record in data]
+    robots = [
+        Robot(serial=make_serial(model, version), model=model, version=version,
+              created=datetime(2023, 1, 1, 12, 30))
+        for model, version in pairs
+    ]
+
+    def respond_stdlib():
+        for robot in robots:
+            JsonResponse({
+                'serial': robot.serial,
+                'model': robot.model,
+                'version': robot.version,
+                'created': robot.created.strftime(DATETIME_FORMAT),
+            }, status=201)
+
+    def respond_fast():
+        for robot in robots:
+            JSONResponse(serialize_robot(robot), status=201)
+
+    stages = {
+        'decode': (lambda: stdlib.loads(body), lambda: codec.loads(body)),
+        'dates': (
+            lambda: [datetime.strptime(value, DATETIME_FORMAT) for value in dates],
+            lambda: [parse_datetime(value) for value in dates],
+        ),
+        'validate': (
+            lambda: [
+                compile_robot_validator(catalog_cache.get_pairs())(record)
+                for record in data
+            ],
+            lambda: validate_robot_batch(data),
+        ),
+        'respond': (respond_stdlib, respond_fast),
+    }
+
+    result = {'codec': codec.name, 'records': records}
+    baseline_total = fast_total = 0.0
+    for stage, (baseline, fast) in stages.items():
+        baseline_us = _cpu_time(baseline, repeat) / records * 1e6
+        fast_us = _cpu_time(fast, repeat) / records * 1e6
+        baseline_total += baseline_us
+        fast_total += fast_us
+        result[stage] = {'baseline_us': round(baseline_us, 3), 'fast_us': round(fast_us, 3)}
+
+    result['total'] = {
+        'baseline_us': round(baseline_total, 3),
+        'fast_us': round(fast_total, 3),
+        'saved_us': round(baseline_total - fast_total, 3),
+    }
+    return result
+
+
+def compare_results(metrics, baseline, tolerance):
+    """Ищем метрики, ухудшившиеся относительно базовых больше чем на tolerance"""
+    regressions = []
+    for name, higher_is_better in METRICS.items():
+        current, previous = metrics.get(name), baseline.get(name)
+        if current is None or not previous:
+            continue
+
+        change = (current - previous) / previous
+        if higher_is_better:
+            change = -change
+        if change > tolerance:
+            regressions.append(
+                f'{name}: {previous} -> {current} ({change:+.1%} хуже)'
+            )
+    return regressions
@@ -0,0 +1,69 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import DataVersion, RobotVersion
+from .versions import bump_version, get_version
+
+
+class CatalogCache:
+    """Множество допустимых пар модель/версия в памяти процесса.
+
+    Каталог загружается из базы один раз и сбрасывается сигналами при
+    его изменении. Изменения из других процессов отслеживаются по
+    версии каталога в базе (DataVersion), которая читается не чаще раза
+    в ROBOT_CATALOG_RECHECK секунд, поэтому проверка на горячем пути
+    не обращается к базе.
+    """
+
+    def __init__(self):
+        self._pairs = None
+        self._generation = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def contains(self, model, version):
+        return (model, version) in self.get_pairs()
+
+    def get_pairs(self):
+        now = time.monotonic()
+        recheck = getattr(settings, 'ROBOT_CATALOG_RECHECK', 5)
+        pairs = self._pairs
+
+        if pairs is not None and now - self._checked_at < recheck:
+            return pairs
+
+        with self._lock:
+            generation, _ = get_version(DataVersion.CATALOG)
+            if self._pairs is None or generation != self._generation:
+                self._pairs = frozenset(
+                    RobotVersion.objects.values_list('model__code', 'code')
+                )
+                self._generation = generation
+            self._checked_at = now
+            return self._pairs
+
+    def invalidate(self):
+        """Сбрасываем каталог процесса; следующая проверка перечитает его"""
+        with self._lock:
+            self._pairs = None
+
+
+catalog_cache = CatalogCache()
+
+
+def mark_catalog_changed():
+    """Отмечаем изменение каталога для всех процессов.
+
+    Версия меняется в транзакции изменения, а каталог этого процесса
+    сбрасывается сразу после ее коммита.
+    """
+    bump_version(DataVersion.CATALOG)
+    transaction.on_commit(catalog_cache.invalidate)
+
+
+def is_known_robot(model, version):
+    """Есть ли пара модель/версия в каталоге продукции"""
+    return catalog_cache.contains(model, version)
@@ -0,0 +1,210 @@
+"""
+Выгрузка сводки производства в разных форматах.
+
+Все форматы получают строки одной агрегации (get_report_data или
+get_period_data), прочитанной курсором порциями. Построчные форматы
+(CSV, NDJSON) отдаются потоком с постоянным расходом памяти, файловые
+(XLSX, Parquet) пишутся в файл по мере чтения строк.
+"""
+
+import csv
+import json
+import tempfile
+from datetime import date
+
+from django.conf import settings
+
+from .reports import XLSX_CONTENT_TYPE, get_report_data, write_workbook
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet доступен только с установленным pyarrow
+    pyarrow = None
+
+
+BUFFER_SIZE = 64 * 1024
+
+# Поля строк сводки в порядке вывода: недельный отчет и отчет за период
+WEEKLY_FIELDS = ['model', 'version', 'count']
+PERIOD_FIELDS = ['model', 'version', 'period', 'count']
+
+
+class ExportFormatError(ValueError):
+    """Запрошен неизвестный или недоступный формат выгрузки"""
+
+
+class ExportUnavailableError(ExportFormatError):
+    """Формат известен, но его библиотека не установлена"""
+
+
+def to_json_value(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает строку вместо записи"""
+
+    def write(self, value):
+        return value
+
+
+def buffered(chunks):
+    """Склеиваем мелкие строки в порции до BUFFER_SIZE байт"""
+    buffer, size = [], 0
+    for chunk in chunks:
+        data = chunk.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= BUFFER_SIZE:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+class CSVExporter:
+    content_type = 'text/csv; charset=utf-8'
+    extension = 'csv'
+    streaming = True
+
+    def stream(self, rows, fields):
+        """CSV с заголовком из имен полей, в том числе для пустой сводки"""
+        writer = csv.writer(Echo())
+
+        def lines():
+            yield writer.writerow(fields)
+            for row in rows:
+                yield writer.writerow([to_json_value(row[field]) for field in fields])
+
+        return buffered(lines())
+
+
+class NDJSONExporter:
+    content_type = 'application/x-ndjson'
+    extension = 'ndjson'
+    streaming = True
+
+    def stream(self, rows, fields):
+        """Одна JSON-строка на строку сводки"""
+        return buffered(
+            json.dumps(
+                {field: to_json_value(row[field]) for field in fields},
+                ensure_ascii=False
+            ) + '\n'
+            for row in rows
+        )
+
+
+class XLSXExporter:
+    content_type = XLSX_CONTENT_TYPE
+    extension = 'xlsx'
+    streaming = False
+
+    def write(self, rows, output, fields, **kwargs):
+        write_workbook(rows, output, **kwargs)
+
+
+class ParquetExporter:
+    content_type = 'application/vnd.apache.parquet'
+    extension = 'parquet'
+    streaming = False
+
+    # Строк в одной группе строк Parquet - граница расхода памяти
+    ROW_GROUP_SIZE = 10000
+
+    def get_schema(self, fields):
+        types = {
+            'model': pyarrow.string(),
+            'version': pyarrow.string(),
+            'period': pyarrow.date32(),
+            'count': pyarrow.int64(),
+        }
+        return pyarrow.schema([(field, types[field]) for field in fields])
+
+    def write(self, rows, output, fields):
+        """Parquet, записываемый группами строк по мере чтения сводки"""
+        writer = pyarrow.parquet.ParquetWriter(output, self.get_schema(fields))
+        batch = []
+
+        def flush():
+            columns = {field: [row[field] for row in batch] for field in fields}
+            writer.write_table(pyarrow.table(columns, schema=writer.schema))
+            batch.clear()
+
+        try:
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= self.ROW_GROUP_SIZE:
+                    flush()
+            if batch:
+                flush()
+        finally:
+            writer.close()
+
+
+EXPORTERS = {
+    'xlsx': XLSXExporter,
+    'csv': CSVExporter,
+    'ndjson': NDJSONExporter,
+    'parquet': ParquetExporter,
+}
+
+
+def write_export(exporter, rows, output, fields=WEEKLY_FIELDS, **kwargs):
+    """Записываем выгрузку в файл: построчные форматы - по мере генерации.
+
+    kwargs (заголовки, сообщение об отсутствии данных) нужны только XLSX.
+    """
+    if exporter.streaming:
+        for chunk in exporter.stream(rows, fields):
+            output.write(chunk)
+    elif isinstance(exporter, XLSXExporter):
+        exporter.write(rows, output, fields, **kwargs)
+    else:
+        exporter.write(rows, output, fields)
+
+
+def get_available_formats():
+    """Форматы, доступные в текущем окружении"""
+    return [name for name in EXPORTERS if name != 'parquet' or pyarrow is not None]
+
+
+def get_exporter(name):
+    if name in EXPORTERS and name not in get_available_formats():
+        raise ExportUnavailableError(f'{name} export requires pyarrow to be installed')
+    if name not in get_available_formats():
+        raise ExportFormatError(
+            f"format must be one of: {', '.join(get_available_formats())}"
+        )
+    return EXPORTERS[name]()
+
+
+def select_format(request, default='xlsx'):
+    """Формат выгрузки из параметра format или заголовка Accept.
+
+    Параметр важнее заголовка; если заголовок не называет ни одного
+    доступного формата, используется формат по умолчанию.
+    """
+    name = request.GET.get('format')
+    if name:
+        return get_exporter(name.lower())
+
+    accepted = request.headers.get('Accept', '')
+    for media_type in accepted.split(','):
+        media_type = media_type.split(';')[0].strip()
+        for name in get_available_formats():
+            if EXPORTERS[name].content_type.split(';')[0] == media_type:
+                return get_exporter(name)
+
+    return get_exporter(default)
+
+
+def render_export(exporter, start_date, end_date):
+    """Недельный отчет файлового формата во временном файле, перемотанном в начало"""
+    output = tempfile.SpooledTemporaryFile(
+        max_size=getattr(settings, 'REPORT_SPOOL_MAX_MEMORY', 1024 * 1024)
+    )
+    write_export(exporter, get_report_data(start_date, end_date).iterator(), output)
+    output.seek(0)
+    return output
@@ -0,0 +1,106 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Robot
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 64
+
+
+class IdempotencyKeyError(ValueError):
+    """Некорректный заголовок Idempotency-Key"""
+
+
+def get_event_key(event_id):
+    """Ключ кэша события (хэш, чтобы не зависеть от символов в event_id)"""
+    return 'robot-event:' + hashlib.sha1(event_id.encode()).hexdigest()
+
+
+def get_dedup_ttl():
+    return getattr(settings, 'ROBOT_EVENT_DEDUP_TTL', 3600)
+
+
+def get_idempotency_key(request):
+    """Значение заголовка Idempotency-Key или None"""
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is None:
+        return None
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise IdempotencyKeyError(
+            f'{IDEMPOTENCY_HEADER} must be 1-{MAX_KEY_LENGTH} characters long'
+        )
+    return key
+
+
+def apply_idempotency_key(records, key):
+    """Проставляем записям пачки event_id вида "<ключ>:<позиция>".
+
+    Повтор той же пачки с тем же ключом дает те же идентификаторы.
+    Явный event_id записи имеет приоритет.
+    """
+    if key is None:
+        return records
+    return [
+        {'event_id': f'{key}:{index}', **data} if isinstance(data, dict) else data
+        for index, data in enumerate(records)
+    ]
+
+
+def remember_events(robots):
+    """Запоминаем обработанные события в окне дедупликации"""
+    events = {
+        get_event_key(robot.event_id): robot.pk
+        for robot in robots if robot.event_id
+    }
+    if events:
+        cache.set_many(events, get_dedup_ttl())
+
+
+def find_seen_events(event_ids):
+    """Уже обработанные события: {event_id: id робота}.
+
+    Сначала проверяется окно в кэше, промахи - одним запросом по
+    уникальному индексу event_id.
+    """
+    event_ids = set(event_ids)
+    if not event_ids:
+        return {}
+
+    keys = {get_event_key(event_id): event_id for event_id in event_ids}
+    seen = {keys[key]: pk for key, pk in cache.get_many(keys).items()}
+
+    missing = event_ids - seen.keys()
+    if missing:
+        found = dict(
+            Robot.objects.filter(event_id__in=missing).values_list('event_id', 'pk')
+        )
+        if found:
+            cache.set_many(
+                {get_event_key(event_id): pk for event_id, pk in found.items()},
+                get_dedup_ttl()
+            )
+        seen.update(found)
+
+    return seen
+
+
+def skip_seen_events(cleaned_records):
+    """Убираем из пачки записи с уже обработанными или повторяющимися event_id"""
+    seen = find_seen_events(
+        data['event_id'] for data in cleaned_records if data.get('event_id')
+    )
+
+    fresh = []
+    for data in cleaned_records:
+        event_id = data.get('event_id')
+        if event_id:
+            if event_id in seen:
+                continue
+            # Повтор внутри одной пачки
+            seen[event_id] = None
+        fresh.append(data)
+    return fresh
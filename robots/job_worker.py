@@ -0,0 +1,35 @@
+"""
+Точки входа процессов пула генерации отчетов.
+
+Пул запускает процессы через spawn, и дочерний процесс импортирует этот
+модуль до настройки Django. Поэтому модели и robots.jobs импортируются
+только внутри функций, после django.setup().
+"""
+
+import os
+
+import django
+from django.db import connections
+
+
+def init_worker(database_name, jobs_dir):
+    """Инициализация процесса пула: свой Django и свои соединения с БД.
+
+    Процесс работает с той же базой и каталогом отчетов, что и
+    создавший пул процесс, даже если тот изменил их после запуска.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'R4C.settings')
+    django.setup()
+
+    from django.conf import settings
+
+    connections['default'].settings_dict['NAME'] = database_name
+    settings.REPORT_JOBS_DIR = jobs_dir
+    connections.close_all()
+
+
+def run_job(job_id):
+    """Строим отчет по задаче в процессе пула"""
+    from .jobs import run_report_job
+
+    run_report_job(job_id)
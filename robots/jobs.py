@@ -0,0 +1,181 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+
+from .models import ReportJob
+from .exports import PERIOD_FIELDS, get_exporter, write_export
+from .job_worker import init_worker, run_job
+from .reports import PERIOD_HEADERS, get_period_data
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_params_hash(params):
+    """Хэш каноничных параметров отчета для поиска дублей"""
+    encoded = json.dumps(params, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def get_job_timeout():
+    """Время, после которого незавершенная задача считается потерянной"""
+    return timedelta(seconds=getattr(settings, 'REPORT_JOB_TIMEOUT', 600))
+
+
+def fail_stale_report_jobs(params_hash=None):
+    """Помечаем ошибочными задачи, не завершившиеся за REPORT_JOB_TIMEOUT.
+
+    Такие задачи остаются в работе, если процесс или пул перезапустился,
+    не выполнив их: обработчик падения пула погибает вместе с процессом.
+    """
+    timeout = get_job_timeout()
+    stale = ReportJob.objects.filter(
+        status__in=[ReportJob.PENDING, ReportJob.RUNNING],
+        created_at__lt=timezone.now() - timeout
+    )
+    if params_hash is not None:
+        stale = stale.filter(params_hash=params_hash)
+    return stale.update(
+        status=ReportJob.FAILED,
+        error=f'Задача не завершилась за {int(timeout.total_seconds())} секунд',
+        finished_at=timezone.now()
+    )
+
+
+def submit_report_job(params):
+    """Создаем задачу на отчет или возвращаем такую же, уже находящуюся в работе.
+
+    Зависшие задачи с теми же параметрами предварительно помечаются
+    ошибочными и не переиспользуются.
+    """
+    params_hash = get_params_hash(params)
+    fail_stale_report_jobs(params_hash)
+    in_flight = ReportJob.objects.filter(
+        params_hash=params_hash,
+        status__in=[ReportJob.PENDING, ReportJob.RUNNING]
+    )
+
+    job = in_flight.first()
+    if job is not None:
+        return job, False
+
+    try:
+        with transaction.atomic():
+            job = ReportJob.objects.create(params=params, params_hash=params_hash)
+    except IntegrityError:
+        # Такую же задачу одновременно создал другой запрос
+        return in_flight.get(), False
+
+    transaction.on_commit(lambda: schedule_report_job(job.pk))
+    return job, True
+
+
+def get_executor():
+    """Пул процессов генерации отчетов, создается при первом обращении"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.REPORT_JOB_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker,
+                initargs=(
+                    connections['default'].settings_dict['NAME'],
+                    settings.REPORT_JOBS_DIR,
+                ),
+            )
+        return _executor
+
+
+def reset_executor(executor=None):
+    """Останавливаем пул; следующая задача создаст новый.
+
+    Если передан executor, сбрасывается только он: пул мог уже быть
+    заменен другим потоком.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None or executor not in (None, _executor):
+            return
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def schedule_report_job(job_id):
+    """Отправляем задачу в пул процессов.
+
+    При REPORT_JOB_WORKERS = 0 отчет строится сразу в текущем процессе.
+    """
+    if not settings.REPORT_JOB_WORKERS:
+        run_report_job(job_id)
+        return
+
+    executor = get_executor()
+    try:
+        future = executor.submit(run_job, job_id)
+    except BrokenProcessPool:
+        # Процесс пула упал раньше; сломанный пул задач больше не принимает
+        reset_executor(executor)
+        executor = get_executor()
+        future = executor.submit(run_job, job_id)
+    future.add_done_callback(lambda f: _handle_crash(job_id, executor, f))
+
+
+def _handle_crash(job_id, executor, future):
+    """Помечаем задачу ошибочной, если процесс пула упал, не завершив ее"""
+    error = future.exception()
+    if error is None:
+        return
+    if isinstance(error, BrokenProcessPool):
+        reset_executor(executor)
+
+    ReportJob.objects.filter(
+        pk=job_id,
+        status__in=[ReportJob.PENDING, ReportJob.RUNNING]
+    ).update(status=ReportJob.FAILED, error=repr(error), finished_at=timezone.now())
+    connections.close_all()
+
+
+def run_report_job(job_id):
+    """Строим отчет по задаче и сохраняем его в REPORT_JOBS_DIR"""
+    started = ReportJob.objects.filter(
+        pk=job_id, status=ReportJob.PENDING
+    ).update(status=ReportJob.RUNNING)
+    if not started:
+        return
+
+    job = ReportJob.objects.get(pk=job_id)
+    os.makedirs(settings.REPORT_JOBS_DIR, exist_ok=True)
+
+    try:
+        exporter = get_exporter(job.params.get('format', 'xlsx'))
+        path = os.path.join(settings.REPORT_JOBS_DIR, f'{job.pk}.{exporter.extension}')
+        with open(path, 'wb') as output:
+            write_export(
+                exporter,
+                get_period_data(job.params).iterator(),
+                output,
+                fields=PERIOD_FIELDS,
+                headers=PERIOD_HEADERS,
+                empty_message='Нет данных за выбранный период'
+            )
+    except Exception as e:
+        ReportJob.objects.filter(pk=job_id, status=ReportJob.RUNNING).update(
+            status=ReportJob.FAILED, error=str(e), finished_at=timezone.now()
+        )
+        return
+
+    # Задача, уже признанная зависшей, не возвращается в готовые
+    ReportJob.objects.filter(pk=job_id, status=ReportJob.RUNNING).update(
+        status=ReportJob.DONE, file_path=path, finished_at=timezone.now()
+    )
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from robots.archive import archive_robots, get_archive_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        'Перенос роботов, проданных по завершенным заказам, старше горизонта '
+        'в сжатые CSV-файлы по месяцам. Сводки производства не меняются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horizon-days',
+            type=int,
+            default=None,
+            help='Возраст в днях (по умолчанию ROBOT_ARCHIVE_HORIZON_DAYS)'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        cutoff = get_archive_cutoff(options['horizon_days'])
+        self.stdout.write(f'Архивируются месяцы до {cutoff:%Y-%m}')
+
+        archived = archive_robots(options['horizon_days'], options['batch_size'])
+        for month, count in archived.items():
+            self.stdout.write(f'{month:%Y-%m}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Роботов в архиве: {sum(archived.values())}'))
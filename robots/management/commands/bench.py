@@ -0,0 +1,106 @@
+import json
+import platform
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from robots.benchmarks import (
+    SCALES,
+    Timer,
+    benchmark_database,
+    compare_results,
+    measure_batch_ingest,
+    measure_fanout,
+    measure_reports,
+    measure_single_create,
+    seed_catalog,
+    seed_orders,
+    seed_robots,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Бенчмарки загрузки, отчетов и рассылки на синтетических данных. '
+        'Работает во временной базе; с --baseline завершается ошибкой, '
+        'если метрика ухудшилась больше чем на --tolerance.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            default='10k',
+            help=f"Количество роботов: {', '.join(SCALES)} или число"
+        )
+        parser.add_argument('--output', default=None, help='Записать результат в JSON')
+        parser.add_argument('--baseline', default=None, help='JSON с базовыми результатами')
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.2,
+            help='Допустимое ухудшение метрики, доля (0.2 = 20%%)'
+        )
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--fanout-orders', type=int, default=500)
+
+    def handle(self, *args, **options):
+        scale = options['scale']
+        try:
+            robots = SCALES[scale] if scale in SCALES else int(scale)
+        except ValueError:
+            raise CommandError(f"--scale must be one of {', '.join(SCALES)} or an integer")
+
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)['metrics']
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f'Cannot read baseline: {e}')
+
+        setup_test_environment()
+        try:
+            with benchmark_database():
+                cache.clear()
+                result = self.run(robots, options)
+        finally:
+            teardown_test_environment()
+            cache.clear()
+
+        self.stdout.write(json.dumps(result, indent=2))
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(result, f, indent=2)
+
+        if baseline is not None:
+            regressions = compare_results(result['metrics'], baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('Регрессии производительности:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def run(self, robots, options):
+        self.stderr.write(f'Заполнение базы: {robots} роботов...')
+        with Timer() as seed_timer:
+            seed_catalog()
+            seed_robots(robots)
+            seed_orders(max(robots // 100, 1))
+
+        metrics = {}
+        for name, measure in [
+            ('single create', lambda: measure_single_create(options['requests'])),
+            ('batch ingest', measure_batch_ingest),
+            ('reports', measure_reports),
+            ('fan-out', lambda: measure_fanout(options['fanout_orders'])),
+        ]:
+            self.stderr.write(f'Измерение: {name}...')
+            metrics.update(measure())
+
+        return {
+            'scale': robots,
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'seed_seconds': round(seed_timer.elapsed, 2),
+            'metrics': metrics,
+        }
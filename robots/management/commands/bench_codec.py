@@ -0,0 +1,31 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from robots.benchmarks import benchmark_database, measure_codec_cpu, seed_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        'Микробенчмарк процессорного времени на запись при загрузке: '
+        'разбор JSON, проверка, разбор дат и сборка ответа, '
+        'стандартный путь против текущего кодека JSON_CODEC.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5, help='Берется лучший из запусков')
+        parser.add_argument('--output', default=None)
+
+    def handle(self, *args, **options):
+        if options['records'] < 1 or options['repeat'] < 1:
+            raise CommandError('--records and --repeat must be positive')
+
+        with benchmark_database():
+            seed_catalog()
+            result = measure_codec_cpu(options['records'], options['repeat'])
+
+        self.stdout.write(json.dumps(result, indent=2))
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(result, f, indent=2)
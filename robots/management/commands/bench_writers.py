@@ -0,0 +1,53 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from robots.benchmarks import benchmark_database, measure_concurrent_writes
+
+
+class Command(BaseCommand):
+    help = (
+        'Бенчмарк конкурентной записи роботов: пропускная способность '
+        'и ошибки блокировки в зависимости от количества потоков. '
+        'Работает во временной базе текущего профиля DATABASE_ENGINE.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            default='1,2,4,8',
+            help='Список количеств потоков через запятую'
+        )
+        parser.add_argument('--records', type=int, default=500, help='Роботов на поток')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1,
+            help='1 - по одному роботу через ORM, больше - пакетами bulk_create'
+        )
+        parser.add_argument('--output', default=None)
+
+    def handle(self, *args, **options):
+        try:
+            worker_counts = [int(n) for n in options['workers'].split(',')]
+        except ValueError:
+            raise CommandError('--workers must be a comma-separated list of integers')
+        if min(worker_counts) < 1 or options['records'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--workers, --records and --batch-size must be positive')
+
+        results = []
+        with benchmark_database():
+            for workers in worker_counts:
+                result = measure_concurrent_writes(
+                    workers,
+                    records=options['records'],
+                    batch_size=options['batch_size'],
+                )
+                result['database'] = connection.vendor
+                results.append(result)
+                self.stdout.write(json.dumps(result))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
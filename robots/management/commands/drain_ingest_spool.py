@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+import sys
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError, OutputWrapper
+from django.db import connections
+
+
+def run_worker(options, stdout):
+    """Цикл обработчика очереди; прогресс пишется в stdout команды"""
+    from robots.spool import drain_spool
+    from robots.stats import production_stats
+
+    while True:
+        processed, created = drain_spool(
+            batch_size=options['batch_size'],
+            max_rate=options['max_rate'],
+        )
+        if processed:
+            # Статистика процесса попадает в базу до ожидания или выхода
+            production_stats.checkpoint()
+            stdout.write(f'Обработано: {processed}, создано: {created}')
+            stdout.flush()
+        if not options['loop']:
+            return
+        time.sleep(options['interval'])
+
+
+def run_worker_process(options):
+    """Точка входа дочернего процесса-обработчика.
+
+    Модели импортируются после django.setup(): процесс запускается
+    через spawn и импортирует этот модуль до настройки Django.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'R4C.settings')
+    django.setup()
+    try:
+        run_worker(options, OutputWrapper(sys.stdout))
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Перенос роботов из локальной очереди загрузки в базу пачками. '
+        'С --workers больше 1 очередь разбирают отдельные процессы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Количество процессов')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Количество записей в одной транзакции'
+        )
+        parser.add_argument(
+            '--max-rate',
+            type=float,
+            default=None,
+            help='Предельная скорость записи одного процесса, роботов в секунду'
+        )
+        parser.add_argument('--loop', action='store_true', help='Работать непрерывно')
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Пауза при пустой очереди в секундах'
+        )
+        parser.add_argument(
+            '--requeue-stale',
+            type=int,
+            default=None,
+            metavar='SECONDS',
+            help='Вернуть в очередь записи, захваченные более SECONDS секунд назад'
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--workers and --batch-size must be positive')
+
+        if options['requeue_stale'] is not None:
+            from robots.spool import get_spool
+
+            requeued = get_spool().requeue_stale(options['requeue_stale'])
+            self.stdout.write(f'Возвращено в очередь: {requeued}')
+
+        if options['workers'] == 1:
+            run_worker(options, self.stdout)
+            return
+
+        context = multiprocessing.get_context('spawn')
+        workers = [
+            context.Process(target=run_worker_process, args=(options,))
+            for _ in range(options['workers'])
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
@@ -0,0 +1,55 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from robots.services import ingest_ndjson_lines
+from robots.stats import production_stats
+
+
+class Command(BaseCommand):
+    help = 'Потоковая загрузка роботов из NDJSON-файла порциями'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help="Путь к NDJSON-файлу, '-' для чтения из stdin"
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Количество записей в одной транзакции'
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        if options['path'] == '-':
+            self.ingest(sys.stdin, options['chunk_size'])
+            return
+
+        try:
+            with open(options['path'], encoding='utf-8') as source:
+                self.ingest(source, options['chunk_size'])
+        except OSError as e:
+            raise CommandError(str(e))
+
+    def ingest(self, source, chunk_size):
+        """Загружаем строки из файла, печатая прогресс после каждой порции"""
+        for progress in ingest_ndjson_lines(source, chunk_size=chunk_size):
+            if progress.get('done'):
+                # Счетчики статистики процесса записываются до его завершения
+                production_stats.checkpoint()
+                self.stdout.write(self.style.SUCCESS(
+                    f"Готово: строк {progress['lines']}, "
+                    f"создано {progress['created']}, "
+                    f"ошибок {progress['failed']}"
+                ))
+                continue
+
+            for error in progress['errors']:
+                self.stderr.write(f"Строка {error['line']}: {error['error']}")
+            self.stdout.write(
+                f"Строка {progress['line']}: создано {progress['created']}"
+            )
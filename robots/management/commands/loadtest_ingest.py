@@ -0,0 +1,150 @@
+import http.client
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест API создания роботов: устойчивый req/s и задержки. '
+        'Запускается отдельно против WSGI и ASGI развертывания для сравнения.'
+    )
+
+    # Пары должны быть в каталоге продукции, иначе запросы не пройдут валидацию
+    PAIRS = [('R2', 'D2'), ('13', 'XS'), ('X5', 'LT')]
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'url',
+            help='Адрес endpoint, например http://127.0.0.1:8000/robots/api/async/'
+        )
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=30.0,
+            help='Длительность теста в секундах'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=0,
+            help='Отправлять JSON-массивы такого размера (для batch-endpoint)'
+        )
+        parser.add_argument(
+            '--output',
+            default=None,
+            help='Сохранить результат в JSON-файл'
+        )
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme not in ('http', 'https') or not url.hostname:
+            raise CommandError('url must be an absolute http(s) URL')
+        if options['concurrency'] < 1 or options['duration'] <= 0:
+            raise CommandError('--concurrency and --duration must be positive')
+
+        deadline = time.monotonic() + options['duration']
+        results = [[] for _ in range(options['concurrency'])]
+        errors = [0] * options['concurrency']
+
+        threads = [
+            threading.Thread(
+                target=self.worker,
+                args=(url, options['batch_size'], deadline, results[i], errors, i)
+            )
+            for i in range(options['concurrency'])
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        report = self.summarize(results, sum(errors), elapsed, options)
+        self.stdout.write(json.dumps(report, indent=2))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+    def worker(self, url, batch_size, deadline, latencies, errors, index):
+        """Поток нагрузки с собственным keep-alive соединением"""
+        connection_class = (
+            http.client.HTTPSConnection if url.scheme == 'https'
+            else http.client.HTTPConnection
+        )
+        connection = connection_class(url.hostname, url.port, timeout=30)
+        path = url.path or '/'
+        counter = 0
+
+        while time.monotonic() < deadline:
+            counter += 1
+            body = self.make_body(index, counter, batch_size)
+            started = time.perf_counter()
+            try:
+                connection.request(
+                    'POST', path, body, {'Content-Type': 'application/json'}
+                )
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                errors[index] += 1
+                connection.close()
+                continue
+
+            latencies.append(time.perf_counter() - started)
+            if response.status >= 400:
+                errors[index] += 1
+
+        connection.close()
+
+    def make_body(self, index, counter, batch_size):
+        """Синтетическая запись о роботе или пачка записей"""
+        base = datetime(2023, 1, 1) + timedelta(seconds=counter)
+
+        def record(offset):
+            model, version = self.PAIRS[(index + offset) % len(self.PAIRS)]
+            return {
+                'model': model,
+                'version': version,
+                'created': (base + timedelta(milliseconds=offset)).strftime(
+                    '%Y-%m-%d %H:%M:%S'
+                ),
+            }
+
+        if batch_size:
+            return json.dumps([record(i) for i in range(batch_size)])
+        return json.dumps(record(counter))
+
+    def summarize(self, results, errors, elapsed, options):
+        """Сводные показатели: пропускная способность и перцентили задержки"""
+        latencies = sorted(latency for worker in results for latency in worker)
+        count = len(latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(count - 1, int(count * p))] * 1000, 2)
+
+        records = count * (options['batch_size'] or 1)
+        return {
+            'url': options['url'],
+            'concurrency': options['concurrency'],
+            'duration': round(elapsed, 2),
+            'requests': count,
+            'errors': errors,
+            'requests_per_second': round(count / elapsed, 1),
+            'records_per_second': round(records / elapsed, 1),
+            'latency_ms': {
+                'p50': percentile(0.50),
+                'p90': percentile(0.90),
+                'p99': percentile(0.99),
+                'max': percentile(1.0),
+            },
+        }
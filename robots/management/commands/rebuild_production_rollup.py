@@ -0,0 +1,40 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from robots.rollups import rebuild_daily
+from robots.stats import rebuild_hourly
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчет суточной сводки производства по истории роботов '
+        'и почасовой статистики за последнюю неделю'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            default=None,
+            help='Пересчитать только дни начиная с даты YYYY-MM-DD'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Размер порции при записи сводки'
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format')
+
+        created = rebuild_daily(since=since, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Строк сводки: {created}'))
+
+        hourly = rebuild_hourly()
+        self.stdout.write(self.style.SUCCESS(f'Строк почасовой статистики: {hourly}'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from robots.stock import rebuild_stock
+
+
+class Command(BaseCommand):
+    help = 'Пересчет свободных остатков по незарезервированным роботам'
+
+    def handle(self, *args, **options):
+        created = rebuild_stock()
+        self.stdout.write(self.style.SUCCESS(f'Строк остатков: {created}'))
@@ -0,0 +1,74 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from robots.notifications import (
+    dispatch_pending_notifications,
+    requeue_stale_notifications,
+)
+
+
+class Command(BaseCommand):
+    help = 'Отправка уведомлений листа ожидания из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Количество потоков-отправителей'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Количество писем на одно SMTP-соединение'
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=None,
+            help='Число попыток до пометки уведомления ошибочным'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Работать непрерывно, опрашивая очередь'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Пауза между опросами очереди в секундах'
+        )
+        parser.add_argument(
+            '--requeue-stale',
+            type=int,
+            default=None,
+            metavar='MINUTES',
+            help='Вернуть в очередь захваченные более MINUTES минут назад'
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--workers and --batch-size must be positive')
+
+        if options['requeue_stale'] is not None:
+            requeued = requeue_stale_notifications(
+                timedelta(minutes=options['requeue_stale'])
+            )
+            self.stdout.write(f'Возвращено в очередь: {requeued}')
+
+        while True:
+            sent, failed = dispatch_pending_notifications(
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+                max_attempts=options['max_attempts']
+            )
+            if sent or failed:
+                self.stdout.write(f'Отправлено: {sent}, ошибок: {failed}')
+
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
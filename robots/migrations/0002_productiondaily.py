@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('robots', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductionDaily',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=2)),
+                ('version', models.CharField(max_length=2)),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='production_daily_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('model', 'version', 'day'), name='production_daily_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('robots', '0002_productiondaily'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='robot',
+            index=models.Index(fields=['created', 'model', 'version'], name='robot_created_model_idx'),
+        ),
+    ]
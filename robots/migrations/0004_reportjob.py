@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:08
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('robots', '0003_robot_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('params', models.JSONField()),
+                ('params_hash', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Готов'), ('failed', 'Ошибка')], default='pending', max_length=20)),
+                ('file_path', models.CharField(blank=True, default='', max_length=500)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('params_hash',), name='report_job_in_flight_unique')],
+            },
+        ),
+    ]
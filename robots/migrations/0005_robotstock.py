@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('robots', '0004_reportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RobotStock',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=2)),
+                ('version', models.CharField(max_length=2)),
+                ('available', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('model', 'version'), name='robot_stock_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('robots', '0005_robotstock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RobotModel',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=2, unique=True)),
+                ('name', models.CharField(blank=True, default='', max_length=255)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RobotVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=2)),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='robots.robotmodel')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('model', 'code'), name='robot_version_unique')],
+            },
+        ),
+    ]
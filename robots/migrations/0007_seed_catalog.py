@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+# Модели из примеров технического задания
+INITIAL_CATALOG = [('R2', 'D2'), ('13', 'XS'), ('X5', 'LT')]
+
+
+def seed_catalog(apps, schema_editor):
+    """Заполняем каталог примерами и парами, уже встречающимися в базе"""
+    Robot = apps.get_model('robots', 'Robot')
+    RobotModel = apps.get_model('robots', 'RobotModel')
+    RobotVersion = apps.get_model('robots', 'RobotVersion')
+
+    pairs = set(INITIAL_CATALOG)
+    pairs.update(Robot.objects.values_list('model', 'version').distinct())
+
+    for model_code, version_code in sorted(pairs):
+        model, _ = RobotModel.objects.get_or_create(code=model_code)
+        RobotVersion.objects.get_or_create(model=model, code=version_code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('robots', '0006_catalog'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_catalog, migrations.RunPython.noop),
+    ]
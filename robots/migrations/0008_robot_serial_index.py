@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:13
+
+from django.db import migrations, models
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+
+
+def backfill_serial(apps, schema_editor):
+    """Заполняем серийный номер у роботов, созданных без него"""
+    Robot = apps.get_model('robots', 'Robot')
+    Robot.objects.filter(serial='').update(
+        serial=Concat(F('model'), Value('-'), F('version'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('robots', '0007_seed_catalog'),
+    ]
+
+    operations = [
+        # Заполняем до создания индекса, чтобы не перестраивать его при UPDATE
+        migrations.RunPython(backfill_serial, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='robot',
+            name='serial',
+            field=models.CharField(db_index=True, max_length=5),
+        ),
+    ]
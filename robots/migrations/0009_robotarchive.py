@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('robots', '0008_robot_serial_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RobotArchive',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(db_index=True)),
+                ('file_path', models.CharField(max_length=500)),
+                ('count', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
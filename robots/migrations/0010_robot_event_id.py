@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('robots', '0009_robotarchive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='robot',
+            name='event_id',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+    ]
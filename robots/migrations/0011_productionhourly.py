@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('robots', '0010_robot_event_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductionHourly',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=2)),
+                ('version', models.CharField(max_length=2)),
+                ('hour', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='production_hourly_hour_idx')],
+                'constraints': [models.UniqueConstraint(fields=('model', 'version', 'hour'), name='production_hourly_unique')],
+            },
+        ),
+    ]
@@ -1,8 +1,185 @@
+import uuid
+
 from django.db import models
+from django.utils import timezone
+
+
+def make_serial(model, version):
+    """Серийный номер робота из модели и версии, например R2-D2"""
+    return f"{model}-{version}"
 
 
 class Robot(models.Model):
-    serial = models.CharField(max_length=5, blank=False, null=False)
+    serial = models.CharField(max_length=5, blank=False, null=False, db_index=True)
     model = models.CharField(max_length=2, blank=False, null=False)
     version = models.CharField(max_length=2, blank=False, null=False)
     created = models.DateTimeField(blank=False, null=False)
+    # Идентификатор события от шлюза: повтор той же записи не создает робота
+    event_id = models.CharField(max_length=100, null=True, blank=True, unique=True)
+
+    class Meta:
+        indexes = [
+            # Выборка за период с группировкой по модели и версии
+            models.Index(
+                fields=['created', 'model', 'version'],
+                name='robot_created_model_idx',
+            ),
+        ]
+
+
+class ProductionDaily(models.Model):
+    """Суточная сводка производства по модели и версии.
+
+    Обновляется инкрементально при создании роботов и используется
+    отчетами вместо агрегации по всей таблице Robot.
+    """
+    model = models.CharField(max_length=2, blank=False, null=False)
+    version = models.CharField(max_length=2, blank=False, null=False)
+    day = models.DateField(blank=False, null=False)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['model', 'version', 'day'],
+                name='production_daily_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='production_daily_day_idx'),
+        ]
+
+
+class ProductionHourly(models.Model):
+    """Почасовые счетчики производства - контрольная точка статистики.
+
+    Пишется периодически из счетчиков в памяти процессов (robots.stats)
+    и хранится только за окно статистики.
+    """
+    model = models.CharField(max_length=2, blank=False, null=False)
+    version = models.CharField(max_length=2, blank=False, null=False)
+    hour = models.DateTimeField(blank=False, null=False)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['model', 'version', 'hour'],
+                name='production_hourly_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['hour'], name='production_hourly_hour_idx'),
+        ]
+
+
+class ReportJob(models.Model):
+    """Фоновая генерация отчета за произвольный период"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готов'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    params = models.JSONField()
+    params_hash = models.CharField(max_length=64)
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+    )
+    file_path = models.CharField(max_length=500, blank=True, default='')
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Одинаковые отчеты в работе не дублируются
+            models.UniqueConstraint(
+                fields=['params_hash'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='report_job_in_flight_unique',
+            ),
+        ]
+
+
+class RobotStock(models.Model):
+    """Количество свободных (не зарезервированных) роботов по модели и версии"""
+    model = models.CharField(max_length=2, blank=False, null=False)
+    version = models.CharField(max_length=2, blank=False, null=False)
+    available = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['model', 'version'],
+                name='robot_stock_unique',
+            ),
+        ]
+
+
+class RobotModel(models.Model):
+    """Модель робота из каталога продукции"""
+    code = models.CharField(max_length=2, unique=True)
+    name = models.CharField(max_length=255, blank=True, default='')
+
+    def __str__(self):
+        return self.code
+
+
+class RobotVersion(models.Model):
+    """Версия модели робота из каталога продукции"""
+    model = models.ForeignKey(
+        RobotModel,
+        on_delete=models.CASCADE,
+        related_name='versions',
+    )
+    code = models.CharField(max_length=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['model', 'code'],
+                name='robot_version_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.model.code}-{self.code}'
+
+
+class RobotArchive(models.Model):
+    """Часть архива роботов за месяц: сжатый CSV-файл в каталоге данных"""
+    month = models.DateField(db_index=True)
+    file_path = models.CharField(max_length=500)
+    count = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f'{self.month:%Y-%m}: {self.count}'
+
+
+class DataVersion(models.Model):
+    """Версия набора данных, общая для всех процессов.
+
+    Увеличивается в той же транзакции, что меняет данные, поэтому
+    процессы видят новую версию вместе с самими изменениями и сравнивают
+    с ней свои кэши в памяти.
+    """
+    PRODUCTION = 'production'
+    CATALOG = 'catalog'
+
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f'{self.name}: {self.version}'
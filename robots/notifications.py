@@ -0,0 +1,237 @@
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from orders.models import Notification
+from R4C.metrics import observe
+
+
+NOTIFICATION_SUBJECT = 'Робот доступен к заказу'
+DIGEST_SUBJECT = 'Роботы доступны к заказу'
+
+
+def build_notification_message(email, model, version):
+    """Формируем письмо клиенту о появлении робота"""
+    message = f"""
+Добрый день!
+
+Недавно вы интересовались нашим роботом модели {model}, версии {version}.
+Этот робот теперь в наличии. Если вам подходит этот вариант - пожалуйста, свяжитесь с нами
+    """
+
+    return EmailMessage(
+        subject=NOTIFICATION_SUBJECT,
+        body=message.strip(),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[email],
+    )
+
+
+def build_digest_message(email, robots):
+    """Одно письмо клиенту обо всех появившихся роботах: robots - пары (модель, версия)"""
+    lines = '\n'.join(
+        f'- модель {model}, версия {version}' + (f' ({count} шт.)' if count > 1 else '')
+        for (model, version), count in sorted(Counter(robots).items())
+    )
+    message = f"""
+Добрый день!
+
+Недавно вы интересовались нашими роботами. Теперь в наличии:
+{lines}
+
+Если вам подходят эти варианты - пожалуйста, свяжитесь с нами
+    """
+
+    return EmailMessage(
+        subject=DIGEST_SUBJECT,
+        body=message.strip(),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[email],
+    )
+
+
+def get_digest_window():
+    """Задержка первой отправки, за которую копятся уведомления клиента"""
+    return timedelta(seconds=getattr(settings, 'NOTIFICATION_DIGEST_WINDOW', 0))
+
+
+def get_retry_delay(attempts):
+    """Экспоненциальная задержка перед повторной отправкой"""
+    base = getattr(settings, 'NOTIFICATION_RETRY_BACKOFF', 60)
+    cap = getattr(settings, 'NOTIFICATION_RETRY_BACKOFF_MAX', 3600)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), cap))
+
+
+def claim_notifications(batch_size):
+    """Забираем порцию готовых к отправке уведомлений.
+
+    Захват выполняется условным UPDATE со случайным токеном, поэтому
+    параллельные обработчики никогда не получат одну и ту же запись.
+    """
+    now = timezone.now()
+    ids = list(
+        Notification.objects.filter(
+            status=Notification.PENDING,
+            next_attempt_at__lte=now
+        ).order_by('id').values_list('id', flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+
+    token = uuid.uuid4().hex
+    Notification.objects.filter(
+        id__in=ids,
+        status=Notification.PENDING
+    ).update(status=Notification.SENDING, claim_token=token, claimed_at=now)
+
+    # Забираем и еще не наступившие новые уведомления тех же клиентов,
+    # чтобы они ушли в том же письме, а не отдельным через окно дайджеста
+    emails = set(
+        Notification.objects.filter(claim_token=token).values_list('email', flat=True)
+    )
+    Notification.objects.filter(
+        email__in=emails,
+        status=Notification.PENDING,
+        attempts=0
+    ).update(status=Notification.SENDING, claim_token=token, claimed_at=now)
+
+    return list(Notification.objects.filter(claim_token=token).order_by('id'))
+
+
+def send_notifications(notifications, max_attempts):
+    """Отправляем порцию уведомлений через одно SMTP-соединение.
+
+    Уведомления одного клиента объединяются в одно письмо-дайджест.
+    Возвращает количество отправленных и неудачных уведомлений.
+    """
+    sent = failed = 0
+    mail_connection = get_connection()
+
+    try:
+        mail_connection.open()
+    except Exception as e:
+        for notification in notifications:
+            schedule_retry(notification, e, max_attempts)
+        return sent, len(notifications)
+
+    by_email = {}
+    for notification in notifications:
+        by_email.setdefault(notification.email, []).append(notification)
+
+    try:
+        for email, group in by_email.items():
+            if len(group) == 1:
+                message = build_notification_message(
+                    email,
+                    group[0].robot_model,
+                    group[0].robot_version
+                )
+            else:
+                message = build_digest_message(
+                    email,
+                    [(n.robot_model, n.robot_version) for n in group]
+                )
+            started = time.perf_counter()
+            try:
+                mail_connection.send_messages([message])
+            except Exception as e:
+                for notification in group:
+                    schedule_retry(notification, e, max_attempts)
+                failed += len(group)
+                continue
+            finally:
+                observe('r4c_email_send_seconds', time.perf_counter() - started)
+
+            # Отмечаем отправку сразу, чтобы сбой на следующем письме
+            # не привел к повторной отправке уже доставленных
+            Notification.objects.filter(
+                pk__in=[notification.pk for notification in group]
+            ).update(
+                status=Notification.SENT,
+                sent_at=timezone.now(),
+                attempts=F('attempts') + 1,
+                claim_token='',
+            )
+            sent += len(group)
+    finally:
+        mail_connection.close()
+
+    return sent, failed
+
+
+def schedule_retry(notification, error, max_attempts):
+    """Возвращаем уведомление в очередь с задержкой или помечаем ошибкой"""
+    attempts = notification.attempts + 1
+    status = Notification.FAILED if attempts >= max_attempts else Notification.PENDING
+    Notification.objects.filter(pk=notification.pk).update(
+        status=status,
+        attempts=attempts,
+        next_attempt_at=timezone.now() + get_retry_delay(attempts),
+        last_error=str(error),
+        claim_token='',
+    )
+
+
+def drain_notifications(batch_size, max_attempts):
+    """Отправляем уведомления порциями, пока очередь не опустеет"""
+    sent = failed = 0
+    while True:
+        notifications = claim_notifications(batch_size)
+        if not notifications:
+            return sent, failed
+
+        batch_sent, batch_failed = send_notifications(notifications, max_attempts)
+        sent += batch_sent
+        failed += batch_failed
+
+
+def _drain_in_thread(batch_size, max_attempts):
+    """Обработчик пула потоков со своим соединением с БД"""
+    try:
+        return drain_notifications(batch_size, max_attempts)
+    finally:
+        connection.close()
+
+
+def dispatch_pending_notifications(workers=1, batch_size=100, max_attempts=None):
+    """Разбираем очередь уведомлений пулом потоков.
+
+    Возвращает количество отправленных и неудачных попыток.
+    """
+    if max_attempts is None:
+        max_attempts = getattr(settings, 'NOTIFICATION_MAX_ATTEMPTS', 5)
+
+    if workers <= 1:
+        return drain_notifications(batch_size, max_attempts)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_drain_in_thread, batch_size, max_attempts)
+            for _ in range(workers)
+        ]
+        results = [future.result() for future in futures]
+
+    return (
+        sum(sent for sent, _ in results),
+        sum(failed for _, failed in results)
+    )
+
+
+def requeue_stale_notifications(older_than):
+    """Возвращаем в очередь уведомления, захваченные упавшим обработчиком.
+
+    Такое письмо могло уйти до сбоя, поэтому возврат выполняется
+    только явно, по флагу команды.
+    """
+    return Notification.objects.filter(
+        status=Notification.SENDING,
+        claimed_at__lt=timezone.now() - older_than
+    ).update(status=Notification.PENDING, claim_token='')
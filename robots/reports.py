@@ -0,0 +1,202 @@
+import hashlib
+import os
+import tempfile
+from datetime import date, timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import DateField, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from openpyxl import Workbook
+
+from .models import DataVersion, ProductionDaily
+from .versions import bump_version, get_version
+
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def get_report_window():
+    """Окно отчета: последние 7 дней, включая сегодняшний"""
+    end_date = timezone.localdate()
+    start_date = end_date - timedelta(days=6)
+    return start_date, end_date
+
+
+GRANULARITIES = ('day', 'week', 'month')
+
+EXPORT_FORMATS = ('xlsx', 'csv', 'ndjson', 'parquet')
+
+MAX_REPORT_DAYS = 366 * 10
+
+WEEKLY_HEADERS = ['Модель', 'Версия', 'Количество за неделю']
+PERIOD_HEADERS = ['Модель', 'Версия', 'Период', 'Количество']
+
+
+class ReportParamsError(ValueError):
+    """Ошибка в параметрах отчета"""
+
+
+def get_report_data(start_date, end_date):
+    """Сводка производства за период по модели и версии"""
+    return ProductionDaily.objects.filter(
+        day__range=(start_date, end_date)
+    ).values(
+        'model', 'version'
+    ).annotate(
+        count=Sum('count')
+    ).order_by('model', 'version')
+
+
+def parse_report_params(data):
+    """Проверяем параметры отчета и приводим их к каноничному виду"""
+    try:
+        start_date = date.fromisoformat(data['start'])
+        end_date = date.fromisoformat(data['end'])
+    except (KeyError, TypeError, ValueError):
+        raise ReportParamsError('start and end must be dates in YYYY-MM-DD format')
+
+    if start_date > end_date:
+        raise ReportParamsError('start must not be later than end')
+    if (end_date - start_date).days > MAX_REPORT_DAYS:
+        raise ReportParamsError(f'Report window is limited to {MAX_REPORT_DAYS} days')
+
+    granularity = data.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        raise ReportParamsError(
+            f"granularity must be one of: {', '.join(GRANULARITIES)}"
+        )
+
+    models = data.get('models') or []
+    if not isinstance(models, list) or not all(
+        isinstance(model, str) and len(model) == 2 for model in models
+    ):
+        raise ReportParamsError('models must be a list of 2-character model codes')
+
+    export_format = data.get('format', 'xlsx')
+    if export_format not in EXPORT_FORMATS:
+        raise ReportParamsError(
+            f"format must be one of: {', '.join(EXPORT_FORMATS)}"
+        )
+
+    return {
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'models': sorted(set(models)),
+        'granularity': granularity,
+        'format': export_format,
+    }
+
+
+def get_period_data(params):
+    """Сводка за произвольный период с разбивкой по дням, неделям или месяцам"""
+    queryset = ProductionDaily.objects.filter(
+        day__range=(params['start'], params['end'])
+    )
+    if params['models']:
+        queryset = queryset.filter(model__in=params['models'])
+
+    return queryset.annotate(
+        period=Trunc('day', params['granularity'], output_field=DateField())
+    ).values(
+        'model', 'version', 'period'
+    ).annotate(
+        count=Sum('count')
+    ).order_by('model', 'period', 'version')
+
+
+def write_workbook(robots_data, output, headers=WEEKLY_HEADERS,
+                   empty_message='Нет данных за последнюю неделю'):
+    """Записываем Excel-файл в output: по листу на каждую модель.
+
+    Книга создается в режиме write-only и заполняется построчно по мере
+    чтения данных, упорядоченных по модели, поэтому в памяти не держится
+    ни весь документ, ни весь результат запроса. Если в строках есть
+    поле period, оно выводится отдельным столбцом.
+    """
+    wb = Workbook(write_only=True)
+    current_model = None
+
+    for item in robots_data:
+        if item['model'] != current_model:
+            # Создаем новый лист с названием модели
+            current_model = item['model']
+            ws = wb.create_sheet(title=f"Model {current_model}")
+
+            # Ширина столбцов задается до записи строк
+            ws.column_dimensions['A'].width = 15
+            ws.column_dimensions['B'].width = 15
+            ws.column_dimensions['C'].width = 25
+            ws.column_dimensions['D'].width = 15
+            ws.append(headers)
+
+        if 'period' in item:
+            ws.append([item['model'], item['version'], item['period'], item['count']])
+        else:
+            ws.append([item['model'], item['version'], item['count']])
+
+    if current_model is None:
+        # Если данных нет, оставляем один лист с сообщением
+        ws = wb.create_sheet()
+        ws.column_dimensions['A'].width = 30
+        ws.append([empty_message])
+
+    wb.save(output)
+
+
+def render_report(start_date, end_date):
+    """Готовый отчет за период во временном файле, перемотанном в начало.
+
+    Небольшие отчеты остаются в памяти, большие сбрасываются на диск.
+    """
+    output = tempfile.SpooledTemporaryFile(
+        max_size=getattr(settings, 'REPORT_SPOOL_MAX_MEMORY', 1024 * 1024)
+    )
+    write_workbook(get_report_data(start_date, end_date).iterator(), output)
+    output.seek(0)
+    return output
+
+
+def get_data_version():
+    """Текущая версия данных о производстве и время ее изменения.
+
+    Версия хранится в базе и меняется в транзакции каждой вставки
+    роботов, поэтому ETag и ключ кэша отчета меняются и после загрузки
+    в другом процессе.
+    """
+    version, updated_at = get_version(DataVersion.PRODUCTION)
+    return version, updated_at.timestamp() if updated_at is not None else 0.0
+
+
+def bump_data_version():
+    """Отмечаем изменение данных о производстве в текущей транзакции"""
+    bump_version(DataVersion.PRODUCTION)
+
+
+def get_report_etag(start_date, end_date, version, export_format='xlsx'):
+    """ETag отчета по окну, версии данных и формату выгрузки"""
+    key = f'{start_date.isoformat()}:{end_date.isoformat()}:{version}:{export_format}'
+    return '"%s"' % hashlib.md5(key.encode()).hexdigest()
+
+
+def get_cached_report(start_date, end_date, version):
+    """Отчет по окну и версии данных как открытый файл.
+
+    При промахе отчет генерируется и попадает в кэш, если его размер
+    не превышает REPORT_CACHE_MAX_SIZE. Второе значение - признак
+    попадания в кэш.
+    """
+    key = f'robots:report:{start_date.isoformat()}:{end_date.isoformat()}:{version}'
+    content = cache.get(key)
+    if content is not None:
+        return BytesIO(content), True
+
+    output = render_report(start_date, end_date)
+    size = output.seek(0, os.SEEK_END)
+    output.seek(0)
+    if size <= getattr(settings, 'REPORT_CACHE_MAX_SIZE', 5 * 1024 * 1024):
+        cache.set(key, output.read(), getattr(settings, 'REPORT_CACHE_TIMEOUT', 3600))
+        output.seek(0)
+    return output, False
@@ -0,0 +1,112 @@
+from collections import Counter
+from datetime import datetime, time
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .archive import aggregate_archived_by_day
+from .models import ProductionDaily, Robot
+from .reports import bump_data_version
+from .stats import production_stats
+
+
+def production_day(created):
+    """День производства робота в текущей временной зоне"""
+    if timezone.is_aware(created):
+        created = timezone.localtime(created)
+    return created.date()
+
+
+def record_production(robots):
+    """Инкрементально добавляем роботов в суточную сводку"""
+    counts = Counter(
+        (robot.model, robot.version, production_day(robot.created))
+        for robot in robots
+    )
+    if not counts:
+        return
+
+    with transaction.atomic():
+        for (model, version, day), count in sorted(counts.items()):
+            increment_daily(model, version, day, count)
+
+        # Версия меняется в транзакции вставки: кэшированные отчеты
+        # устаревают во всех процессах вместе с ее коммитом
+        bump_data_version()
+        transaction.on_commit(lambda: production_stats.record(robots))
+
+
+def increment_daily(model, version, day, count):
+    """Увеличиваем счетчик за день, создавая строку при необходимости"""
+    rows = ProductionDaily.objects.filter(model=model, version=version, day=day)
+    if rows.update(count=F('count') + count):
+        return
+
+    try:
+        with transaction.atomic():
+            ProductionDaily.objects.create(
+                model=model, version=version, day=day, count=count
+            )
+    except IntegrityError:
+        # Строку успел создать параллельный запрос
+        rows.update(count=F('count') + count)
+
+
+def aggregate_robots_by_day(since=None):
+    """Агрегация роботов по модели, версии и дню производства"""
+    robots = Robot.objects.all()
+    if since is not None:
+        # Сравнение по самому полю created позволяет использовать индекс
+        robots = robots.filter(
+            created__gte=timezone.make_aware(datetime.combine(since, time.min))
+        )
+
+    return robots.annotate(
+        day=TruncDate('created')
+    ).values(
+        'model', 'version', 'day'
+    ).annotate(
+        count=Count('id')
+    ).order_by()
+
+
+def aggregate_production_by_day(since=None, batch_size=1000):
+    """Агрегация по дням с учетом архива: рабочая таблица плюс архивные месяцы.
+
+    Возвращает итератор словарей model, version, day, count.
+    """
+    archived = aggregate_archived_by_day(since)
+    for row in aggregate_robots_by_day(since).iterator(chunk_size=batch_size):
+        # За архивный день могли позже загрузить роботов задним числом
+        row['count'] += archived.pop((row['model'], row['version'], row['day']), 0)
+        yield row
+
+    for (model, version, day), count in archived.items():
+        yield {'model': model, 'version': version, 'day': day, 'count': count}
+
+
+def rebuild_daily(since=None, batch_size=1000):
+    """Пересчитываем суточную сводку по таблице Robot и архиву.
+
+    Если указан since, пересчитываются только дни начиная с него.
+    """
+    rollup = ProductionDaily.objects.all()
+    if since is not None:
+        rollup = rollup.filter(day__gte=since)
+
+    created = 0
+    with transaction.atomic():
+        bump_data_version()
+        rollup.delete()
+
+        batch = []
+        for row in aggregate_production_by_day(since, batch_size):
+            batch.append(ProductionDaily(**row))
+            if len(batch) >= batch_size:
+                created += len(ProductionDaily.objects.bulk_create(batch))
+                batch = []
+        created += len(ProductionDaily.objects.bulk_create(batch))
+
+    return created
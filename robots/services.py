@@ -0,0 +1,271 @@
+from datetime import datetime
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from R4C import json_codec
+from R4C.metrics import phase
+
+from .catalog import catalog_cache
+from .idempotency import find_seen_events, remember_events, skip_seen_events
+from .models import Robot, make_serial
+from .rollups import record_production
+from .signals import allocate_and_notify
+
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Строка NDJSON-пачки с неверным JSON: ошибка относится только к ее позиции
+INVALID_JSON = object()
+
+
+class RobotValidationError(ValueError):
+    """Ошибка валидации входных данных о роботе"""
+
+
+def parse_datetime(value):
+    """Разбираем дату в формате DATETIME_FORMAT.
+
+    Строки канонического вида "YYYY-MM-DD HH:MM:SS" разбираются
+    datetime.fromisoformat (реализован на C и в разы быстрее strptime),
+    остальные - strptime, чтобы набор допустимых значений не изменился.
+    """
+    if (
+        len(value) == 19 and value[4] == '-' and value[7] == '-'
+        and value[10] == ' ' and value[13] == ':' and value[16] == ':'
+    ):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return datetime.strptime(value, DATETIME_FORMAT)
+
+
+def format_datetime(value):
+    """Дата в формате DATETIME_FORMAT без strftime"""
+    return value.replace(tzinfo=None, microsecond=0).isoformat(' ')
+
+
+def compile_robot_validator(known_pairs):
+    """Собираем функцию проверки записи о роботе.
+
+    known_pairs - множество допустимых пар модель/версия или None, если
+    проверка по каталогу отключена. Каталог связывается при сборке,
+    поэтому записи проверяются без обращений к settings и к кэшу каталога.
+    """
+    def validate(data):
+        if not isinstance(data, dict):
+            raise RobotValidationError('Robot data must be a JSON object')
+
+        # Проверяем длину модели
+        model = data.get('model', '')
+        if not isinstance(model, str) or len(model) != 2:
+            raise RobotValidationError('Model must be exactly 2 characters long')
+
+        # Проверяем длину версии
+        version = data.get('version', '')
+        if not isinstance(version, str) or len(version) != 2:
+            raise RobotValidationError('Version must be exactly 2 characters long')
+
+        # Проверяем пару по каталогу продукции (без запроса к базе)
+        if known_pairs is not None and (model, version) not in known_pairs:
+            raise RobotValidationError(f'Unknown robot model/version: {model}-{version}')
+
+        # Проверяем дату
+        created = data.get('created')
+        try:
+            created = parse_datetime(created)
+        except (ValueError, TypeError):
+            raise RobotValidationError(
+                'Invalid datetime format. Use YYYY-MM-DD HH:MM:SS'
+            )
+
+        # Необязательный идентификатор события для защиты от повторов
+        event_id = data.get('event_id')
+        if event_id is not None and (
+            not isinstance(event_id, str) or not 0 < len(event_id) <= 100
+        ):
+            raise RobotValidationError('event_id must be a string of 1-100 characters')
+
+        return {
+            'serial': make_serial(model, version),
+            'model': model,
+            'version': version,
+            'created': created,
+            'event_id': event_id,
+        }
+
+    return validate
+
+
+# (множество пар каталога, валидатор), собранный для этого множества
+_compiled_validator = (None, None)
+
+
+def get_robot_validator():
+    """Валидатор для текущего каталога, собираемый заново только при его смене.
+
+    CatalogCache возвращает новый объект множества пар при каждой загрузке
+    нового поколения каталога, поэтому сравнение по идентичности объекта
+    равносильно сравнению поколений.
+    """
+    global _compiled_validator
+    known_pairs = (
+        catalog_cache.get_pairs()
+        if getattr(settings, 'ROBOT_CATALOG_VALIDATION', True) else None
+    )
+    pairs, validate = _compiled_validator
+    if validate is None or pairs is not known_pairs:
+        validate = compile_robot_validator(known_pairs)
+        _compiled_validator = (known_pairs, validate)
+    return validate
+
+
+def validate_robot_data(data):
+    """Проверяем данные о роботе и возвращаем очищенные значения"""
+    return get_robot_validator()(data)
+
+
+def parse_ndjson_records(text):
+    """Записи NDJSON-пачки; неразобранная строка заменяется на INVALID_JSON"""
+    records = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            records.append(json_codec.loads(line))
+        except json_codec.DecodeError:
+            records.append(INVALID_JSON)
+    return records
+
+
+def validate_robot_batch(records):
+    """Валидируем пачку записей, собирая ошибки по каждой позиции"""
+    validate = get_robot_validator()
+    valid, errors = [], []
+    for index, data in enumerate(records):
+        if data is INVALID_JSON:
+            errors.append({'index': index, 'error': 'Invalid JSON format'})
+            continue
+        try:
+            valid.append(validate(data))
+        except RobotValidationError as e:
+            errors.append({'index': index, 'error': str(e)})
+    return valid, errors
+
+
+def create_robot(cleaned):
+    """Создаем робота, если его event_id еще не встречался.
+
+    Возвращает (робот, создан ли он сейчас). Повтор возвращает ранее
+    созданного робота без записи и без повторных уведомлений.
+    """
+    event_id = cleaned.get('event_id')
+    if event_id:
+        seen = find_seen_events([event_id])
+        if event_id in seen:
+            return Robot.objects.get(pk=seen[event_id]), False
+
+    try:
+        with transaction.atomic():
+            robot = Robot.objects.create(**cleaned)
+    except IntegrityError:
+        if not event_id:
+            raise
+        # Тот же event_id одновременно сохранил параллельный запрос
+        return Robot.objects.get(event_id=event_id), False
+
+    if event_id:
+        transaction.on_commit(lambda: remember_events([robot]))
+    return robot, True
+
+
+def bulk_create_robots(cleaned_records):
+    """Сохраняем пачку роботов одним bulk_create в одной транзакции.
+
+    Записи с уже обработанными event_id пропускаются, поэтому повтор
+    пачки сводится к проверке по кэшу. bulk_create не отправляет
+    post_save, поэтому сводка производства обновляется здесь же, а
+    резервирование за ожидающими заказами выполняется после коммита,
+    одним запросом на каждую пару модель/версия. Возвращает только
+    созданных роботов.
+    """
+    for attempt in range(2):
+        robots = [Robot(**data) for data in skip_seen_events(cleaned_records)]
+        if not robots:
+            return robots
+
+        try:
+            with transaction.atomic():
+                robots = Robot.objects.bulk_create(robots)
+                with phase('rollup'):
+                    record_production(robots)
+
+                transaction.on_commit(lambda: remember_events(robots))
+                transaction.on_commit(lambda: allocate_and_notify(robots))
+        except IntegrityError:
+            # Часть событий одновременно сохранил параллельный запрос:
+            # повторяем, отбросив уже записанные
+            if attempt:
+                raise
+            continue
+
+        return robots
+
+
+def serialize_robot(robot):
+    """Представление робота в ответе API"""
+    data = {
+        'serial': robot.serial,
+        'model': robot.model,
+        'version': robot.version,
+        'created': format_datetime(robot.created)
+    }
+    if robot.event_id:
+        data['event_id'] = robot.event_id
+    return data
+
+
+def ingest_ndjson_lines(lines, chunk_size=1000, idempotency_key=None):
+    """Потоково загружаем роботов из итератора NDJSON-строк.
+
+    Записи сохраняются порциями по chunk_size, каждая в своей транзакции,
+    поэтому в памяти одновременно находится не больше одной порции.
+    После каждой порции отдается словарь с прогрессом и ошибками порции.
+    С idempotency_key записи без event_id получают "<ключ>:<номер строки>",
+    поэтому повтор выгрузки не создает роботов заново.
+    """
+    validate = get_robot_validator()
+    chunk, errors = [], []
+    line_number = created = failed = 0
+
+    for line_number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        if not line.strip():
+            continue
+
+        try:
+            data = json_codec.loads(line)
+            if idempotency_key is not None and isinstance(data, dict):
+                data.setdefault('event_id', f'{idempotency_key}:{line_number}')
+            chunk.append(validate(data))
+        except json_codec.DecodeError:
+            errors.append({'line': line_number, 'error': 'Invalid JSON format'})
+        except RobotValidationError as e:
+            errors.append({'line': line_number, 'error': str(e)})
+
+        if len(chunk) + len(errors) >= chunk_size:
+            created += len(bulk_create_robots(chunk))
+            failed += len(errors)
+            yield {'line': line_number, 'created': created, 'errors': errors}
+            chunk, errors = [], []
+            # Каталог перечитывается на каждой порции длинной выгрузки
+            validate = get_robot_validator()
+
+    if chunk or errors:
+        created += len(bulk_create_robots(chunk))
+        failed += len(errors)
+        yield {'line': line_number, 'created': created, 'errors': errors}
+
+    yield {'done': True, 'lines': line_number, 'created': created, 'failed': failed}
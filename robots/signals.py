@@ -1,47 +1,88 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.db import transaction
 from django.dispatch import receiver
-from django.core.mail import send_mail
-from django.conf import settings
-from .models import Robot
-from orders.models import Order
+from django.utils import timezone
+from .catalog import mark_catalog_changed
+from .models import Robot, RobotModel, RobotVersion, make_serial
+from .notifications import get_digest_window
+from .rollups import record_production
+from .stock import add_unallocated
+from customers.models import Customer
+from orders.allocation import allocate_robots
+from orders.models import Notification
+from R4C.metrics import phase
+
+@receiver(pre_save, sender=Robot)
+def fill_robot_serial(sender, instance, **kwargs):
+    """Заполняем серийный номер, если робот создается без него"""
+    if not instance.serial:
+        instance.serial = make_serial(instance.model, instance.version)
+
 
 @receiver(post_save, sender=Robot)
 def notify_customers_about_robot(sender, instance, created, **kwargs):
-    """Отправляем уведомления клиентам при создании нового робота"""
+    """Резервируем нового робота и ставим уведомление клиенту в очередь"""
     if not created:
         return
-        
-    # Формируем серийный номер робота
-    robot_serial = f"{instance.model}-{instance.version}"
-    
-    # Ищем ожидающие заказы на этого робота
-    pending_orders = Order.objects.filter(
-        robot_serial=robot_serial,
-        status=Order.PENDING
-    ).select_related('customer')
-    
-    # Отправляем уведомления каждому клиенту
-    for order in pending_orders:
-        send_notification_email(
-            order.customer.email,
-            instance.model,
-            instance.version
-        )
-        
-def send_notification_email(email, model, version):
-    """Отправка email уведомления клиенту"""
-    subject = 'Робот доступен к заказу'
-    message = f"""
-Добрый день!
-
-Недавно вы интересовались нашим роботом модели {model}, версии {version}. 
-Этот робот теперь в наличии. Если вам подходит этот вариант - пожалуйста, свяжитесь с нами
+
+    allocate_and_notify([instance])
+
+
+@receiver(post_save, sender=Robot)
+def update_production_rollup(sender, instance, created, **kwargs):
+    """Учитываем нового робота в суточной сводке производства"""
+    if not created:
+        return
+
+    with phase('rollup'):
+        record_production([instance])
+
+
+@receiver(post_save, sender=RobotModel)
+@receiver(post_delete, sender=RobotModel)
+@receiver(post_save, sender=RobotVersion)
+@receiver(post_delete, sender=RobotVersion)
+def invalidate_catalog(sender, **kwargs):
+    """Сбрасываем кэш каталога после изменения моделей или версий"""
+    mark_catalog_changed()
+
+
+def allocate_and_notify(robots):
+    """Резервируем роботов за ожидающими заказами и уведомляем их владельцев.
+
+    Уведомление получает только клиент, за которым зарезервирован робот,
+    поэтому об одном роботе не узнают сразу несколько ожидающих.
+    Письма здесь не отправляются: этим занимается команда
+    send_notifications, поэтому почтовый сервер не влияет на создание робота.
     """
-    
-    send_mail(
-        subject=subject,
-        message=message.strip(),
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[email],
-        fail_silently=False,
-    )
\ No newline at end of file
+    with phase('allocate'), transaction.atomic():
+        orders = allocate_robots(robots)
+        # Незарезервированные роботы поступают в свободный остаток
+        add_unallocated(robots, [order.robot for order in orders])
+
+    if not orders:
+        return
+
+    emails = dict(
+        Customer.objects.filter(
+            pk__in={order.customer_id for order in orders}
+        ).values_list('pk', 'email')
+    )
+
+    # Уведомление на заказ создается не больше одного раза. Отправка
+    # откладывается на окно дайджеста, чтобы уведомления клиента,
+    # пришедшие за это время, ушли одним письмом
+    send_at = timezone.now() + get_digest_window()
+    Notification.objects.bulk_create(
+        [
+            Notification(
+                order=order,
+                email=emails[order.customer_id],
+                robot_model=order.robot.model,
+                robot_version=order.robot.version,
+                next_attempt_at=send_at,
+            )
+            for order in orders
+        ],
+        ignore_conflicts=True,
+    )
@@ -0,0 +1,183 @@
+"""
+Локальная очередь загрузки роботов.
+
+HTTP-запрос только дописывает проверенные записи в очередь (отдельный
+файл SQLite в режиме WAL) и сразу отвечает 202, а команда
+drain_ingest_spool разбирает очередь крупными транзакциями. Всплески
+поступлений поглощаются со скоростью записи на диск, а нагрузка на
+основную базу сглаживается размером пачки и ограничением скорости.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from django.conf import settings
+
+from R4C import json_codec
+
+from .models import make_serial
+from .services import bulk_create_robots, format_datetime, parse_datetime
+
+
+_local = threading.local()
+
+
+def get_spool_path():
+    return getattr(
+        settings,
+        'INGEST_SPOOL_PATH',
+        os.path.join(settings.BASE_DIR, 'data', 'ingest_spool.sqlite3')
+    )
+
+
+class IngestSpool:
+    """Очередь записей о роботах в файле SQLite.
+
+    Записи захватываются обработчиком по токену и удаляются только после
+    сохранения в основную базу. Каждой записи при постановке назначается
+    event_id, поэтому повторная обработка после сбоя обработчика не
+    создает дубликатов.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS spool ('
+            ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' payload TEXT NOT NULL,'
+            ' claim_token TEXT,'
+            ' claimed_at REAL)'
+        )
+        self.connection.execute(
+            'CREATE INDEX IF NOT EXISTS spool_claim_idx ON spool (claim_token, id)'
+        )
+
+    def append(self, cleaned_records):
+        """Дописываем проверенные записи одной транзакцией"""
+        rows = []
+        for data in cleaned_records:
+            rows.append((json_codec.dumps({
+                'model': data['model'],
+                'version': data['version'],
+                'created': format_datetime(data['created']),
+                'event_id': data.get('event_id') or f'spool:{uuid.uuid4().hex}',
+            }).decode('utf-8'),))
+
+        with self.transaction():
+            self.connection.executemany('INSERT INTO spool (payload) VALUES (?)', rows)
+        return len(rows)
+
+    def claim(self, batch_size):
+        """Захватываем до batch_size записей; возвращаем (токен, записи)"""
+        token = uuid.uuid4().hex
+        with self.transaction():
+            self.connection.execute(
+                'UPDATE spool SET claim_token = ?, claimed_at = ? WHERE id IN ('
+                ' SELECT id FROM spool WHERE claim_token IS NULL ORDER BY id LIMIT ?)',
+                (token, time.time(), batch_size)
+            )
+        payloads = self.connection.execute(
+            'SELECT payload FROM spool WHERE claim_token = ? ORDER BY id', (token,)
+        ).fetchall()
+        return token, [json_codec.loads(payload) for payload, in payloads]
+
+    def ack(self, token):
+        """Удаляем записи, сохраненные в основную базу"""
+        with self.transaction():
+            self.connection.execute('DELETE FROM spool WHERE claim_token = ?', (token,))
+
+    def release(self, token):
+        """Возвращаем захваченные записи в очередь после ошибки"""
+        with self.transaction():
+            self.connection.execute(
+                'UPDATE spool SET claim_token = NULL, claimed_at = NULL WHERE claim_token = ?',
+                (token,)
+            )
+
+    def requeue_stale(self, older_than):
+        """Возвращаем в очередь записи, захваченные упавшим обработчиком"""
+        with self.transaction():
+            return self.connection.execute(
+                'UPDATE spool SET claim_token = NULL, claimed_at = NULL'
+                ' WHERE claim_token IS NOT NULL AND claimed_at < ?',
+                (time.time() - older_than,)
+            ).rowcount
+
+    def depth(self):
+        """Количество записей в очереди, включая захваченные"""
+        return self.connection.execute('SELECT COUNT(*) FROM spool').fetchone()[0]
+
+    def transaction(self):
+        return _SpoolTransaction(self.connection)
+
+
+class _SpoolTransaction:
+    """BEGIN IMMEDIATE ... COMMIT: блокировка записи берется сразу"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+
+    def __exit__(self, exc_type, *args):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+def get_spool():
+    """Очередь текущего потока (соединения SQLite не разделяются между потоками)"""
+    path = get_spool_path()
+    spool = getattr(_local, 'spool', None)
+    if spool is None or spool.path != path:
+        spool = _local.spool = IngestSpool(path)
+    return spool
+
+
+def to_cleaned(payload):
+    """Запись очереди в виде, принимаемом bulk_create_robots"""
+    return {
+        'serial': make_serial(payload['model'], payload['version']),
+        'model': payload['model'],
+        'version': payload['version'],
+        'created': parse_datetime(payload['created']),
+        'event_id': payload['event_id'],
+    }
+
+
+def drain_spool(batch_size=5000, max_rate=None):
+    """Переносим записи из очереди в базу пачками по batch_size, пока она не опустеет.
+
+    max_rate ограничивает скорость записи (роботов в секунду).
+    Возвращает количество обработанных записей и созданных роботов.
+    """
+    spool = get_spool()
+    processed = created = 0
+    while True:
+        token, payloads = spool.claim(batch_size)
+        if not payloads:
+            return processed, created
+
+        started = time.monotonic()
+        try:
+            robots = bulk_create_robots([to_cleaned(payload) for payload in payloads])
+        except Exception:
+            spool.release(token)
+            raise
+        spool.ack(token)
+
+        processed += len(payloads)
+        created += len(robots)
+
+        if max_rate:
+            # Выравниваем запись: пачка не чаще, чем позволяет max_rate
+            pause = len(payloads) / max_rate - (time.monotonic() - started)
+            if pause > 0:
+                time.sleep(pause)
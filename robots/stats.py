@@ -0,0 +1,340 @@
+"""
+Статистика производства для дашбордов.
+
+Каждый процесс держит в памяти почасовые кольцевые буферы по парам
+модель/версия за последние семь дней. Буферы пополняются после коммита
+вставки роботов, поэтому /robots/stats/ не обращается к таблице Robot.
+Раз в PRODUCTION_STATS_CHECKPOINT_INTERVAL секунд фоновый поток процесса
+дописывает накопленные приращения в ProductionHourly и перечитывает
+буферы оттуда, получая роботов, загруженных другими процессами.
+Команды загрузки пишут контрольную точку сами после каждой порции.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .models import ProductionHourly, Robot
+
+
+HOUR = 3600
+WINDOW_HOURS = 7 * 24
+
+logger = logging.getLogger(__name__)
+
+
+def production_hour(created):
+    """Номер часа производства от начала эпохи"""
+    if timezone.is_naive(created):
+        created = timezone.make_aware(created)
+    return int(created.timestamp()) // HOUR
+
+
+def hour_start(hour):
+    """Начало часа с номером hour"""
+    return datetime.fromtimestamp(hour * HOUR, tz=dt_timezone.utc)
+
+
+class HourlyRing:
+    """Почасовые счетчики за последние size часов.
+
+    Сумма по окну поддерживается при добавлении и сдвиге окна, поэтому
+    итог за неделю читается без обхода буфера.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.counts = [0] * size
+        self.head = None  # последний час окна
+        self.total = 0
+
+    def advance(self, hour):
+        """Сдвигаем окно вперед так, чтобы оно заканчивалось часом hour"""
+        if self.head is None:
+            self.head = hour
+            return
+        if hour <= self.head:
+            return
+
+        # Освобождаем ячейки часов, выпадающих из окна
+        for expired in range(self.head + 1, min(hour, self.head + self.size) + 1):
+            slot = expired % self.size
+            self.total -= self.counts[slot]
+            self.counts[slot] = 0
+        self.head = hour
+
+    def add(self, hour, count):
+        self.advance(hour)
+        if hour <= self.head - self.size:
+            return  # старше окна
+        self.counts[hour % self.size] += count
+        self.total += count
+
+    def get(self, hour):
+        if self.head is None or not self.head - self.size < hour <= self.head:
+            return 0
+        return self.counts[hour % self.size]
+
+    def sum(self, start, end):
+        """Сумма за часы с start по end включительно"""
+        return sum(self.get(hour) for hour in range(start, end + 1))
+
+
+def write_hourly(deltas, now_hour):
+    """Дописываем приращения {(model, version, hour): count} и удаляем часы вне окна"""
+    with transaction.atomic():
+        for (model, version, hour), count in sorted(deltas.items()):
+            rows = ProductionHourly.objects.filter(
+                model=model, version=version, hour=hour_start(hour)
+            )
+            if rows.update(count=F('count') + count):
+                continue
+            try:
+                with transaction.atomic():
+                    ProductionHourly.objects.create(
+                        model=model, version=version, hour=hour_start(hour), count=count
+                    )
+            except IntegrityError:
+                # Строку успел создать другой процесс
+                rows.update(count=F('count') + count)
+
+        ProductionHourly.objects.filter(
+            hour__lte=hour_start(now_hour - WINDOW_HOURS)
+        ).delete()
+
+
+def read_hourly(now_hour):
+    """Счетчики окна из контрольной точки: (model, version, hour, count)"""
+    rows = ProductionHourly.objects.filter(
+        hour__gt=hour_start(now_hour - WINDOW_HOURS)
+    ).values_list('model', 'version', 'hour', 'count')
+    return [
+        (model, version, production_hour(hour), count)
+        for model, version, hour, count in rows
+    ]
+
+
+def rebuild_hourly():
+    """Пересчитываем контрольную точку за окно по таблице Robot.
+
+    Приращения, еще не записанные работающими процессами, добавятся
+    к пересчитанным значениям, поэтому пересчет выполняется при
+    остановленной загрузке.
+    """
+    now_hour = production_hour(timezone.now())
+    rows = Robot.objects.filter(
+        created__gte=hour_start(now_hour - WINDOW_HOURS + 1)
+    ).annotate(
+        hour=TruncHour('created', tzinfo=dt_timezone.utc)
+    ).values(
+        'model', 'version', 'hour'
+    ).annotate(
+        count=Count('id')
+    ).order_by()
+
+    with transaction.atomic():
+        ProductionHourly.objects.all().delete()
+        created = ProductionHourly.objects.bulk_create(
+            [ProductionHourly(**row) for row in rows]
+        )
+
+    production_stats.reset()
+    return len(created)
+
+
+class ProductionStats:
+    """Почасовые буферы производства в памяти процесса.
+
+    Буферы содержат контрольную точку из ProductionHourly плюс
+    приращения этого процесса, еще не записанные в нее. Роботы других
+    процессов появляются после их и нашей контрольной точки, то есть
+    с задержкой не больше двух интервалов.
+    """
+
+    def __init__(self):
+        self._rings = None
+        self._pending = Counter()
+        self._checkpoint_at = 0.0
+        self._lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()
+        self._thread = None
+
+    def record(self, robots):
+        """Учитываем сохраненных роботов.
+
+        Вызывается после коммита вставки, поэтому только обновляет
+        буферы в памяти: в базу приращения пишет контрольная точка.
+        """
+        now_hour = production_hour(timezone.now())
+        counts = Counter(
+            (robot.model, robot.version, production_hour(robot.created))
+            for robot in robots
+        )
+
+        with self._lock:
+            for (model, version, hour), count in counts.items():
+                # Час из будущего допускается только в пределах расхождения часов
+                if not now_hour - WINDOW_HOURS < hour <= now_hour + 1:
+                    continue
+                self._pending[model, version, hour] += count
+                if self._rings is not None:
+                    self._get_ring(model, version).add(hour, count)
+
+    def start_checkpoints(self):
+        """Запускаем фоновый поток контрольных точек процесса"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run_checkpoints, name='production-stats', daemon=True
+            )
+        self._thread.start()
+
+    def _run_checkpoints(self):
+        while True:
+            time.sleep(getattr(settings, 'PRODUCTION_STATS_CHECKPOINT_INTERVAL', 10))
+            self.maybe_checkpoint()
+            close_old_connections()
+
+    def maybe_checkpoint(self):
+        """Контрольная точка, если буферы не загружены или истек интервал.
+
+        Если точку уже пишет другой поток, загруженные буферы читаются
+        без ожидания.
+        """
+        if not self._is_stale():
+            return
+        if not self._checkpoint_lock.acquire(blocking=self._rings is None):
+            return
+        try:
+            # Пока ждали блокировку, точку мог записать другой поток
+            if self._is_stale():
+                self._checkpoint()
+        finally:
+            self._checkpoint_lock.release()
+
+    def checkpoint(self):
+        """Пишем накопленные приращения в базу и перечитываем буферы"""
+        with self._checkpoint_lock:
+            self._checkpoint()
+
+    def _is_stale(self):
+        interval = getattr(settings, 'PRODUCTION_STATS_CHECKPOINT_INTERVAL', 10)
+        return self._rings is None or time.monotonic() - self._checkpoint_at >= interval
+
+    def _checkpoint(self):
+        now_hour = production_hour(timezone.now())
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+
+        try:
+            if pending:
+                write_hourly(pending, now_hour)
+            rows = read_hourly(now_hour)
+        except Exception:
+            # Приращения вернутся в базу со следующей контрольной точкой
+            with self._lock:
+                self._pending.update(pending)
+            logger.exception('Production stats checkpoint failed')
+            return
+
+        with self._lock:
+            self._fill(rows)
+            self._checkpoint_at = time.monotonic()
+
+    def _load(self):
+        """Загружаем буферы из контрольной точки, ничего не записывая"""
+        try:
+            rows = read_hourly(production_hour(timezone.now()))
+        except Exception:
+            logger.exception('Production stats load failed')
+            return
+
+        with self._lock:
+            self._fill(rows)
+
+    def _fill(self, rows):
+        """Буферы из строк контрольной точки плюс незаписанные приращения"""
+        self._rings = {}
+        for model, version, hour, count in rows:
+            self._get_ring(model, version).add(hour, count)
+        # Роботы, учтенные, но еще не записанные в контрольную точку
+        for (model, version, hour), count in self._pending.items():
+            self._get_ring(model, version).add(hour, count)
+
+    def snapshot(self, hours=24):
+        """Статистика для дашборда: почасовой ряд за hours часов, итоги и тренд.
+
+        Стоимость зависит только от количества пар модель/версия и
+        длины ряда, но не от количества роботов. Запрос к базе выполняется
+        только для первой загрузки буферов и только на чтение: запись
+        контрольных точек остается фоновому потоку и командам загрузки.
+        Если загрузить буферы не удалось, статистика пуста.
+        """
+        if self._rings is None:
+            with self._checkpoint_lock:
+                if self._rings is None:
+                    self._load()
+        now = timezone.now()
+        now_hour = production_hour(now)
+
+        models = []
+        with self._lock:
+            for (model, version), ring in sorted((self._rings or {}).items()):
+                ring.advance(now_hour)
+                if not ring.total:
+                    continue
+
+                last_day = ring.sum(now_hour - 23, now_hour)
+                previous_day = ring.sum(now_hour - 47, now_hour - 24)
+                models.append({
+                    'model': model,
+                    'version': version,
+                    'last_hour': ring.get(now_hour),
+                    'total_24h': last_day,
+                    'total_7d': ring.total,
+                    'rate_per_hour_24h': round(last_day / 24, 3),
+                    'rate_per_hour_previous_24h': round(previous_day / 24, 3),
+                    'trend': (
+                        round((last_day - previous_day) / previous_day, 3)
+                        if previous_day else None
+                    ),
+                    'hourly': [
+                        {
+                            'hour': timezone.localtime(hour_start(hour)).isoformat(),
+                            'count': ring.get(hour),
+                        }
+                        for hour in range(now_hour - hours + 1, now_hour + 1)
+                    ],
+                })
+
+        return {
+            'generated_at': timezone.localtime(now).isoformat(),
+            'hours': hours,
+            'total_7d': sum(item['total_7d'] for item in models),
+            'models': models,
+        }
+
+    def reset(self):
+        """Сбрасываем буферы и незаписанные приращения процесса"""
+        with self._lock:
+            self._rings = None
+            self._pending = Counter()
+            self._checkpoint_at = 0.0
+
+    def _get_ring(self, model, version):
+        ring = self._rings.get((model, version))
+        if ring is None:
+            ring = self._rings[model, version] = HourlyRing(WINDOW_HOURS)
+        return ring
+
+
+production_stats = ProductionStats()
@@ -0,0 +1,105 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import Robot, RobotStock
+
+
+STOCK_ALL_KEY = 'stock:all'
+
+
+def get_stock_key(model, version):
+    return f'stock:{model}-{version}'
+
+
+def get_cache_ttl():
+    """Граница устаревания остатков, прочитанных из кэша, в секундах"""
+    return getattr(settings, 'STOCK_CACHE_TTL', 5)
+
+
+def adjust_stock(deltas):
+    """Атомарно меняем остатки: deltas - словарь {(model, version): изменение}.
+
+    Кэш сбрасывается после коммита, поэтому читатели с общим кэшем сразу
+    видят новые значения, а остальные - не позже чем через STOCK_CACHE_TTL.
+    """
+    deltas = {pair: delta for pair, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        for (model, version), delta in sorted(deltas.items()):
+            rows = RobotStock.objects.filter(model=model, version=version)
+            if rows.update(available=F('available') + delta):
+                continue
+            try:
+                with transaction.atomic():
+                    RobotStock.objects.create(
+                        model=model, version=version, available=delta
+                    )
+            except IntegrityError:
+                # Строку успел создать параллельный запрос
+                rows.update(available=F('available') + delta)
+
+        keys = [get_stock_key(model, version) for model, version in deltas]
+        transaction.on_commit(lambda: cache.delete_many(keys + [STOCK_ALL_KEY]))
+
+
+def add_unallocated(robots, allocated_robots):
+    """Добавляем в остатки роботов, не зарезервированных при поступлении"""
+    allocated_ids = {robot.pk for robot in allocated_robots}
+    adjust_stock(Counter(
+        (robot.model, robot.version)
+        for robot in robots
+        if robot.pk not in allocated_ids
+    ))
+
+
+def get_available(model, version):
+    """Количество свободных роботов модели и версии (из кэша)"""
+    key = get_stock_key(model, version)
+    available = cache.get(key)
+    if available is None:
+        available = RobotStock.objects.filter(
+            model=model, version=version
+        ).values_list('available', flat=True).first() or 0
+        cache.set(key, available, get_cache_ttl())
+    return available
+
+
+def get_all_stock():
+    """Остатки по всем моделям и версиям (из кэша)"""
+    stock = cache.get(STOCK_ALL_KEY)
+    if stock is None:
+        stock = list(
+            RobotStock.objects.filter(
+                available__gt=0
+            ).order_by('model', 'version').values('model', 'version', 'available')
+        )
+        cache.set(STOCK_ALL_KEY, stock, get_cache_ttl())
+    return stock
+
+
+def rebuild_stock():
+    """Пересчитываем остатки по свободным роботам в таблице Robot"""
+    counts = Robot.objects.filter(
+        order__isnull=True
+    ).values('model', 'version').annotate(available=Count('id')).order_by()
+
+    with transaction.atomic():
+        # Сбрасываем кэш и для пар, которые исчезнут из таблицы
+        keys = [
+            get_stock_key(model, version)
+            for model, version in RobotStock.objects.values_list('model', 'version')
+        ]
+        RobotStock.objects.all().delete()
+        created = RobotStock.objects.bulk_create(
+            RobotStock(**row) for row in counts
+        )
+        keys += [get_stock_key(stock.model, stock.version) for stock in created]
+        transaction.on_commit(lambda: cache.delete_many(keys + [STOCK_ALL_KEY]))
+
+    return len(created)
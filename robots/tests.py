@@ -1,12 +1,57 @@
-from django.test import TestCase, Client
+from asgiref.sync import sync_to_async
+from django.db import DatabaseError, connection
+from django.test import AsyncClient, TestCase, TransactionTestCase, Client, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from django.core import mail
-from .models import Robot
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import F, Sum
+from R4C.json_codec import get_available_codecs
+from R4C.metrics import registry
+from . import jobs
+from .archive import archive_robots, iter_archived_robots
+from .benchmarks import compare_results, measure_concurrent_writes
+from .catalog import catalog_cache
+from .exports import pyarrow
+from .models import (
+    DataVersion,
+    ProductionDaily,
+    ProductionHourly,
+    ReportJob,
+    Robot,
+    RobotArchive,
+    RobotModel,
+    RobotStock,
+    RobotVersion,
+)
+from .notifications import dispatch_pending_notifications
+from .rollups import aggregate_robots_by_day, rebuild_daily
+from .services import (
+    DATETIME_FORMAT,
+    bulk_create_robots,
+    get_robot_validator,
+    parse_datetime,
+    validate_robot_batch,
+    validate_robot_data,
+)
+from .spool import drain_spool, get_spool, to_cleaned
+from .stats import HourlyRing, production_stats
+from .versions import bump_version
+from .views import RobotExcelReportView
 from customers.models import Customer
-from orders.models import Order
+from orders.allocation import get_pending_orders
+from orders.models import Notification, Order
 import json
-from datetime import timedelta
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+from openpyxl import load_workbook
 
 class RobotAPITests(TestCase):
     def setUp(self):
@@ -72,8 +117,300 @@ class RobotAPITests(TestCase):
         self.assertEqual(response.status_code, 400)
 
 
+class JSONCodecTests(TestCase):
+    def test_create_with_each_codec(self):
+        """Тест одинакового ответа API со всеми доступными кодеками"""
+        for index, codec in enumerate(get_available_codecs()):
+            with self.subTest(codec=codec), override_settings(JSON_CODEC=codec):
+                response = self.client.post(
+                    '/robots/api/',
+                    json.dumps({
+                        'model': 'R2',
+                        'version': 'D2',
+                        'created': '2023-01-01 00:00:00',
+                        'event_id': f'codec-{index}',
+                    }),
+                    content_type='application/json'
+                )
+                self.assertEqual(response.status_code, 201)
+                self.assertEqual(response['Content-Type'], 'application/json')
+                self.assertEqual(response.json(), {
+                    'serial': 'R2-D2',
+                    'model': 'R2',
+                    'version': 'D2',
+                    'created': '2023-01-01 00:00:00',
+                    'event_id': f'codec-{index}',
+                })
+
+                response = self.client.post(
+                    '/robots/api/', '{"model": ', content_type='application/json'
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': 'Invalid JSON format'})
+
+    def test_parse_datetime_matches_strptime(self):
+        """Тест быстрого разбора дат: те же значения и те же отказы, что у strptime"""
+        for value in [
+            '2023-01-01 00:00:00', '2024-02-29 23:59:59', '2023-1-1 0:0:0',
+            '2023-02-30 00:00:00', '2023-01-01T00:00:00', '2023-01-01 00:00+01',
+            '2023-01-01', '2023-01-01 00:00:00.5', 'invalid-date',
+        ]:
+            with self.subTest(value=value):
+                try:
+                    expected = datetime.strptime(value, DATETIME_FORMAT)
+                except ValueError:
+                    with self.assertRaises(ValueError):
+                        parse_datetime(value)
+                else:
+                    self.assertEqual(parse_datetime(value), expected)
+
+
+class RobotCatalogTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.url = '/robots/api/'
+        catalog_cache.invalidate()
+
+    def post_robot(self, model, version):
+        return self.client.post(
+            self.url,
+            json.dumps({"model": model, "version": version, "created": "2023-01-01 00:00:00"}),
+            content_type='application/json'
+        )
+
+    def test_unknown_model_rejected(self):
+        """Тест отклонения модели, которой нет в каталоге"""
+        response = self.post_robot('Z9', 'Q1')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Z9-Q1', response.json()['error'])
+
+    def test_catalog_check_without_queries(self):
+        """Тест проверки по каталогу без обращения к базе"""
+        validate_robot_data({"model": "R2", "version": "D2", "created": "2023-01-01 00:00:00"})
+        with self.assertNumQueries(0):
+            validate_robot_data({"model": "X5", "version": "LT", "created": "2023-01-01 00:00:00"})
+
+    def test_catalog_change_invalidates_cache(self):
+        """Тест: новая версия в каталоге сразу принимается"""
+        self.assertEqual(self.post_robot('R2', 'A1').status_code, 400)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RobotVersion.objects.create(
+                model=RobotModel.objects.get(code='R2'), code='A1'
+            )
+
+        self.assertEqual(self.post_robot('R2', 'A1').status_code, 201)
+
+    def test_catalog_change_in_other_process(self):
+        """Тест: изменение каталога другим процессом видно по версии в базе"""
+        self.assertEqual(self.post_robot('R2', 'A1').status_code, 400)
+
+        # Другой процесс меняет каталог и версию, не трогая память этого
+        RobotVersion.objects.bulk_create([
+            RobotVersion(model=RobotModel.objects.get(code='R2'), code='A1')
+        ])
+        bump_version(DataVersion.CATALOG)
+
+        self.assertEqual(self.post_robot('R2', 'A1').status_code, 400)
+        with self.settings(ROBOT_CATALOG_RECHECK=0):
+            self.assertEqual(self.post_robot('R2', 'A1').status_code, 201)
+
+    def test_validator_compiled_once_per_catalog(self):
+        """Тест: валидатор пересобирается только после изменения каталога"""
+        validate = get_robot_validator()
+        self.assertIs(get_robot_validator(), validate)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RobotVersion.objects.create(
+                model=RobotModel.objects.get(code='R2'), code='A1'
+            )
+
+        self.assertIsNot(get_robot_validator(), validate)
+
+
+class RobotBatchAPITests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.url = '/robots/api/batch/'
+        self.customer = Customer.objects.create(email='customer@example.com')
+        Order.objects.create(
+            customer=self.customer,
+            robot_serial='R2-D2',
+            status=Order.PENDING
+        )
+
+    def test_batch_json_array(self):
+        """Тест пакетного создания из JSON-массива с ошибкой в одной записи"""
+        data = [
+            {"model": "R2", "version": "D2", "created": "2023-01-01 00:00:00"},
+            {"model": "R2", "version": "D2", "created": "2023-01-01 00:00:01"},
+            {"model": "R2D", "version": "D2", "created": "2023-01-01 00:00:02"},
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                self.url,
+                json.dumps(data),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(body['created'], 2)
+        self.assertEqual(body['errors'][0]['index'], 2)
+        self.assertEqual(Robot.objects.count(), 2)
+        # Уведомление ставится в очередь один раз на заказ
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_batch_ndjson(self):
+        """Тест пакетного создания из NDJSON"""
+        lines = [
+            '{"model": "X5", "version": "LT", "created": "2023-01-01 00:00:00"}',
+            '',
+            '{"model": "13", "version": "XS", "created": "2023-01-01 00:00:01"}',
+        ]
+        response = self.client.post(
+            self.url,
+            '\n'.join(lines),
+            content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Robot.objects.count(), 2)
+
+    def test_batch_ndjson_malformed_line(self):
+        """Тест: строка NDJSON с неверным JSON дает ошибку только своей позиции"""
+        lines = [
+            '{"model": "X5", "version": "LT", "created": "2023-01-01 00:00:00"}',
+            '{"model": "X5", "version":',
+            '{"model": "13", "version": "XS", "created": "2023-01-01 00:00:01"}',
+        ]
+        response = self.client.post(
+            self.url,
+            '\n'.join(lines),
+            content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(body['created'], 2)
+        self.assertEqual(body['errors'], [{'index': 1, 'error': 'Invalid JSON format'}])
+        self.assertEqual(Robot.objects.count(), 2)
+
+    def test_batch_all_invalid(self):
+        """Тест пакета без корректных записей"""
+        response = self.client.post(
+            self.url,
+            json.dumps([{"model": "R2"}]),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Robot.objects.count(), 0)
+
+
+class RobotAsyncAPITests(TestCase):
+    def setUp(self):
+        # Каталог загружается из базы при первом обращении в каждом тесте
+        catalog_cache.invalidate()
+        self.client = AsyncClient()
+        self.customer = Customer.objects.create(email='customer@example.com')
+        Order.objects.create(
+            customer=self.customer,
+            robot_serial='R2-D2',
+            status=Order.PENDING
+        )
+
+    async def test_async_create(self):
+        """Тест асинхронного создания робота с постановкой уведомления"""
+        response = await self.client.post(
+            '/robots/api/async/',
+            json.dumps({"model": "R2", "version": "D2", "created": "2023-01-01 00:00:00"}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(await Robot.objects.acount(), 1)
+        self.assertEqual(await Notification.objects.acount(), 1)
+        self.assertEqual(len(mail.outbox), 0)
+
+    async def test_async_create_invalid(self):
+        """Тест асинхронного создания с неверными данными"""
+        response = await self.client.post(
+            '/robots/api/async/',
+            json.dumps({"model": "R2", "version": "D", "created": "2023-01-01 00:00:00"}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    async def test_async_cold_catalog(self):
+        """Тест асинхронных эндпоинтов сразу после сброса кэша каталога"""
+        for url, body in [
+            ('/robots/api/async/', {"model": "X5", "version": "LT", "created": "2023-01-01 00:00:00"}),
+            ('/robots/api/async/batch/', [{"model": "X5", "version": "LT", "created": "2023-01-01 00:00:01"}]),
+        ]:
+            await sync_to_async(catalog_cache.invalidate)()
+            response = await self.client.post(url, json.dumps(body), content_type='application/json')
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(await Robot.objects.acount(), 2)
+
+    async def test_async_batch(self):
+        """Тест асинхронного пакетного создания"""
+        data = [
+            {"model": "R2", "version": "D2", "created": "2023-01-01 00:00:00"},
+            {"model": "X5", "version": "LT", "created": "2023-01-01 00:00:01"},
+        ]
+        response = await self.client.post(
+            '/robots/api/async/batch/',
+            json.dumps(data),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual(await Robot.objects.acount(), 2)
+
+
+class RobotStreamIngestTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.url = '/robots/api/stream/'
+        self.lines = [
+            json.dumps({
+                "model": "R2",
+                "version": "D2",
+                "created": f"2023-01-01 00:00:{i:02d}"
+            })
+            for i in range(5)
+        ]
+        self.lines.insert(2, 'not json')
+
+    def test_stream_ingest_in_chunks(self):
+        """Тест потоковой загрузки с промежуточным прогрессом"""
+        response = self.client.post(
+            f'{self.url}?chunk_size=2',
+            '\n'.join(self.lines),
+            content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 200)
+        progress = [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+        self.assertGreater(len(progress), 2)
+        self.assertEqual(progress[-1]['created'], 5)
+        self.assertEqual(progress[-1]['failed'], 1)
+        self.assertEqual(Robot.objects.count(), 5)
+
+    def test_ingest_command(self):
+        """Тест загрузки из файла командой manage.py"""
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as f:
+            f.write('\n'.join(self.lines))
+        self.addCleanup(os.remove, f.name)
+
+        out, err = StringIO(), StringIO()
+        call_command('ingest_robots', f.name, chunk_size=2, stdout=out, stderr=err)
+
+        self.assertEqual(Robot.objects.count(), 5)
+        self.assertIn('Строка 3', err.getvalue())
+
+
 class RobotReportTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = Client()
         self.url = '/report/download/'
         
@@ -110,9 +447,138 @@ class RobotReportTests(TestCase):
         self.assertTrue(response.has_header('Content-Disposition'))
         self.assertTrue('attachment; filename="robots_report_' in response['Content-Disposition'])
 
+    def test_report_reads_rollup(self):
+        """Тест содержимого отчета, собранного по суточной сводке"""
+        response = self.client.get(self.url)
+        wb = load_workbook(BytesIO(b''.join(response.streaming_content)))
+
+        self.assertEqual(wb.sheetnames, ['Model R2'])
+        rows = list(wb['Model R2'].iter_rows(values_only=True))
+        self.assertEqual(rows, [
+            ('Модель', 'Версия', 'Количество за неделю'),
+            ('R2', 'A1', 3),
+            ('R2', 'D2', 3),
+        ])
+
+    def test_report_csv(self):
+        """Тест выгрузки отчета в CSV по параметру format"""
+        response = self.client.get(self.url, {'format': 'csv'})
+
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('.csv"', response['Content-Disposition'])
+        self.assertEqual(
+            b''.join(response.streaming_content).decode().splitlines(),
+            ['model,version,count', 'R2,A1,3', 'R2,D2,3']
+        )
+
+    def test_report_ndjson_by_accept(self):
+        """Тест выбора формата NDJSON по заголовку Accept"""
+        response = self.client.get(self.url, HTTP_ACCEPT='application/x-ndjson')
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('Accept', response['Vary'])
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(rows[0], {'model': 'R2', 'version': 'A1', 'count': 3})
+
+        # ETag зависит от формата
+        xlsx = self.client.get(self.url)
+        self.assertNotEqual(response['ETag'], xlsx['ETag'])
+
+    def test_report_unknown_format(self):
+        """Тест отклонения неизвестного формата"""
+        response = self.client.get(self.url, {'format': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_report_csv_empty(self):
+        """Тест CSV без данных: заголовок пишется всегда"""
+        ProductionDaily.objects.all().delete()
+        response = self.client.get(self.url, {'format': 'csv'})
+        self.assertEqual(b''.join(response.streaming_content).decode(), 'model,version,count\r\n')
+
+    def test_report_parquet_unavailable(self):
+        """Тест Parquet без установленного pyarrow: 406, а не ошибка внутри выгрузки"""
+        with mock.patch('robots.exports.pyarrow', None):
+            response = self.client.get(self.url, {'format': 'parquet'})
+        self.assertEqual(response.status_code, 406)
+        self.assertIn('pyarrow', response.json()['error'])
+
+    @skipUnless(pyarrow, 'pyarrow не установлен')
+    def test_report_parquet(self):
+        """Тест выгрузки отчета в Parquet"""
+        response = self.client.get(self.url, {'format': 'parquet'})
+        self.assertEqual(response['Content-Type'], 'application/vnd.apache.parquet')
+
+        table = pyarrow.parquet.read_table(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(table.column_names, ['model', 'version', 'count'])
+        self.assertEqual(
+            sorted(zip(*[table.column(name).to_pylist() for name in table.column_names])),
+            [('R2', 'A1', 3), ('R2', 'D2', 3)]
+        )
+
+    def test_rebuild_rollup(self):
+        """Тест пересчета сводки по истории"""
+        ProductionDaily.objects.all().delete()
+        call_command('rebuild_production_rollup', stdout=StringIO())
+
+        self.assertEqual(
+            ProductionDaily.objects.aggregate(total=Sum('count'))['total'],
+            Robot.objects.count()
+        )
+
+    def test_report_conditional_get(self):
+        """Тест ответа 304 при неизменных данных"""
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        # Единственный запрос - версия данных
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # Кэши должны перепроверять 304 так же, как полный ответ
+        self.assertEqual(response['ETag'], etag)
+        self.assertIn('Accept', response['Vary'])
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+    def test_report_cache_invalidation(self):
+        """Тест повторной генерации отчета после вставки робота"""
+        first = self.client.get(self.url)
+
+        # Повторное скачивание отдается из кэша, из базы читается только версия
+        with self.assertNumQueries(1):
+            cached = self.client.get(self.url)
+        self.assertEqual(
+            b''.join(cached.streaming_content),
+            b''.join(first.streaming_content)
+        )
+        self.assertIn('desc="cache"', cached['Server-Timing'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Robot.objects.create(model='X5', version='LT', created=timezone.now())
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        wb = load_workbook(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(wb.sheetnames, ['Model R2', 'Model X5'])
+
+    def test_report_version_from_other_process(self):
+        """Тест: загрузка в другом процессе меняет ETag без общего кэша"""
+        etag = self.client.get(self.url)['ETag']
+
+        # Другой процесс меняет версию в базе, не трогая кэш этого процесса
+        DataVersion.objects.filter(name=DataVersion.PRODUCTION).update(
+            version=F('version') + 1
+        )
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
     def test_empty_report(self):
         """Тест отчета без данных"""
         Robot.objects.all().delete()
+        ProductionDaily.objects.all().delete()
         response = self.client.get(self.url)
         
         self.assertEqual(response.status_code, 200)
@@ -120,6 +586,8 @@ class RobotReportTests(TestCase):
             response['Content-Type'],
             'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         )
+        wb = load_workbook(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(wb.active['A1'].value, 'Нет данных за последнюю неделю')
 
 
 class RobotNotificationTests(TestCase):
@@ -145,6 +613,12 @@ class RobotNotificationTests(TestCase):
             created=timezone.now()
         )
         
+        # Сигнал только ставит уведомление в очередь
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Notification.objects.count(), 1)
+
+        dispatch_pending_notifications()
+
         # Проверяем, что письмо отправлено
         self.assertEqual(len(mail.outbox), 1)
         sent_mail = mail.outbox[0]
@@ -155,6 +629,82 @@ class RobotNotificationTests(TestCase):
         self.assertIn('R2', sent_mail.body)
         self.assertIn('D2', sent_mail.body)
 
+    def test_notification_sent_once_per_order(self):
+        """Тест отсутствия повторного письма по тому же заказу"""
+        for _ in range(2):
+            Robot.objects.create(
+                model='R2',
+                version='D2',
+                created=timezone.now()
+            )
+            dispatch_pending_notifications()
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(
+            Notification.objects.get().status,
+            Notification.SENT
+        )
+
+    @override_settings(NOTIFICATION_MAX_ATTEMPTS=2)
+    def test_notification_retry(self):
+        """Тест повторной попытки при сбое почтового сервера"""
+        Robot.objects.create(
+            model='R2',
+            version='D2',
+            created=timezone.now()
+        )
+
+        with mock.patch(
+            'django.core.mail.backends.locmem.EmailBackend.send_messages',
+            side_effect=ConnectionError('SMTP unavailable')
+        ):
+            self.assertEqual(dispatch_pending_notifications(), (0, 1))
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.status, Notification.PENDING)
+        self.assertEqual(notification.attempts, 1)
+        self.assertGreater(notification.next_attempt_at, timezone.now())
+
+        # До наступления времени повтора письмо не отправляется
+        self.assertEqual(dispatch_pending_notifications(), (0, 0))
+
+        Notification.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(dispatch_pending_notifications(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    @override_settings(NOTIFICATION_DIGEST_WINDOW=60)
+    def test_digest_per_customer(self):
+        """Тест объединения уведомлений клиента за окно в одно письмо"""
+        for serial in ['R2-D2', 'R2-D2', 'X5-LT']:
+            Order.objects.create(customer=self.customer, robot_serial=serial)
+        other = Customer.objects.create(email='other@example.com')
+        Order.objects.create(customer=other, robot_serial='X5-LT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_create_robots(validate_robot_batch([
+                {'model': model, 'version': version, 'created': '2023-01-01 00:00:00'}
+                for model, version in [('R2', 'D2')] * 3 + [('X5', 'LT')] * 2
+            ])[0])
+        self.assertEqual(Notification.objects.count(), 5)
+
+        # До окончания окна письма копятся
+        self.assertEqual(dispatch_pending_notifications(), (0, 0))
+
+        # Окно истекло у первого уведомления - уходят все уведомления клиента
+        first = Notification.objects.filter(email=self.customer.email).order_by('id').first()
+        Notification.objects.filter(pk=first.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(dispatch_pending_notifications(), (4, 0))
+
+        self.assertEqual(len(mail.outbox), 1)
+        digest = mail.outbox[0]
+        self.assertEqual(digest.to, ['customer@example.com'])
+        self.assertIn('модель R2, версия D2 (3 шт.)', digest.body)
+        self.assertIn('модель X5, версия LT', digest.body)
+        self.assertEqual(
+            Notification.objects.get(email='other@example.com').status,
+            Notification.PENDING
+        )
+
     def test_no_notification_for_different_robot(self):
         """Тест отсутствия уведомления при создании другого робота"""
         # Создаем робота другой модели
@@ -164,7 +714,9 @@ class RobotNotificationTests(TestCase):
             created=timezone.now()
         )
         
-        # Проверяем, что письмо не отправлено
+        # Проверяем, что уведомление не поставлено и письмо не отправлено
+        self.assertEqual(Notification.objects.count(), 0)
+        dispatch_pending_notifications()
         self.assertEqual(len(mail.outbox), 0)
 
     def test_no_notification_for_completed_order(self):
@@ -180,5 +732,652 @@ class RobotNotificationTests(TestCase):
             created=timezone.now()
         )
         
-        # Проверяем, что письмо не отправлено
-        self.assertEqual(len(mail.outbox), 0)
\ No newline at end of file
+        # Проверяем, что уведомление не поставлено и письмо не отправлено
+        self.assertEqual(Notification.objects.count(), 0)
+        dispatch_pending_notifications()
+        self.assertEqual(len(mail.outbox), 0)
+
+@skipUnless(connection.vendor == 'sqlite', 'План запроса проверяется на SQLite')
+class QueryPlanTests(TestCase):
+    """Регрессионные тесты: горячие запросы не должны сканировать таблицу"""
+
+    def assertUsesIndex(self, queryset, table):
+        plan = queryset.explain()
+        self.assertNotRegex(plan, rf'SCAN {table}\b', plan)
+        self.assertRegex(plan, rf'SEARCH {table} USING (COVERING )?INDEX', plan)
+
+    def test_waitlist_lookup_uses_index(self):
+        """Поиск ожидающих заказов идет по индексу (robot_serial, status)"""
+        self.assertUsesIndex(get_pending_orders('R2-D2'), 'orders_order')
+
+    def test_report_window_uses_index(self):
+        """Выборка отчета из сводки идет по индексу дня"""
+        queryset = RobotExcelReportView().get_last_week_data()
+        self.assertUsesIndex(queryset, 'robots_productiondaily')
+
+    def test_robot_created_range_uses_index(self):
+        """Агрегация роботов за период идет по индексу created"""
+        since = timezone.localdate() - timedelta(days=7)
+        self.assertUsesIndex(aggregate_robots_by_day(since), 'robots_robot')
+
+
+class ReportJobTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.url = '/report/jobs/'
+        self.jobs_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.jobs_dir)
+
+        for day, model, version in [
+            (date(2024, 1, 1), 'R2', 'D2'),
+            (date(2024, 1, 2), 'R2', 'D2'),
+            (date(2024, 2, 1), 'R2', 'A1'),
+            (date(2024, 2, 1), 'X5', 'LT'),
+        ]:
+            ProductionDaily.objects.create(
+                model=model, version=version, day=day, count=2
+            )
+
+    def submit(self, params):
+        return self.client.post(
+            self.url,
+            json.dumps(params),
+            content_type='application/json'
+        )
+
+    def test_job_lifecycle(self):
+        """Тест постановки, опроса и скачивания отчета"""
+        params = {
+            'start': '2024-01-01',
+            'end': '2024-03-01',
+            'models': ['R2'],
+            'granularity': 'month',
+        }
+        with self.settings(REPORT_JOB_WORKERS=0, REPORT_JOBS_DIR=self.jobs_dir):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.submit(params)
+        self.assertEqual(response.status_code, 202)
+
+        status = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(status['status'], ReportJob.DONE)
+
+        download = self.client.get(status['download_url'])
+        self.assertEqual(download.status_code, 200)
+        wb = load_workbook(BytesIO(b''.join(download.streaming_content)))
+        self.assertEqual(wb.sheetnames, ['Model R2'])
+        rows = list(wb['Model R2'].iter_rows(min_row=2, values_only=True))
+        self.assertEqual(
+            [(model, version, count) for model, version, _, count in rows],
+            [('R2', 'D2', 4), ('R2', 'A1', 2)]
+        )
+
+    def test_in_flight_jobs_are_deduplicated(self):
+        """Тест повторного использования задачи с теми же параметрами"""
+        params = {'start': '2024-01-01', 'end': '2024-01-31'}
+        first = self.submit(params).json()
+        second = self.submit(dict(params, granularity='day')).json()
+
+        self.assertEqual(first['id'], second['id'])
+        self.assertEqual(ReportJob.objects.count(), 1)
+
+    def test_stale_job_not_reused(self):
+        """Тест: задача, потерянная при перезапуске пула, не возвращается вечно"""
+        params = {'start': '2024-01-01', 'end': '2024-01-31'}
+        stale = self.submit(params).json()
+        ReportJob.objects.filter(pk=stale['id']).update(
+            status=ReportJob.RUNNING,
+            created_at=timezone.now() - timedelta(hours=1)
+        )
+
+        with self.settings(REPORT_JOB_TIMEOUT=600):
+            fresh = self.submit(params).json()
+
+        self.assertNotEqual(fresh['id'], stale['id'])
+        self.assertEqual(self.client.get(stale['status_url']).json()['status'], ReportJob.FAILED)
+        self.assertEqual(ReportJob.objects.get(pk=stale['id']).status, ReportJob.FAILED)
+        self.assertEqual(ReportJob.objects.get(pk=fresh['id']).status, ReportJob.PENDING)
+
+    def test_download_not_ready(self):
+        """Тест скачивания еще не готового отчета"""
+        job = self.submit({'start': '2024-01-01', 'end': '2024-01-31'}).json()
+        response = self.client.get(f"{self.url}{job['id']}/download/")
+        self.assertEqual(response.status_code, 409)
+
+    def test_job_csv(self):
+        """Тест фоновой выгрузки за период в CSV"""
+        params = {'start': '2024-01-01', 'end': '2024-03-01', 'granularity': 'month', 'format': 'csv'}
+        with self.settings(REPORT_JOB_WORKERS=0, REPORT_JOBS_DIR=self.jobs_dir):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.submit(params)
+
+        status = self.client.get(response.json()['status_url']).json()
+        download = self.client.get(status['download_url'])
+        self.assertEqual(download['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(
+            b''.join(download.streaming_content).decode().splitlines(),
+            [
+                'model,version,period,count',
+                'R2,D2,2024-01-01,4',
+                'R2,A1,2024-02-01,2',
+                'X5,LT,2024-02-01,2',
+            ]
+        )
+
+    def test_invalid_params(self):
+        """Тест неверных параметров отчета"""
+        response = self.submit({'start': '2024-02-01', 'end': '2024-01-01'})
+        self.assertEqual(response.status_code, 400)
+        response = self.submit({
+            'start': '2024-01-01', 'end': '2024-01-31', 'granularity': 'hour'
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+class ReportJobPoolTests(TransactionTestCase):
+    def setUp(self):
+        self.jobs_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.jobs_dir)
+        self.addCleanup(jobs.reset_executor)
+        ProductionDaily.objects.create(
+            model='R2', version='D2', day=date(2024, 1, 1), count=2
+        )
+
+    def wait_for_job(self, status_url, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status = self.client.get(status_url).json()
+            if status['status'] in (ReportJob.DONE, ReportJob.FAILED):
+                return status
+            time.sleep(0.2)
+        self.fail('report job did not finish')
+
+    def test_job_in_process_pool(self):
+        """Тест построения отчета в пуле процессов, в том числе после падения пула"""
+        broken = mock.Mock()
+        broken.submit.side_effect = BrokenProcessPool('worker died')
+        jobs._executor = broken
+
+        params = {'start': '2024-01-01', 'end': '2024-01-31', 'format': 'csv'}
+        with self.settings(REPORT_JOB_WORKERS=1, REPORT_JOBS_DIR=self.jobs_dir):
+            response = self.client.post(
+                '/report/jobs/', json.dumps(params), content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 202)
+            status = self.wait_for_job(response.json()['status_url'])
+
+        broken.shutdown.assert_called_once()
+        self.assertEqual(status['status'], ReportJob.DONE, status.get('error'))
+        download = self.client.get(status['download_url'])
+        self.assertEqual(
+            b''.join(download.streaming_content).decode().splitlines(),
+            ['model,version,period,count', 'R2,D2,2024-01-01,2']
+        )
+
+
+class RobotStatsTests(TestCase):
+    def setUp(self):
+        production_stats.reset()
+        self.client = Client()
+        self.url = '/robots/stats/'
+
+    def ingest(self, model, version, count, hours_ago=0):
+        created = timezone.now().replace(tzinfo=None) - timedelta(hours=hours_ago)
+        records = [
+            {'model': model, 'version': version, 'created': created.strftime(DATETIME_FORMAT)}
+        ] * count
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_create_robots(validate_robot_batch(records)[0])
+
+    def test_stats_updated_on_ingest(self):
+        """Тест статистики из счетчиков в памяти без запросов к базе"""
+        # Буферы загружены контрольной точкой до загрузки роботов
+        production_stats.checkpoint()
+        self.ingest('R2', 'D2', 3)
+        self.ingest('X5', 'LT', 1)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'hours': 6})
+        self.assertEqual(response.status_code, 200)
+
+        stats = response.json()
+        self.assertEqual(stats['total_7d'], 4)
+        r2d2 = stats['models'][0]
+        self.assertEqual((r2d2['model'], r2d2['version']), ('R2', 'D2'))
+        self.assertEqual(r2d2['last_hour'], 3)
+        self.assertEqual(r2d2['total_24h'], 3)
+        self.assertEqual([point['count'] for point in r2d2['hourly']], [0, 0, 0, 0, 0, 3])
+
+    def test_trend_and_window(self):
+        """Тест тренда по суткам и окна в семь дней"""
+        self.ingest('R2', 'D2', 2, hours_ago=30)
+        self.ingest('R2', 'D2', 4, hours_ago=1)
+        self.ingest('R2', 'D2', 5, hours_ago=24 * 8)
+
+        r2d2 = self.client.get(self.url).json()['models'][0]
+        self.assertEqual(r2d2['total_7d'], 6)
+        self.assertEqual(r2d2['total_24h'], 4)
+        self.assertEqual(r2d2['trend'], 1.0)
+
+    def test_checkpoint_shared_with_other_processes(self):
+        """Тест контрольной точки: другой процесс читает статистику из базы"""
+        self.ingest('R2', 'D2', 3)
+        production_stats.checkpoint()
+        self.assertEqual(ProductionHourly.objects.get().count, 3)
+
+        # Новый процесс начинает с пустыми буферами
+        production_stats.reset()
+        self.assertEqual(self.client.get(self.url).json()['total_7d'], 3)
+
+        call_command('rebuild_production_rollup', stdout=StringIO())
+        self.assertEqual(self.client.get(self.url).json()['total_7d'], 3)
+
+    def test_record_without_queries(self):
+        """Тест: учет роботов после коммита не обращается к базе"""
+        robots = [Robot(serial='R2-D2', model='R2', version='D2', created=timezone.now())]
+        with self.assertNumQueries(0):
+            production_stats.record(robots)
+        self.assertFalse(ProductionHourly.objects.exists())
+
+        # Первая загрузка буферов только читает контрольную точку
+        self.assertEqual(self.client.get(self.url).json()['total_7d'], 1)
+        self.assertFalse(ProductionHourly.objects.exists())
+
+        production_stats.checkpoint()
+        self.assertEqual(ProductionHourly.objects.get().count, 1)
+
+    @override_settings(PRODUCTION_STATS_CHECKPOINT_INTERVAL=0)
+    def test_snapshot_does_not_write(self):
+        """Тест: опрос статистики не пишет контрольную точку даже после интервала"""
+        production_stats.checkpoint()
+        self.ingest('R2', 'D2', 2)
+
+        with self.assertNumQueries(0):
+            stats = self.client.get(self.url).json()
+        self.assertEqual(stats['total_7d'], 2)
+        self.assertFalse(ProductionHourly.objects.exists())
+
+    def test_checkpoint_failure_logged(self):
+        """Тест: сбой контрольной точки не теряет приращения"""
+        self.ingest('R2', 'D2', 2)
+        with mock.patch('robots.stats.write_hourly', side_effect=DatabaseError('locked')):
+            with self.assertLogs('robots.stats', 'ERROR'):
+                production_stats.checkpoint()
+        self.assertFalse(ProductionHourly.objects.exists())
+
+        production_stats.checkpoint()
+        self.assertEqual(ProductionHourly.objects.get().count, 2)
+
+    def test_ring_expires_old_hours(self):
+        """Тест сдвига окна кольцевого буфера"""
+        ring = HourlyRing(3)
+        ring.add(10, 1)
+        ring.add(11, 2)
+        ring.add(12, 3)
+        self.assertEqual(ring.total, 6)
+
+        ring.advance(14)
+        self.assertEqual(ring.total, 3)
+        self.assertEqual([ring.get(hour) for hour in range(10, 15)], [0, 0, 3, 0, 0])
+
+        ring.add(11, 5)
+        self.assertEqual(ring.total, 3)
+
+    def test_invalid_hours(self):
+        """Тест неверной длины ряда"""
+        self.assertEqual(self.client.get(self.url, {'hours': 0}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'hours': 'day'}).status_code, 400)
+
+
+class RobotStockTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.url = '/robots/stock/'
+        customer = Customer.objects.create(email='customer@example.com')
+        Order.objects.create(customer=customer, robot_serial='R2-D2')
+
+    def create_robots(self, model, version, count):
+        for _ in range(count):
+            Robot.objects.create(model=model, version=version, created=timezone.now())
+
+    def test_stock_counts_unallocated_robots(self):
+        """Тест: в остаток попадают только незарезервированные роботы"""
+        self.create_robots('R2', 'D2', 3)
+        self.create_robots('X5', 'LT', 1)
+
+        response = self.client.get(self.url, {'model': 'R2', 'version': 'D2'})
+        self.assertEqual(response.json()['available'], 2)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()['stock'], [
+            {'model': 'R2', 'version': 'D2', 'available': 2},
+            {'model': 'X5', 'version': 'LT', 'available': 1},
+        ])
+
+    def test_stock_served_from_cache(self):
+        """Тест чтения остатка из кэша без запросов к базе"""
+        self.create_robots('R2', 'D2', 2)
+        self.client.get(self.url, {'model': 'R2', 'version': 'D2'})
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'model': 'R2', 'version': 'D2'})
+        self.assertEqual(response.json()['available'], 1)
+
+    def test_stock_invalidated_on_insert(self):
+        """Тест обновления остатка после поступления робота"""
+        self.client.get(self.url, {'model': 'X5', 'version': 'LT'})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_robots('X5', 'LT', 1)
+
+        response = self.client.get(self.url, {'model': 'X5', 'version': 'LT'})
+        self.assertEqual(response.json()['available'], 1)
+
+    def test_rebuild_stock(self):
+        """Тест пересчета остатков"""
+        self.create_robots('R2', 'D2', 3)
+        RobotStock.objects.all().delete()
+        call_command('rebuild_stock', stdout=StringIO())
+
+        self.assertEqual(RobotStock.objects.get(model='R2', version='D2').available, 2)
+
+    def test_missing_version(self):
+        """Тест запроса остатка без версии"""
+        response = self.client.get(self.url, {'model': 'R2'})
+        self.assertEqual(response.status_code, 400)
+
+
+class RobotSerialTests(TestCase):
+    def test_serial_set_on_api_create(self):
+        """Тест заполнения серийного номера при создании через API"""
+        response = Client().post(
+            '/robots/api/',
+            json.dumps({"model": "R2", "version": "D2", "created": "2023-01-01 00:00:00"}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.json()['serial'], 'R2-D2')
+        self.assertEqual(Robot.objects.get().serial, 'R2-D2')
+
+    def test_serial_set_on_bulk_create(self):
+        """Тест заполнения серийного номера при пакетной загрузке"""
+        valid, _ = validate_robot_batch([
+            {"model": "X5", "version": "LT", "created": "2023-01-01 00:00:00"},
+        ])
+        bulk_create_robots(valid)
+        self.assertEqual(Robot.objects.get().serial, 'X5-LT')
+
+    def test_serial_set_on_orm_create(self):
+        """Тест заполнения серийного номера при создании через ORM"""
+        robot = Robot.objects.create(model='13', version='XS', created=timezone.now())
+        self.assertEqual(robot.serial, '13-XS')
+
+    @skipUnless(connection.vendor == 'sqlite', 'План запроса проверяется на SQLite')
+    def test_serial_lookup_uses_index(self):
+        """Поиск свободных роботов по серийному номеру идет по индексу"""
+        plan = Robot.objects.filter(serial='R2-D2').explain()
+        self.assertIn('SEARCH robots_robot USING INDEX', plan)
+
+
+class BenchmarkComparisonTests(TestCase):
+    def test_regression_detection(self):
+        """Тест обнаружения ухудшения метрик сверх допуска"""
+        baseline = {
+            'single_create_p99_ms': 10.0,
+            'batch_ingest_records_per_second': 1000.0,
+            'report_seconds': 1.0,
+        }
+        metrics = {
+            'single_create_p99_ms': 11.0,
+            'batch_ingest_records_per_second': 700.0,
+            'report_seconds': 0.5,
+        }
+        regressions = compare_results(metrics, baseline, tolerance=0.2)
+
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('batch_ingest_records_per_second', regressions[0])
+
+
+class RobotIdempotencyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        customer = Customer.objects.create(email='gateway@example.com')
+        Order.objects.create(customer=customer, robot_serial='R2-D2')
+        self.robot = {'model': 'R2', 'version': 'D2', 'created': '2023-01-01 00:00:00'}
+
+    def post(self, url, data, **headers):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(url, json.dumps(data), content_type='application/json', **headers)
+
+    def test_retry_with_idempotency_key(self):
+        """Тест: повтор запроса с тем же ключом не создает робота и уведомление"""
+        first = self.post('/robots/api/', self.robot, HTTP_IDEMPOTENCY_KEY='gw-1')
+        retry = self.post('/robots/api/', self.robot, HTTP_IDEMPOTENCY_KEY='gw-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json()['event_id'], 'gw-1')
+        self.assertEqual(Robot.objects.count(), 1)
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_batch_retry(self):
+        """Тест: повтор пачки сводится к проверке по кэшу без записи"""
+        records = [dict(self.robot, event_id=f'ev-{i}') for i in range(3)]
+        records.append(dict(self.robot, event_id='ev-0'))
+
+        first = self.post('/robots/api/batch/', records)
+        self.assertEqual(first.json()['created'], 3)
+        self.assertEqual(first.json()['duplicates'], 1)
+
+        with self.assertNumQueries(0):
+            retry = self.post('/robots/api/batch/', records)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json()['created'], 0)
+        self.assertEqual(Robot.objects.count(), 3)
+
+    def test_dedup_after_window(self):
+        """Тест: после вытеснения из кэша повтор распознается по базе"""
+        self.post('/robots/api/batch/', [self.robot], HTTP_IDEMPOTENCY_KEY='batch-1')
+        cache.clear()
+        retry = self.post('/robots/api/batch/', [self.robot], HTTP_IDEMPOTENCY_KEY='batch-1')
+
+        self.assertEqual(retry.json()['duplicates'], 1)
+        self.assertEqual(Robot.objects.get().event_id, 'batch-1:0')
+
+
+class RobotQueueIngestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        spool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, spool_dir)
+        settings_override = override_settings(
+            INGEST_SPOOL_PATH=os.path.join(spool_dir, 'spool.sqlite3')
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.url = '/robots/api/queue/'
+
+    def test_enqueue_and_drain(self):
+        """Тест: запрос только ставит записи в очередь, обработчик сохраняет их"""
+        records = [
+            {'model': 'R2', 'version': 'D2', 'created': '2023-01-01 00:00:00'},
+            {'model': 'X5', 'version': 'LT', 'created': '2023-01-01 00:00:00'},
+            {'model': 'R2', 'version': 'D2'},
+        ]
+        response = self.client.post(self.url, json.dumps(records), content_type='application/json')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['queued'], 2)
+        self.assertEqual(response.json()['errors'][0]['index'], 2)
+        self.assertEqual(Robot.objects.count(), 0)
+        self.assertEqual(get_spool().depth(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(drain_spool(batch_size=1), (2, 2))
+        self.assertEqual(Robot.objects.count(), 2)
+        self.assertEqual(get_spool().depth(), 0)
+        self.assertEqual(ProductionDaily.objects.aggregate(total=Sum('count'))['total'], 2)
+
+    def test_redelivery_after_crash(self):
+        """Тест: записи упавшего обработчика возвращаются и не дублируются"""
+        self.client.post(
+            self.url,
+            json.dumps([{'model': 'R2', 'version': 'D2', 'created': '2023-01-01 00:00:00'}]),
+            content_type='application/json'
+        )
+        spool = get_spool()
+        token, payloads = spool.claim(10)
+        # Обработчик сохранил пачку, но упал до подтверждения
+        bulk_create_robots([to_cleaned(payload) for payload in payloads])
+
+        self.assertEqual(spool.requeue_stale(older_than=-1), 1)
+        self.assertEqual(drain_spool(), (1, 0))
+        self.assertEqual(Robot.objects.count(), 1)
+
+    def test_drain_command(self):
+        """Тест команды drain_ingest_spool в одном процессе"""
+        self.client.post(
+            self.url,
+            json.dumps([{'model': 'X5', 'version': 'LT', 'created': '2023-01-01 00:00:00'}]),
+            content_type='application/json'
+        )
+        out = StringIO()
+        call_command('drain_ingest_spool', stdout=out)
+
+        self.assertIn('Обработано: 1, создано: 1', out.getvalue())
+        self.assertEqual(Robot.objects.get().serial, 'X5-LT')
+
+
+class RobotArchiveTests(TestCase):
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir)
+        settings_override = override_settings(ROBOT_ARCHIVE_DIR=self.archive_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.customer = Customer.objects.create(email='archive@example.com')
+        self.old = timezone.now() - timedelta(days=800)
+        self.sold = self.create_robot(self.old, Order.COMPLETED)
+        self.reserved = self.create_robot(self.old, Order.RESERVED)
+        self.free = self.create_robot(self.old, None)
+        self.recent = self.create_robot(timezone.now(), Order.COMPLETED)
+        rebuild_daily()
+
+    def create_robot(self, created, status):
+        robot = Robot.objects.bulk_create([
+            Robot(serial='R2-D2', model='R2', version='D2', created=created)
+        ])[0]
+        if status is not None:
+            Order.objects.bulk_create([
+                Order(customer=self.customer, robot_serial='R2-D2', robot=robot, status=status)
+            ])
+        return robot
+
+    def test_archive_sold_robots(self):
+        """Тест архивирования только проданных роботов старше горизонта"""
+        archived = archive_robots(horizon_days=365)
+
+        self.assertEqual(sum(archived.values()), 1)
+        self.assertFalse(Robot.objects.filter(pk=self.sold.pk).exists())
+        self.assertEqual(
+            set(Robot.objects.values_list('pk', flat=True)),
+            {self.reserved.pk, self.free.pk, self.recent.pk}
+        )
+        # Заказ остался, связь с роботом сохранена в архиве
+        order = Order.objects.get(status=Order.COMPLETED, robot__isnull=True)
+        rows = list(iter_archived_robots())
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['id'], str(self.sold.pk))
+        self.assertEqual(rows[0]['order_id'], str(order.pk))
+        self.assertEqual(RobotArchive.objects.get().count, 1)
+
+    def test_rollups_survive_archive(self):
+        """Тест: сводки не меняются при архивировании и пересчете с архивом"""
+        before = list(ProductionDaily.objects.values_list('model', 'version', 'day', 'count'))
+
+        archive_robots(horizon_days=365)
+        self.assertEqual(
+            list(ProductionDaily.objects.values_list('model', 'version', 'day', 'count')),
+            before
+        )
+
+        rebuild_daily()
+        self.assertCountEqual(
+            ProductionDaily.objects.values_list('model', 'version', 'day', 'count'),
+            before
+        )
+
+
+class ConcurrentWriteTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_writers(self):
+        """Тест конкурентной записи: все роботы сохранены без ошибок блокировки"""
+        results = [
+            measure_concurrent_writes(workers, records=20)
+            for workers in (1, 4)
+        ]
+
+        for result in results:
+            self.assertEqual(result['errors'], 0)
+            self.assertEqual(result['created'], result['workers'] * 20)
+        self.assertEqual(Robot.objects.count(), 100)
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite-specific pragmas')
+    def test_sqlite_wal(self):
+        """Тест режима журнала WAL у соединений SQLite"""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        registry.clear()
+
+    def test_request_phases_and_queries(self):
+        """Тест записи времени фаз и количества SQL-запросов на endpoint"""
+        self.client.post(
+            '/robots/api/',
+            json.dumps({'model': 'R2', 'version': 'D2', 'created': '2023-01-01 00:00:00'}),
+            content_type='application/json'
+        )
+
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        for phase_name in ('parse', 'validate', 'insert', 'allocate', 'rollup'):
+            self.assertIn(
+                f'r4c_phase_seconds_count{{endpoint="robots/api/",phase="{phase_name}"}} 1',
+                body
+            )
+        self.assertIn(
+            'r4c_request_seconds_count{endpoint="robots/api/",method="POST",status="201"} 1',
+            body
+        )
+        # Запросы были, поэтому в корзине "0" запрос не учтен
+        self.assertIn('r4c_request_queries_bucket{endpoint="robots/api/",le="0"} 0', body)
+
+    def test_email_send_time(self):
+        """Тест записи времени отправки письма"""
+        customer = Customer.objects.create(email='metrics@example.com')
+        Order.objects.create(customer=customer, robot_serial='R2-D2')
+        with self.captureOnCommitCallbacks(execute=True):
+            Robot.objects.create(model='R2', version='D2', created=timezone.now())
+
+        dispatch_pending_notifications()
+
+        self.assertIn('r4c_email_send_seconds_count{} 1', registry.render())
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        """Тест отключения метрик: middleware не подключается, endpoint недоступен"""
+        client = Client()
+        client.post(
+            '/robots/api/',
+            json.dumps({'model': 'R2', 'version': 'D2', 'created': '2023-01-01 00:00:00'}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(client.get('/metrics/').status_code, 404)
+        self.assertEqual(registry.render(), '\n')
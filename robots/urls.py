@@ -1,8 +1,31 @@
 from django.urls import path
-from .views import RobotCreateView, RobotExcelReportView
+from .views import (
+    ReportJobCreateView,
+    ReportJobDownloadView,
+    ReportJobStatusView,
+    RobotAsyncBatchCreateView,
+    RobotAsyncCreateView,
+    RobotBatchCreateView,
+    RobotCreateView,
+    RobotExcelReportView,
+    RobotQueueIngestView,
+    RobotStatsView,
+    RobotStockView,
+    RobotStreamIngestView,
+)
 
 
 urlpatterns = [
     path('report/download/', RobotExcelReportView.as_view(), name='robot-report'),
+    path('report/jobs/', ReportJobCreateView.as_view(), name='report-job-create'),
+    path('report/jobs/<uuid:job_id>/', ReportJobStatusView.as_view(), name='report-job-status'),
+    path('report/jobs/<uuid:job_id>/download/', ReportJobDownloadView.as_view(), name='report-job-download'),
     path('robots/api/', RobotCreateView.as_view(), name='robot-create'),
+    path('robots/api/batch/', RobotBatchCreateView.as_view(), name='robot-batch-create'),
+    path('robots/api/async/', RobotAsyncCreateView.as_view(), name='robot-async-create'),
+    path('robots/api/async/batch/', RobotAsyncBatchCreateView.as_view(), name='robot-async-batch-create'),
+    path('robots/stock/', RobotStockView.as_view(), name='robot-stock'),
+    path('robots/stats/', RobotStatsView.as_view(), name='robot-stats'),
+    path('robots/api/stream/', RobotStreamIngestView.as_view(), name='robot-stream-ingest'),
+    path('robots/api/queue/', RobotQueueIngestView.as_view(), name='robot-queue-ingest'),
 ]
\ No newline at end of file
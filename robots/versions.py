@@ -0,0 +1,35 @@
+"""
+Версии данных в базе для кэшей в памяти процессов.
+
+Счетчик в кэше Django виден только процессу, если кэш локальный
+(LocMemCache по умолчанию), поэтому изменения из других процессов -
+команд загрузки, обработчиков очереди, воркеров веб-сервера - по нему
+не видны. Версия в базе меняется вместе с данными и видна всем.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DataVersion
+
+
+def bump_version(name):
+    """Увеличиваем версию в текущей транзакции"""
+    now = timezone.now()
+    rows = DataVersion.objects.filter(name=name)
+    if rows.update(version=F('version') + 1, updated_at=now):
+        return
+
+    try:
+        with transaction.atomic():
+            DataVersion.objects.create(name=name, version=1, updated_at=now)
+    except IntegrityError:
+        # Строку успел создать другой процесс
+        rows.update(version=F('version') + 1, updated_at=now)
+
+
+def get_version(name):
+    """Версия и время ее изменения; (0, None), если данные не менялись"""
+    row = DataVersion.objects.filter(name=name).values_list('version', 'updated_at').first()
+    return row or (0, None)
@@ -1,13 +1,52 @@
-from django.http import JsonResponse, HttpResponse
+from asgiref.sync import sync_to_async
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-from django.db.models import Count
-from django.utils import timezone
-from openpyxl import Workbook
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from wsgiref.util import FileWrapper
 import json
-from datetime import datetime, timedelta
-from .models import Robot
+import os
+import time
+from R4C import json_codec
+from R4C.json_codec import JSONResponse
+from R4C.metrics import phase
+from .exports import (
+    WEEKLY_FIELDS,
+    ExportFormatError,
+    ExportUnavailableError,
+    get_exporter,
+    render_export,
+    select_format,
+)
+from .idempotency import IdempotencyKeyError, apply_idempotency_key, get_idempotency_key
+from .jobs import fail_stale_report_jobs, submit_report_job
+from .models import ReportJob, Robot
+from .reports import (
+    ReportParamsError,
+    get_cached_report,
+    get_data_version,
+    get_report_data,
+    get_report_etag,
+    get_report_window,
+    parse_report_params,
+)
+from .spool import get_spool
+from .stats import WINDOW_HOURS, production_stats
+from .stock import get_all_stock, get_available
+from .services import (
+    RobotValidationError,
+    bulk_create_robots,
+    create_robot,
+    ingest_ndjson_lines,
+    parse_ndjson_records,
+    serialize_robot,
+    validate_robot_batch,
+    validate_robot_data,
+)
 
 @method_decorator(csrf_exempt, name='dispatch')
 class RobotCreateView(View):
@@ -16,130 +55,427 @@ class RobotCreateView(View):
     def post(self, request, *args, **kwargs):
         """Обработка POST-запроса для создания робота"""
         try:
-            data = json.loads(request.body)
+            key = get_idempotency_key(request)
+            with phase('parse'):
+                data = json_codec.loads(request.body)
+            if key is not None and isinstance(data, dict):
+                data.setdefault('event_id', key)
+            with phase('validate'):
+                cleaned = validate_robot_data(data)
             
-            # Проверяем длину модели
-            if len(data.get('model', '')) != 2:
-                return JsonResponse(
-                    {'error': 'Model must be exactly 2 characters long'}, 
-                    status=400
-                )
-                
-            # Проверяем длину версии
-            if len(data.get('version', '')) != 2:
-                return JsonResponse(
-                    {'error': 'Version must be exactly 2 characters long'}, 
-                    status=400
-                )
-                
-            # Проверяем дату
-            try:
-                created = datetime.strptime(data['created'], "%Y-%m-%d %H:%M:%S")
-            except (ValueError, KeyError):
-                return JsonResponse(
-                    {'error': 'Invalid datetime format. Use YYYY-MM-DD HH:MM:SS'}, 
-                    status=400
-                )
+            # Создаем робота; повтор отправки возвращает уже созданного
+            with phase('insert'):
+                robot, created = create_robot(cleaned)
             
-            # Создаем робота
-            robot = Robot.objects.create(
-                model=data['model'],
-                version=data['version'],
-                created=created
-            )
-            
-            return JsonResponse({
-                'model': robot.model,
-                'version': robot.version,
-                'created': robot.created.strftime("%Y-%m-%d %H:%M:%S")
-            }, status=201)
+            return JSONResponse(serialize_robot(robot), status=201 if created else 200)
             
-        except json.JSONDecodeError:
-            return JsonResponse(
+        except json_codec.DecodeError:
+            return JSONResponse(
                 {'error': 'Invalid JSON format'}, 
                 status=400
             )
+        except (RobotValidationError, IdempotencyKeyError) as e:
+            return JSONResponse({'error': str(e)}, status=400)
         except Exception as e:
-            return JsonResponse(
+            return JSONResponse(
                 {'error': str(e)}, 
                 status=500
             )
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class RobotBatchCreateView(View):
+    """Представление для пакетного создания роботов (JSON-массив или NDJSON)"""
+
+    NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/ndjson')
+
+    def parse_records(self, request):
+        """Разбираем тело запроса в список записей"""
+        if request.content_type in self.NDJSON_CONTENT_TYPES:
+            return parse_ndjson_records(request.body.decode('utf-8'))
+
+        records = json_codec.loads(request.body)
+        if not isinstance(records, list):
+            raise ValueError('Batch must be a JSON array')
+        return records
+
+    def get_records(self, request):
+        """Записи пачки с event_id из заголовка Idempotency-Key"""
+        return apply_idempotency_key(
+            self.parse_records(request),
+            get_idempotency_key(request)
+        )
+
+    def batch_response(self, valid, robots, errors):
+        """Итог пачки: повторно присланные записи не создаются заново"""
+        return JSONResponse({
+            'created': len(robots),
+            'duplicates': len(valid) - len(robots),
+            'errors': errors,
+        }, status=201 if robots else 200)
+
+    def post(self, request, *args, **kwargs):
+        """Валидируем все записи и сохраняем корректные одной транзакцией"""
+        try:
+            with phase('parse'):
+                records = self.get_records(request)
+        except (json_codec.DecodeError, UnicodeDecodeError):
+            return JSONResponse({'error': 'Invalid JSON format'}, status=400)
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status=400)
+
+        with phase('validate'):
+            valid, errors = validate_robot_batch(records)
+        if not valid:
+            return JSONResponse(
+                {'created': 0, 'errors': errors},
+                status=400
+            )
+
+        with phase('insert'):
+            robots = bulk_create_robots(valid)
+
+        return self.batch_response(valid, robots, errors)
         
 
+@method_decorator(csrf_exempt, name='dispatch')
+class RobotAsyncCreateView(View):
+    """Асинхронное создание робота для развертывания через ASGI"""
+
+    async def post(self, request, *args, **kwargs):
+        """Обработка POST-запроса без переключения потока на весь запрос"""
+        try:
+            key = get_idempotency_key(request)
+            with phase('parse'):
+                data = json_codec.loads(request.body)
+            if key is not None and isinstance(data, dict):
+                data.setdefault('event_id', key)
+            # Проверка по каталогу может загрузить его из базы, поэтому в потоке
+            with phase('validate'):
+                cleaned = await sync_to_async(validate_robot_data)(data)
+        except json_codec.DecodeError:
+            return JSONResponse({'error': 'Invalid JSON format'}, status=400)
+        except (RobotValidationError, IdempotencyKeyError) as e:
+            return JSONResponse({'error': str(e)}, status=400)
+
+        # Сигнал только ставит уведомления в очередь, без обращения к SMTP
+        with phase('insert'):
+            if cleaned['event_id']:
+                # Проверка повтора и обработка конфликта требуют транзакции
+                robot, created = await sync_to_async(create_robot)(cleaned)
+            else:
+                robot, created = await Robot.objects.acreate(**cleaned), True
+
+        return JSONResponse(serialize_robot(robot), status=201 if created else 200)
+
+
+class RobotAsyncBatchCreateView(RobotBatchCreateView):
+    """Асинхронное пакетное создание роботов для развертывания через ASGI"""
+
+    async def post(self, request, *args, **kwargs):
+        """Разбор выполняется в цикле событий, проверка и запись - в потоке"""
+        try:
+            with phase('parse'):
+                records = self.get_records(request)
+        except (json_codec.DecodeError, UnicodeDecodeError):
+            return JSONResponse({'error': 'Invalid JSON format'}, status=400)
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status=400)
+
+        # Проверка по каталогу может загрузить его из базы
+        with phase('validate'):
+            valid, errors = await sync_to_async(validate_robot_batch)(records)
+        if not valid:
+            return JSONResponse(
+                {'created': 0, 'errors': errors},
+                status=400
+            )
+
+        # Транзакции недоступны в асинхронном ORM, поэтому bulk_create
+        # вместе со сводкой выполняется одним вызовом в потоке
+        with phase('insert'):
+            robots = await sync_to_async(bulk_create_robots)(valid)
+
+        return self.batch_response(valid, robots, errors)
+
+
+class RobotQueueIngestView(RobotBatchCreateView):
+    """Прием роботов в локальную очередь без записи в основную базу.
+
+    Записи проверяются и дописываются в очередь, ответ 202 возвращается
+    сразу, а в базу их переносит команда drain_ingest_spool.
+    """
+
+    def post(self, request, *args, **kwargs):
+        try:
+            with phase('parse'):
+                records = self.get_records(request)
+        except (json_codec.DecodeError, UnicodeDecodeError):
+            return JSONResponse({'error': 'Invalid JSON format'}, status=400)
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status=400)
+
+        with phase('validate'):
+            valid, errors = validate_robot_batch(records)
+        if not valid:
+            return JSONResponse(
+                {'queued': 0, 'errors': errors},
+                status=400
+            )
+
+        with phase('enqueue'):
+            queued = get_spool().append(valid)
+
+        return JSONResponse({
+            'queued': queued,
+            'errors': errors,
+        }, status=202)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class RobotStreamIngestView(View):
+    """Потоковая загрузка роботов из NDJSON для больших выгрузок.
+
+    Тело запроса читается построчно, без request.body, а прогресс
+    отдается клиенту строками NDJSON по мере сохранения порций.
+    """
+
+    DEFAULT_CHUNK_SIZE = 1000
+    MAX_CHUNK_SIZE = 10000
+
+    def get_chunk_size(self, request):
+        """Размер порции из параметра chunk_size"""
+        try:
+            chunk_size = int(request.GET.get('chunk_size', self.DEFAULT_CHUNK_SIZE))
+        except ValueError:
+            return self.DEFAULT_CHUNK_SIZE
+        return max(1, min(chunk_size, self.MAX_CHUNK_SIZE))
+
+    def post(self, request, *args, **kwargs):
+        """Обработка POST-запроса с NDJSON-телом"""
+        try:
+            key = get_idempotency_key(request)
+        except IdempotencyKeyError as e:
+            return JSONResponse({'error': str(e)}, status=400)
+
+        progress = ingest_ndjson_lines(
+            iter(request.readline, b''),
+            chunk_size=self.get_chunk_size(request),
+            idempotency_key=key
+        )
+        return StreamingHttpResponse(
+            (json_codec.dumps(item) + b'\n' for item in progress),
+            content_type='application/x-ndjson'
+        )
+
+
+class RobotStockView(View):
+    """Свободные остатки роботов для витрины.
+
+    Значения читаются из кэша и обновляются после каждой вставки роботов
+    и резервирования со склада. С общим кэшем данные актуальны сразу,
+    с локальным кэшем процесса - устаревают не более чем на STOCK_CACHE_TTL
+    секунд.
+    """
+
+    def get(self, request, *args, **kwargs):
+        model = request.GET.get('model')
+        version = request.GET.get('version')
+
+        if model is None and version is None:
+            return JsonResponse({'stock': get_all_stock()})
+
+        if not model or not version:
+            return JsonResponse(
+                {'error': 'Both model and version are required'},
+                status=400
+            )
+
+        return JsonResponse({
+            'model': model,
+            'version': version,
+            'available': get_available(model, version),
+        })
+
+
+class RobotStatsView(View):
+    """Статистика производства для дашбордов.
+
+    Почасовой ряд по моделям и версиям, итоги за сутки и неделю и тренд
+    скорости производства. Значения читаются из счетчиков в памяти
+    процесса (robots.stats), запрос не агрегирует таблицу Robot.
+    """
+
+    DEFAULT_HOURS = 24
+
+    def get(self, request, *args, **kwargs):
+        try:
+            hours = int(request.GET.get('hours', self.DEFAULT_HOURS))
+        except ValueError:
+            hours = 0
+        if not 1 <= hours <= WINDOW_HOURS:
+            return JSONResponse(
+                {'error': f'hours must be an integer between 1 and {WINDOW_HOURS}'},
+                status=400
+            )
+
+        return JSONResponse(production_stats.snapshot(hours))
+
+
 class RobotExcelReportView(View):
-    """Представление для генерации Excel-отчета по роботам"""
+    """Представление для выгрузки недельного отчета по роботам.
+
+    Формат выбирается параметром format или заголовком Accept (по
+    умолчанию XLSX). Готовый XLSX кэшируется по окну отчета и версии
+    данных, а ответ в любом формате содержит ETag и Last-Modified:
+    повторное скачивание без новых роботов не обращается к базе.
+    """
+
+    CHUNK_SIZE = 64 * 1024
     
     def get_last_week_data(self):
-        """Получаем данные за последнюю неделю"""
-        end_date = timezone.now()
-        start_date = end_date - timedelta(days=7)
-        
-        return Robot.objects.filter(
-            created__range=(start_date, end_date)
-        ).values(
-            'model', 'version'
-        ).annotate(
-            count=Count('id')
-        ).order_by('model', 'version')
+        """Получаем данные за последние 7 дней, включая сегодняшний"""
+        return get_report_data(*get_report_window())
 
     def get(self, request, *args, **kwargs):
         """Обработка GET-запроса для скачивания отчета"""
-        # Создаем новый Excel-файл
-        wb = Workbook()
-        
-        # Получаем данные за последнюю неделю
-        robots_data = self.get_last_week_data()
-        
-        # Группируем данные по моделям
-        models_data = {}
-        for item in robots_data:
-            if item['model'] not in models_data:
-                models_data[item['model']] = []
-            models_data[item['model']].append(item)
-        
-        # Удаляем стандартный лист
-        if len(models_data) > 0:
-            wb.remove(wb.active)
-        
-        # Создаем лист для каждой модели
-        for model, data in models_data.items():
-            # Создаем новый лист с названием модели
-            ws = wb.create_sheet(title=f"Model {model}")
-            
-            # Добавляем заголовки
-            ws['A1'] = 'Модель'
-            ws['B1'] = 'Версия'
-            ws['C1'] = 'Количество за неделю'
-            
-            # Заполняем данные
-            row = 2
-            for item in data:
-                ws[f'A{row}'] = item['model']
-                ws[f'B{row}'] = item['version']
-                ws[f'C{row}'] = item['count']
-                row += 1
-            
-            # Устанавливаем ширину столбцов
-            ws.column_dimensions['A'].width = 15
-            ws.column_dimensions['B'].width = 15
-            ws.column_dimensions['C'].width = 25
+        try:
+            exporter = select_format(request)
+        except ExportUnavailableError as e:
+            # Формат известен, но не может быть отдан в этом окружении
+            return JsonResponse({'error': str(e)}, status=406)
+        except ExportFormatError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        start_date, end_date = get_report_window()
+        version, last_modified = get_data_version()
+        etag = get_report_etag(start_date, end_date, version, exporter.extension)
+
+        # Клиент уже получил актуальную версию отчета. 304 собирается из
+        # ответа с заголовками валидации, чтобы в нем были ETag и Vary
+        headers = self.patch_cache_headers(HttpResponse(), etag, last_modified)
+        conditional = get_conditional_response(
+            request, etag=etag, last_modified=int(last_modified), response=headers
+        )
+        # Без условия совпадения возвращается сам переданный ответ
+        if conditional is not headers:
+            return conditional
+
+        if exporter.streaming:
+            # Строки отдаются по мере чтения курсора, без Content-Length
+            response = StreamingHttpResponse(
+                exporter.stream(
+                    self.get_last_week_data().iterator(chunk_size=2000), WEEKLY_FIELDS
+                ),
+                content_type=exporter.content_type
+            )
         else:
-            # Если данных нет, оставляем один лист с сообщением
-            ws = wb.active
-            ws['A1'] = 'Нет данных за последнюю неделю'
-            ws.column_dimensions['A'].width = 30
+            response = self.file_response(exporter, start_date, end_date, version)
 
         # Формируем имя файла с текущей датой
-        filename = f'robots_report_{timezone.now().strftime("%Y%m%d")}.xlsx'
-        
-        # Создаем HTTP-ответ с Excel-файлом
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
+        filename = f'robots_report_{end_date.strftime("%Y%m%d")}.{exporter.extension}'
         response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        # Сохраняем файл в response
-        wb.save(response)
-        
+        return self.patch_cache_headers(response, etag, last_modified)
+
+    def patch_cache_headers(self, response, etag, last_modified):
+        """Заголовки валидации кэша: общие для отчета и для ответа 304"""
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    def file_response(self, exporter, start_date, end_date, version):
+        """Ответ из готового файла: XLSX из кэша, остальные - во временном файле"""
+        started = time.perf_counter()
+        if exporter.extension == 'xlsx':
+            report, cache_hit = get_cached_report(start_date, end_date, version)
+        else:
+            report, cache_hit = render_export(exporter, start_date, end_date), False
+        duration = (time.perf_counter() - started) * 1000
+        size = report.seek(0, os.SEEK_END)
+        report.seek(0)
+
+        # Отдаем файл порциями, не загружая его в память целиком
+        response = StreamingHttpResponse(
+            FileWrapper(report, self.CHUNK_SIZE),
+            content_type=exporter.content_type
+        )
+        response['Content-Length'] = str(size)
+        # Время до первого байта: генерация отчета или чтение из кэша
+        response['Server-Timing'] = (
+            f'report;desc="{"cache" if cache_hit else "generate"}";dur={duration:.1f}'
+        )
         return response
 
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ReportJobCreateView(View):
+    """Постановка отчета за произвольный период в фоновую генерацию"""
+
+    def post(self, request, *args, **kwargs):
+        """Принимаем параметры отчета и возвращаем идентификатор задачи"""
+        try:
+            params = parse_report_params(json.loads(request.body))
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON format'}, status=400)
+        except ReportParamsError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        try:
+            get_exporter(params['format'])
+        except ExportFormatError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        job, _ = submit_report_job(params)
+        return JsonResponse(serialize_report_job(job), status=202)
+
+
+class ReportJobStatusView(View):
+    """Статус фоновой генерации отчета"""
+
+    def get(self, request, job_id, *args, **kwargs):
+        job = get_object_or_404(ReportJob, pk=job_id)
+        # Клиент, ожидающий потерянную задачу, получает ошибку, а не вечное ожидание
+        if job.status in (ReportJob.PENDING, ReportJob.RUNNING) and fail_stale_report_jobs(job.params_hash):
+            job.refresh_from_db()
+        return JsonResponse(serialize_report_job(job))
+
+
+class ReportJobDownloadView(View):
+    """Скачивание готового отчета"""
+
+    def get(self, request, job_id, *args, **kwargs):
+        job = get_object_or_404(ReportJob, pk=job_id)
+        if job.status != ReportJob.DONE:
+            return JsonResponse(serialize_report_job(job), status=409)
+
+        try:
+            report = open(job.file_path, 'rb')
+        except OSError:
+            raise Http404('Report file is missing')
+
+        params = job.params
+        exporter = get_exporter(params.get('format', 'xlsx'))
+        filename = f"robots_report_{params['start']}_{params['end']}.{exporter.extension}"
+        return FileResponse(
+            report,
+            as_attachment=True,
+            filename=filename,
+            content_type=exporter.content_type
+        )
+
+
+def serialize_report_job(job):
+    """Представление задачи на отчет в ответе API"""
+    data = {
+        'id': str(job.pk),
+        'status': job.status,
+        'params': job.params,
+        'status_url': reverse('report-job-status', args=[job.pk]),
+    }
+    if job.status == ReportJob.DONE:
+        data['download_url'] = reverse('report-job-download', args=[job.pk])
+    if job.status == ReportJob.FAILED:
+        data['error'] = job.error
+    return data